@@ -8,6 +8,8 @@ import json
 import os
 import re
 import copy
+import threading
+import time
 from configparser import ConfigParser
 from os.path import expanduser
 from random import randint
@@ -21,6 +23,7 @@ import app_cache as cache
 import default_config
 import app_utils
 from db_intf import DBCache
+from rpc_cache import RpcResponseCache
 
 APP_NAME_SHORT = 'DashMasternodeTool'
 APP_NAME_LONG = 'Dash Masternode Tool'
@@ -29,6 +32,21 @@ MIN_TX_FEE = 10000
 APP_CFG_CUR_VERSION = 2  # current version of configuration file format
 SCREENSHOT_MODE = False
 
+# weight of the latest sample in the rolling (exponentially weighted) latency and error rate of connections
+CONN_HEALTH_SAMPLE_WEIGHT = 0.2
+
+# latency (in seconds) assumed for connections which haven't been used yet
+CONN_DEFAULT_LATENCY = 1.0
+
+# initial and maximum time (in seconds) for which a failed connection is moved to the end of the list; the time
+# doubles with each subsequent failure
+CONN_BACKOFF_BASE_TIME = 30
+CONN_BACKOFF_MAX_TIME = 3600
+
+# minimum relative change of a connection's health score for which the statistics are saved to the app cache
+# before the application closes; smaller changes would cause rewriting the cache file after each RPC call
+CONN_HEALTH_SAVE_THRESHOLD = 0.2
+
 
 class HWType:
     trezor = 'TREZOR'
@@ -55,6 +73,18 @@ class AppConfig(object):
         # if it is set to False, connections will be used accoording to its order in dash_net_configs list
         self.random_dash_net_config = True
 
+        # number of (direct RPC) connections probed concurrently when connecting for the first time; the first
+        # one that answers is used; value <= 1 disables probing
+        self.conn_probe_count = 3
+
+        # probing changes the order of connections, so if random_dash_net_config is False, it's performed only
+        # if the user enabled it explicitly
+        self.conn_probe_fixed_order = False
+
+        # number of RPC calls performed concurrently by DashdInterface.gather (eg. batches of proposals' votes),
+        # each over its own keep-alive connection to the node
+        self.rpc_gather_concurrency = 4
+
         # list of all enabled dashd configurations (DashNetworkConnectionCfg) - they will be used accourding to
         # the order in list
         self.active_dash_net_configs = []
@@ -63,6 +93,9 @@ class AppConfig(object):
         # connections
         self.defective_net_configs = []
 
+        # guards health statistics of connections, which are updated by RPC calls from many threads
+        self.conn_health_lock = threading.RLock()
+
         self.hw_type = HWType.trezor  # TREZOR, KEEPKEY, LEDGERNANOS
         self.block_explorer_tx = 'https://chainz.cryptoid.info/dash/tx.dws?%TXID%'
         self.block_explorer_addr = 'https://chainz.cryptoid.info/dash/address.dws?%ADDRESS%'
@@ -76,6 +109,10 @@ class AppConfig(object):
         self.confirm_when_voting = True
         self.add_random_offset_to_vote_time = True  # To avoid identifying one user's masternodes by vote time
         self.csv_delimiter =';'
+        # votes of proposals inactive for more than this number of days are moved to the archive table
+        self.db_archive_after_days = 30
+        # archived votes of proposals inactive for more than this number of days are deleted; 0: keep forever
+        self.db_archive_retention_days = 0
 
         self.masternodes = []
         self.last_bip32_base_path = ''
@@ -88,6 +125,10 @@ class AppConfig(object):
         self.log_level_str = ''
         self.db_cache_file_name = ''
         self.cfg_backup_dir = ''
+        self.db_intf = None
+        self.rpc_cache = None
+        self.rpc_record_file = None  # if set, results of all RPC calls are saved to this file (for replaying)
+        self.db_profile_slow_time = None  # if set, SQL statements are profiled; slow statement time in ms
 
     def init(self, app_path):
         """ Initialize configuration after openning the application. """
@@ -112,7 +153,15 @@ class AppConfig(object):
 
         parser = argparse.ArgumentParser()
         parser.add_argument('--config', help="Path to a configuration file", dest='config')
+        parser.add_argument('--rpc-record', help="Path to a file to record the RPC traffic to (it can be replayed "
+                                                 "by src/test/fake_dashd.py)", dest='rpc_record')
+        parser.add_argument('--db-profile', help="Log statistics of the SQL statements executed on the cache "
+                                                 "database and query plans of the statements slower than the given "
+                                                 "time in ms (default: 100)", dest='db_profile', type=float,
+                            nargs='?', const=100.0)
         args = parser.parse_args()
+        self.rpc_record_file = args.rpc_record
+        self.db_profile_slow_time = args.db_profile
         if args.config is not None:
             self.app_config_file_name = args.config
             if not os.path.exists(self.app_config_file_name):
@@ -147,9 +196,17 @@ class AppConfig(object):
 
         try:
             self.db_intf = DBCache(self.db_cache_file_name)
+            if self.db_profile_slow_time is not None:
+                self.db_intf.enable_profiling(self.db_profile_slow_time / 1000)
         except Exception as e:
             logging.exception('SQLite initialization error')
 
+        # cache for results of RPC calls, which don't change over time (transactions, block headers):
+        try:
+            self.rpc_cache = RpcResponseCache(os.path.join(self.cache_dir, 'rpc_cache.db'))
+        except Exception as e:
+            logging.exception('RPC cache initialization error')
+
         try:
             # read configuration from a file
             self.read_from_file()
@@ -166,13 +223,27 @@ class AppConfig(object):
         """ Start cache save thread after GUI initializes. """
         cache.start()
 
+    def start_db_maintenance(self):
+        """ Start the database cache maintenance (archiving votes, releasing free space) in the background. """
+        if self.db_intf and self.db_intf.is_active():
+            threading.Thread(target=self.db_intf.run_maintenance, name='DBMaintenanceThread', daemon=True,
+                             args=(self.db_archive_after_days, self.db_archive_retention_days)).start()
+
     def close(self):
+        self.save_conn_health()
         cache.finish()
         self.db_intf.close()
+        if self.rpc_cache:
+            self.rpc_cache.close()
 
     def copy_from(self, src_config):
         self.dash_net_configs = copy.deepcopy(src_config.dash_net_configs)
         self.random_dash_net_config = src_config.random_dash_net_config
+        self.conn_probe_count = src_config.conn_probe_count
+        self.conn_probe_fixed_order = src_config.conn_probe_fixed_order
+        self.rpc_gather_concurrency = src_config.rpc_gather_concurrency
+        self.db_archive_after_days = src_config.db_archive_after_days
+        self.db_archive_retention_days = src_config.db_archive_retention_days
         self.hw_type = src_config.hw_type
         self.block_explorer_tx = src_config.block_explorer_tx
         self.block_explorer_addr = src_config.block_explorer_addr
@@ -290,6 +361,12 @@ class AppConfig(object):
 
                 self.random_dash_net_config = self.value_to_bool(config.get(section, 'random_dash_net_config',
                                                                             fallback='1'))
+                self.conn_probe_count = config.getint(section, 'conn_probe_count', fallback=3)
+                self.conn_probe_fixed_order = self.value_to_bool(config.get(section, 'conn_probe_fixed_order',
+                                                                            fallback='0'))
+                self.rpc_gather_concurrency = config.getint(section, 'rpc_gather_concurrency', fallback=4)
+                self.db_archive_after_days = config.getint(section, 'db_archive_after_days', fallback=30)
+                self.db_archive_retention_days = config.getint(section, 'db_archive_retention_days', fallback=0)
                 self.check_for_updates = self.value_to_bool(config.get(section, 'check_for_updates', fallback='1'))
                 self.backup_config_file = self.value_to_bool(config.get(section, 'backup_config_file', fallback='1'))
                 self.read_proposals_external_attributes = \
@@ -376,6 +453,11 @@ class AppConfig(object):
         config.set(section, 'hw_type', self.hw_type)
         config.set(section, 'bip32_base_path', self.last_bip32_base_path)
         config.set(section, 'random_dash_net_config', '1' if self.random_dash_net_config else '0')
+        config.set(section, 'conn_probe_count', str(self.conn_probe_count))
+        config.set(section, 'conn_probe_fixed_order', '1' if self.conn_probe_fixed_order else '0')
+        config.set(section, 'rpc_gather_concurrency', str(self.rpc_gather_concurrency))
+        config.set(section, 'db_archive_after_days', str(self.db_archive_after_days))
+        config.set(section, 'db_archive_retention_days', str(self.db_archive_retention_days))
         config.set(section, 'check_for_updates', '1' if self.check_for_updates else '0')
         config.set(section, 'backup_config_file', '1' if self.backup_config_file else '0')
         config.set(section, 'dont_use_file_dialogs', '1' if self.dont_use_file_dialogs else '0')
@@ -468,23 +550,37 @@ class AppConfig(object):
 
     def prepare_conn_list(self):
         """
-        Prepare list of enabled connections for connecting to dash network. 
-        :return: list of DashNetworkConnectionCfg objects order randomly (random_dash_net_config == True) or according 
-            to order in configuration
+        Prepare list of enabled connections for connecting to dash network. Connections in the failure backoff
+        period are placed at the end of the list.
+        :return: list of DashNetworkConnectionCfg objects ordered by health score, i.e. the fastest, healthy
+            connections first (random_dash_net_config == True; connections not used yet are ordered randomly) or
+            according to order in configuration
         """
-        tmp_list = []
-        for cfg in self.dash_net_configs:
-            if cfg.enabled:
-                tmp_list.append(cfg)
-        if self.random_dash_net_config:
-            ordered_list = []
-            while len(tmp_list):
-                idx = randint(0, len(tmp_list)-1)
-                ordered_list.append(tmp_list[idx])
-                del tmp_list[idx]
-            self.active_dash_net_configs = ordered_list
-        else:
-            self.active_dash_net_configs = tmp_list
+        self.conn_health_lock.acquire()
+        try:
+            self.restore_conn_health()
+            tmp_list = []
+            for cfg in self.dash_net_configs:
+                if cfg.enabled:
+                    tmp_list.append(cfg)
+            if self.random_dash_net_config:
+                ordered_list = []
+                while len(tmp_list):
+                    idx = randint(0, len(tmp_list)-1)
+                    ordered_list.append(tmp_list[idx])
+                    del tmp_list[idx]
+                # sort is stable, so connections with the same score keep the random order
+                ordered_list.sort(key=lambda c: c.get_health_score())
+            else:
+                ordered_list = tmp_list
+
+            now = time.time()
+            healthy = [c for c in ordered_list if not c.is_in_backoff(now)]
+            in_backoff = [c for c in ordered_list if c.is_in_backoff(now)]
+            in_backoff.sort(key=lambda c: c.retry_after)
+            self.active_dash_net_configs = healthy + in_backoff
+        finally:
+            self.conn_health_lock.release()
 
     def get_ordered_conn_list(self):
         if not self.active_dash_net_configs:
@@ -502,7 +598,47 @@ class AppConfig(object):
         :param cfg: 
         :return: 
         """
-        self.defective_net_configs.append(cfg)
+        self.conn_health_lock.acquire()
+        try:
+            if cfg not in self.defective_net_configs:
+                self.defective_net_configs.append(cfg)
+            cfg.register_failure()
+            logging.info('Connection %s failed, next retry after %s s' %
+                         (cfg.get_description(), str(int(cfg.retry_after - time.time()))))
+            # failures are rare and the backoff time has to survive restarting the application
+            self.save_conn_health()
+        finally:
+            self.conn_health_lock.release()
+
+    def restore_conn_health(self):
+        """
+        Restores connections' latency/error statistics saved in the cache by the previous sessions.
+        """
+        self.conn_health_lock.acquire()
+        try:
+            health = cache.get_value('ConnectionsHealth', {}, dict)
+            for cfg in self.dash_net_configs:
+                if not cfg.health_restored:
+                    h = health.get(cfg.get_conn_id())
+                    if h:
+                        cfg.set_health_data(h)
+                        cfg.saved_health_score = cfg.get_health_score()
+                    cfg.health_restored = True
+        finally:
+            self.conn_health_lock.release()
+
+    def save_conn_health(self):
+        self.conn_health_lock.acquire()
+        try:
+            health = cache.get_value('ConnectionsHealth', {}, dict)
+            health = dict(health)
+            for cfg in self.dash_net_configs:
+                if cfg.health_restored:
+                    health[cfg.get_conn_id()] = cfg.get_health_data()
+                    cfg.saved_health_score = cfg.get_health_score()
+            cache.set_value('ConnectionsHealth', health)
+        finally:
+            self.conn_health_lock.release()
 
     def decode_connections(self, raw_conn_list):
         """
@@ -622,15 +758,24 @@ class AppConfig(object):
                 return conn
         return None
 
-    def conn_cfg_success(self, cfg):
+    def conn_cfg_success(self, cfg, call_duration=None):
         """
         Mark conn configuration as functioning. If it was placed on self.defective_net_configs list before, now
         will be removed from it.
+        :param call_duration: duration (in seconds) of the HTTP round trip of the successful call, used to update
+            connection's latency; None if the call didn't reach the node (eg. the result was read from cache)
         """
-        if cfg in self.defective_net_configs:
-            # remove config from list of defective config
-            idx = self.defective_net_configs.index(cfg)
-            self.defective_net_configs.pop(idx)
+        self.conn_health_lock.acquire()
+        try:
+            if cfg in self.defective_net_configs:
+                # remove config from list of defective config
+                idx = self.defective_net_configs.index(cfg)
+                self.defective_net_configs.pop(idx)
+            cfg.register_success(call_duration)
+            if cfg.is_health_save_needed():
+                self.save_conn_health()
+        finally:
+            self.conn_health_lock.release()
 
     def get_mn_by_name(self, name):
         for mn in self.masternodes:
@@ -718,6 +863,14 @@ class DashNetworkConnectionCfg(object):
         self.__use_ssh_tunnel = False
         self.__ssh_conn_cfg = SSHConnectionCfg()
 
+        # connection health statistics (not saved in the config file, but in the app cache)
+        self.avg_latency = None  # rolling average duration of successful calls in seconds
+        self.error_rate = 0.0  # rolling ratio of failed calls (0..1)
+        self.failure_count = 0  # number of subsequent failures
+        self.retry_after = 0  # time (epoch) after which the failed connection is treated as healthy again
+        self.health_restored = False
+        self.saved_health_score = None  # health score at the time the statistics were saved to the app cache
+
     def get_description(self):
         if self.__use_ssh_tunnel:
             desc, host, port = ('SSH ', self.ssh_conn_cfg.host, self.ssh_conn_cfg.port)
@@ -729,6 +882,58 @@ class DashNetworkConnectionCfg(object):
         desc = '%s%s:%s' % (desc, (host if host else '???'), (port if port else '???'))
         return desc
 
+    def register_success(self, call_duration=None):
+        if call_duration is not None:
+            if self.avg_latency is None:
+                self.avg_latency = call_duration
+            else:
+                self.avg_latency += (call_duration - self.avg_latency) * CONN_HEALTH_SAMPLE_WEIGHT
+        self.error_rate -= self.error_rate * CONN_HEALTH_SAMPLE_WEIGHT
+        self.failure_count = 0
+        self.retry_after = 0
+
+    def register_failure(self):
+        self.error_rate += (1.0 - self.error_rate) * CONN_HEALTH_SAMPLE_WEIGHT
+        self.failure_count += 1
+        self.retry_after = time.time() + min(CONN_BACKOFF_BASE_TIME * 2 ** (self.failure_count - 1),
+                                             CONN_BACKOFF_MAX_TIME)
+
+    def is_in_backoff(self, now=None):
+        if now is None:
+            now = time.time()
+        return self.retry_after > now
+
+    def get_health_score(self):
+        """
+        Returns the connection's score; the lower the value, the better the connection.
+        """
+        latency = self.avg_latency if self.avg_latency is not None else CONN_DEFAULT_LATENCY
+        return latency * (1.0 + 4.0 * self.error_rate)
+
+    def is_health_save_needed(self):
+        """
+        Returns True if the health score has changed enough since the statistics were saved last time to save
+        them again.
+        """
+        if self.saved_health_score is None:
+            return True
+        return abs(self.get_health_score() - self.saved_health_score) > \
+            self.saved_health_score * CONN_HEALTH_SAVE_THRESHOLD
+
+    def get_health_data(self):
+        return {'avg_latency': round(self.avg_latency, 3) if self.avg_latency is not None else None,
+                'error_rate': round(self.error_rate, 4),
+                'failure_count': self.failure_count, 'retry_after': int(self.retry_after)}
+
+    def set_health_data(self, data):
+        try:
+            self.avg_latency = data.get('avg_latency')
+            self.error_rate = float(data.get('error_rate', 0.0))
+            self.failure_count = int(data.get('failure_count', 0))
+            self.retry_after = int(data.get('retry_after', 0))
+        except Exception:
+            logging.exception('Error while restoring connection health data')
+
     def get_conn_id(self):
         """
         Returns identifier of this connection, built on attributes that uniquely characteraize the connection. 
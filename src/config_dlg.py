@@ -654,16 +654,16 @@ class ConfigDlg(QDialog, Ui_ConfigDlg, WndUtils):
                 ssh.connect()
                 dashd_conf = ssh.find_dashd_config()
                 self.disable_cfg_update = True
-                if isinstance(dashd_conf, tuple) and len(dashd_conf) >= 3:
-                    if not dashd_conf[0]:
+                if isinstance(dashd_conf, dict):
+                    if not dashd_conf['dashd_running']:
                         self.infoMsg('Remore Dash daemon seems to be shut down')
-                    elif not dashd_conf[1]:
+                    elif not dashd_conf['conf_file']:
                         self.infoMsg('Could not find remote dashd.conf file')
                     else:
-                        file = dashd_conf[2]
+                        file = dashd_conf['config']
                         rpcuser = file.get('rpcuser', '')
                         rpcpassword = file.get('rpcpassword', '')
-                        rpcport = file.get('rpcport', '9998')
+                        rpcport = str(dashd_conf['rpc_port'])
                         modified = False
                         if rpcuser:
                             modified = modified or (cfg.username != rpcuser)
@@ -3,12 +3,18 @@
 # Author: Bertrand256
 # Created on: 2017-03
 
-import os
+import atexit
+import base64
+import bisect
+import codecs
+import itertools
+import queue
 import re
 import socket
 import sqlite3
 import ssl
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import time
 import datetime
 import logging
@@ -19,14 +25,16 @@ from bitcoinrpc.authproxy import AuthServiceProxy, JSONRPCException
 from paramiko import AuthenticationException, PasswordRequiredException, SSHException
 from paramiko.ssh_exception import NoValidConnectionsError
 from app_config import AppConfig
-from random import randint
 from wnd_utils import WndUtils
 import socketserver
 import select
 from os.path import expanduser
 from PyQt5.QtWidgets import QMessageBox
+from urllib.parse import urlparse
 from psw_cache import SshPassCache, UserCancelledConnection
-from common import AttrsProtected
+from rpc_cache import is_immutable_result
+from db_intf import DB_UPSERT_SUPPORTED
+import thread_utils
 
 try:
     import http.client as httplib
@@ -38,6 +46,70 @@ except ImportError:
 # features
 MASTERNODES_CACHE_VALID_SECONDS = 60 * 60  # 60 minutes
 
+# maximum number of simultaneous keep-alive connections to the RPC endpoint; threads calling RPC methods
+# concurrently (proposals dialog, main window's status refresh, payout dialog) use separate connections
+RPC_CONNECTION_POOL_SIZE = 4
+
+# upper bounds (in seconds) of the RPC call latency histogram buckets
+RPC_METRICS_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# timeout (in seconds) of the concurrent connection probes performed when connecting for the first time
+CONN_PROBE_TIMEOUT = 5
+
+# maximum number of calls sent in one JSON-RPC batch request
+RPC_BATCH_MAX_SIZE = 500
+
+# RPC methods which results are kept in the RPC response cache
+RPC_CACHED_METHODS = ('getrawtransaction', 'getblockhash', 'getblockheader')
+
+# size (in bytes) of the buffers used when forwarding data through the SSH tunnel
+SSH_FORWARD_BUFFER_SIZE = 65536
+
+# interval (in seconds) of the keepalive packets sent through the SSH transport
+SSH_KEEPALIVE_INTERVAL = 30
+
+# shell script executed on the remote host (in a single SSH channel) to find the running dashd and its
+# configuration file; prints 'key=value' lines followed by the contents of the configuration file
+DASHD_PROBE_SCRIPT = """
+pid=$(ps -C dashd -o pid= 2>/dev/null | head -n 1 | tr -d ' ')
+echo "pid=$pid"
+datadir=
+conf=
+exe=
+cwd=
+if [ -n "$pid" ]; then
+  old_ifs=$IFS
+  IFS='
+'
+  for arg in $(tr '\\0' '\\n' < /proc/$pid/cmdline 2>/dev/null); do
+    case "$arg" in
+      -datadir=*) datadir="${arg#-datadir=}";;
+      -conf=*) conf="${arg#-conf=}";;
+    esac
+  done
+  IFS=$old_ifs
+  exe=$(readlink /proc/$pid/exe 2>/dev/null)
+  cwd=$(readlink /proc/$pid/cwd 2>/dev/null)
+fi
+for dir in "$datadir" "${exe%/*}/.dashcore" "$cwd/.dashcore" "$HOME/.dashcore" "/home/$USER/.dashcore"; do
+  case "$dir" in
+    ""|/.dashcore) continue;;
+  esac
+  case "$conf" in
+    "") file="$dir/dash.conf";;
+    /*) file="$conf";;
+    *) file="$dir/$conf";;
+  esac
+  if [ -r "$file" ]; then
+    echo "datadir=$dir"
+    echo "conf_file=$file"
+    echo "--- dash.conf ---"
+    cat "$file"
+    break
+  fi
+done
+"""
+
 
 class ForwardServer (socketserver.ThreadingTCPServer):
     daemon_threads = True
@@ -60,34 +132,61 @@ class Handler(socketserver.BaseRequestHandler):
             return
 
         try:
-            while True:
-                r, w, x = select.select([self.request, chan], [], [], 10)
-                if self.request in r:
-                    data = self.request.recv(1024)
-                    if len(data) == 0:
-                        break
-                    chan.send(data)
-                if chan in r:
-                    data = chan.recv(1024)
-                    if len(data) == 0:
-                        break
-                    self.request.send(data)
+            self.forward(self.request, chan)
             logging.debug('Finishing Handler.handle')
         except socket.error as e:
             logging.error('Handler socker.error occurred: ' + str(e))
         except Exception as e:
             logging.error('Handler exception occurred: ' + str(e))
-            print(str(e))
         finally:
             chan.close()
             self.request.close()
 
+    @staticmethod
+    def forward(sock, chan, buffer_size=SSH_FORWARD_BUFFER_SIZE):
+        """
+        Moves data between the local socket and the SSH channel until one of them gets closed. Data from the
+        socket is read into a preallocated buffer (no allocation per chunk); sendall is used in both directions,
+        so partial writes are completed before reading the next chunk.
+        :param sock: local socket
+        :param chan: paramiko channel (or any object with recv/sendall/fileno, eg. another socket)
+        :param buffer_size: maximum size of a single chunk
+        """
+        buf = bytearray(buffer_size)
+        buf_view = memoryview(buf)
+        chan_recv_into = getattr(chan, 'recv_into', None)
+        while True:
+            r, w, x = select.select([sock, chan], [], [], 10)
+            if sock in r:
+                size = sock.recv_into(buf)
+                if size == 0:
+                    break
+                chan.sendall(buf_view[:size])
+                rpc_metrics.register_ssh_forward(size, 0)
+            if chan in r:
+                if chan_recv_into:
+                    size = chan_recv_into(buf)
+                    data = buf_view[:size]
+                else:
+                    data = chan.recv(buffer_size)
+                    size = len(data)
+                if size == 0:
+                    break
+                sock.sendall(data)
+                rpc_metrics.register_ssh_forward(0, size)
+
 
 class SSHTunnelThread(QThread):
     def __init__(self, local_port, remote_ip, remote_port, transport, ready_event,
                  on_connection_broken_callback=None, on_finish_thread_callback=None):
+        """
+        :param local_port: local port number to listen on; 0 means a free port assigned by the OS, its number
+            is available in the local_port attribute after ready_event is set
+        :param ready_event: set when the local port has been bound (or binding failed - see the error attribute)
+        """
         QThread.__init__(self)
         self.local_port = local_port
+        self.error = None
         self.remote_ip = remote_ip
         self.remote_port = remote_port
         self.transport = transport
@@ -103,6 +202,7 @@ class SSHTunnelThread(QThread):
     def stop(self):
         if self.forward_server:
             self.forward_server.shutdown()
+            self.forward_server.server_close()
 
     def handler_broken_connection_callback(self):
         try:
@@ -120,9 +220,16 @@ class SSHTunnelThread(QThread):
             broken_conn_callback = self.handler_broken_connection_callback
 
         try:
-            self.ready_event.set()
-            self.forward_server = ForwardServer(('127.0.0.1', self.local_port), SubHander)
-            self.forward_server.serve_forever()
+            try:
+                self.forward_server = ForwardServer(('127.0.0.1', self.local_port), SubHander)
+                self.local_port = self.forward_server.server_address[1]
+            except Exception as e:
+                self.error = e
+                raise
+            finally:
+                self.ready_event.set()
+            # short poll interval makes stopping of the tunnel (on connection reset) quick
+            self.forward_server.serve_forever(poll_interval=0.1)
             logging.debug('Stopped local port forwarding 127.0.0.1:%s -> %s:%s' %
                           (str(self.local_port), self.remote_ip, str(self.remote_port)))
             if self.on_finish_thread_callback:
@@ -141,6 +248,420 @@ class DashdConnectionError(Exception):
         self.org_exception = org_exception
 
 
+class RpcMethodStats(object):
+    """ Statistics of calls of a single RPC method through a single connection config. """
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * (len(RPC_METRICS_LATENCY_BUCKETS) + 1)  # last one for calls above the last bound
+        self.bytes_received = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def get_percentile(self, percentile):
+        """
+        Returns the upper bound of the histogram bucket in which the given percentile of call times falls
+        (None if above the last bucket bound).
+        """
+        total = sum(self.histogram)
+        if not total:
+            return 0.0
+        threshold = total * percentile / 100
+        cumulated = 0
+        for idx, cnt in enumerate(self.histogram):
+            cumulated += cnt
+            if cumulated >= threshold:
+                return RPC_METRICS_LATENCY_BUCKETS[idx] if idx < len(RPC_METRICS_LATENCY_BUCKETS) else None
+        return None
+
+    def to_dict(self):
+        return {'count': self.count,
+                'errors': self.errors,
+                'retries': self.retries,
+                'avg_time': self.total_time / self.count if self.count else 0.0,
+                'max_time': self.max_time,
+                'p90_time': self.get_percentile(90),
+                'histogram': dict(zip([str(b) for b in RPC_METRICS_LATENCY_BUCKETS] + ['inf'], self.histogram)),
+                'bytes_received': self.bytes_received,
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses}
+
+
+class RpcMetrics(object):
+    """
+    Registry of the RPC calls statistics, kept per method and per connection config, to find out which dash
+    nodes and which operations are slow.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}  # key: tuple (method name, connection description), value: RpcMethodStats
+        self.failovers = {}  # key: description of the connection, which failed, value: count
+        self.ssh_forward = {'bytes_sent': 0, 'chunks_sent': 0, 'bytes_received': 0, 'chunks_received': 0}
+        self.start_time = time.time()
+
+    def get_stats(self, method, conn_desc):
+        key = (method, conn_desc)
+        st = self.stats.get(key)
+        if st is None:
+            st = RpcMethodStats()
+            self.stats[key] = st
+        return st
+
+    def register_call(self, method, conn_desc, duration, retries=0, bytes_received=0, error=False):
+        with self.lock:
+            st = self.get_stats(method, conn_desc)
+            st.count += 1
+            if error:
+                st.errors += 1
+            st.retries += retries
+            st.total_time += duration
+            st.max_time = max(st.max_time, duration)
+            st.bytes_received += bytes_received
+            st.histogram[bisect.bisect_left(RPC_METRICS_LATENCY_BUCKETS, duration)] += 1
+
+    def register_cache_access(self, method, conn_desc, hits, misses):
+        with self.lock:
+            st = self.get_stats(method, conn_desc)
+            st.cache_hits += hits
+            st.cache_misses += misses
+
+    def register_failover(self, conn_desc):
+        with self.lock:
+            self.failovers[conn_desc] = self.failovers.get(conn_desc, 0) + 1
+
+    def register_ssh_forward(self, bytes_sent, bytes_received):
+        """ Registers a chunk of data forwarded through the SSH tunnel (to or from the remote side). """
+        with self.lock:
+            if bytes_sent:
+                self.ssh_forward['bytes_sent'] += bytes_sent
+                self.ssh_forward['chunks_sent'] += 1
+            if bytes_received:
+                self.ssh_forward['bytes_received'] += bytes_received
+                self.ssh_forward['chunks_received'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.stats.clear()
+            self.failovers.clear()
+            for key in self.ssh_forward:
+                self.ssh_forward[key] = 0
+            self.start_time = time.time()
+
+    def to_dict(self):
+        """
+        Returns a snapshot of the statistics, taken with the lock acquired; unlike the stats dict itself, it can
+        be safely used while RPC calls are performed by other threads.
+        """
+        with self.lock:
+            methods = []
+            for (method, conn_desc), st in sorted(self.stats.items()):
+                d = st.to_dict()
+                d['method'] = method
+                d['connection'] = conn_desc
+                methods.append(d)
+            return {'start_time': int(self.start_time),
+                    'time': int(time.time()),
+                    'methods': methods,
+                    'failovers': dict(self.failovers),
+                    'ssh_forward': dict(self.ssh_forward)}
+
+    def dump_json(self, file_name):
+        with open(file_name, 'w') as f_ptr:
+            simplejson.dump(self.to_dict(), f_ptr, indent=2)
+
+
+# metrics of all RPC calls performed by the app
+rpc_metrics = RpcMetrics()
+
+
+class RpcRecorder(object):
+    """
+    Records results of the RPC calls (keyed by method and params) to a JSON file, which can be served by
+    src/test/fake_dashd.py in replay mode to benchmark and test the RPC dependent code without a live node.
+    """
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.lock = threading.Lock()
+        self.calls = {}  # key: method + params (json), value: dict with keys method, params and result or error
+        self.modified = False
+
+    def register(self, method, params, result=None, error=None):
+        call = {'method': method, 'params': list(params)}
+        if error is not None:
+            call['error'] = error
+        else:
+            call['result'] = result
+        with self.lock:
+            self.calls[method + ':' + simplejson.dumps(call['params'])] = call
+            self.modified = True
+
+    def save(self):
+        with self.lock:
+            if self.modified:
+                try:
+                    with open(self.file_name, 'w') as f_ptr:
+                        simplejson.dump({'calls': list(self.calls.values())}, f_ptr)
+                    self.modified = False
+                    logging.info('Saved %d RPC calls to %s' % (len(self.calls), self.file_name))
+                except Exception:
+                    logging.exception('Error while saving recorded RPC calls')
+
+
+class RecordingProxy(object):
+    """ Wraps AuthServiceProxy to pass results of all calls to the RpcRecorder. """
+    def __init__(self, proxy, recorder):
+        self.proxy = proxy
+        self.recorder = recorder
+
+    def __getattr__(self, name):
+        if name.startswith('__') and name.endswith('__'):
+            raise AttributeError(name)
+
+        def call(*args):
+            try:
+                result = getattr(self.proxy, name)(*args)
+            except JSONRPCException as e:
+                self.recorder.register(name, args, error=e.error)
+                raise
+            self.recorder.register(name, args, result=result)
+            return result
+        return call
+
+
+# recorder of the RPC traffic; active when the app is started with the --rpc-record argument
+rpc_recorder = None
+
+
+def start_rpc_recording(file_name):
+    global rpc_recorder
+    if rpc_recorder is None:
+        rpc_recorder = RpcRecorder(file_name)
+        atexit.register(rpc_recorder.save)
+        logging.info('Recording RPC traffic to: ' + file_name)
+
+
+class RpcConnection(object):
+    """
+    Single authenticated, keep-alive HTTP(S) connection to the dash RPC endpoint. Objects of this class are
+    handed out by RpcConnectionPool; each one is used by a single thread at a time.
+    """
+    batch_id_counter = itertools.count(1)
+
+    def __init__(self, rpc_url, host, port, use_ssl, timeout, generation):
+        if use_ssl:
+            self.http_conn = httplib.HTTPSConnection(host, port, timeout=timeout,
+                                                     context=ssl._create_unverified_context())
+        else:
+            self.http_conn = httplib.HTTPConnection(host, port, timeout=timeout)
+        self.rpc_url = rpc_url
+        self.bytes_received = 0  # size of the responses received since the last take_bytes_received call
+        # total time (in seconds) between sending requests and receiving response headers and the number of
+        # requests since the last take_round_trip_time call
+        self.round_trip_time = 0.0
+        self.round_trip_count = 0
+        self.request_time = None
+        orig_request = self.http_conn.request
+        orig_getresponse = self.http_conn.getresponse
+
+        def request_timed(*args, **kwargs):
+            self.request_time = time.time()
+            return orig_request(*args, **kwargs)
+
+        def getresponse_counting():
+            response = orig_getresponse()
+            if self.request_time is not None:
+                self.round_trip_time += time.time() - self.request_time
+                self.round_trip_count += 1
+                self.request_time = None
+            length = response.getheader('Content-Length')
+            if length:
+                self.bytes_received += int(length)
+            return response
+
+        self.http_conn.request = request_timed
+        self.http_conn.getresponse = getresponse_counting
+        self.proxy = AuthServiceProxy(rpc_url, timeout=1000, connection=self.http_conn)
+        if rpc_recorder:
+            self.proxy = RecordingProxy(self.proxy, rpc_recorder)
+        self.generation = generation  # pool generation the connection was created for
+        url = urlparse(rpc_url)
+        self.url_path = url.path if url.path else '/'
+        self.url_host = url.hostname
+        auth = ('%s:%s' % (url.username, url.password)).encode('utf8')
+        self.auth_header = b'Basic ' + base64.b64encode(auth)
+
+    def batch_call(self, calls):
+        """
+        Sends a list of calls as one JSON-RPC 2.0 batch (array) request.
+        :param calls: list of tuples (method name, list of params)
+        :return: list of tuples (result, error) in the order of calls; error is a JSONRPCException object if
+            the call failed, None otherwise. Returns None if the server does not support batch requests.
+        """
+        batch_data = []
+        for method, params in calls:
+            batch_data.append({"jsonrpc": "2.0", "method": method, "params": list(params),
+                               "id": next(RpcConnection.batch_id_counter)})
+
+        self.http_conn.request('POST', self.url_path, simplejson.dumps(batch_data),
+                               {'Host': self.url_host,
+                                'User-Agent': 'DashMasternodeTool',
+                                'Authorization': self.auth_header,
+                                'Content-type': 'application/json'})
+        http_response = self.http_conn.getresponse()
+        response_data = http_response.read()
+        if http_response.getheader('Content-Type') != 'application/json':
+            if http_response.status in (401, 403):
+                raise JSONRPCException({'code': -342, 'message': 'non-JSON HTTP response with \'%i %s\' from server' %
+                                                                 (http_response.status, http_response.reason)})
+            return None
+
+        response = simplejson.loads(response_data.decode('utf8'), use_decimal=True)
+        if not isinstance(response, list):
+            return None
+
+        responses_by_id = {}
+        for r in response:
+            if isinstance(r, dict):
+                responses_by_id[r.get('id')] = r
+
+        results = []
+        for req in batch_data:
+            r = responses_by_id.get(req['id'])
+            if r is None:
+                results.append((None, JSONRPCException({'code': -343, 'message': 'missing JSON-RPC result'})))
+            elif r.get('error') is not None:
+                results.append((None, JSONRPCException(r['error'])))
+            else:
+                results.append((r.get('result'), None))
+            if rpc_recorder and r is not None:
+                rpc_recorder.register(req['method'], req['params'], result=r.get('result'), error=r.get('error'))
+        return results
+
+    def take_bytes_received(self):
+        ret = self.bytes_received
+        self.bytes_received = 0
+        return ret
+
+    def take_round_trip_time(self):
+        """
+        Returns the average time of waiting for the node's response to a request sent since the previous call
+        (excluding opening the connection, reading and parsing response bodies) or None if no request has been
+        sent in the meantime.
+        """
+        ret = self.round_trip_time / self.round_trip_count if self.round_trip_count else None
+        self.round_trip_time = 0.0
+        self.round_trip_count = 0
+        return ret
+
+    def set_timeout(self, timeout):
+        self.http_conn.timeout = timeout
+        if self.http_conn.sock:
+            self.http_conn.sock.settimeout(timeout)
+
+    def close(self):
+        try:
+            self.http_conn.close()
+        except Exception:
+            logging.exception('Exception while closing RPC connection')
+
+
+class RpcConnectionPool(object):
+    """
+    Bounded pool of RpcConnection objects sharing the same RPC endpoint (direct or the local end of
+    an SSH tunnel). Each change of the endpoint (reconnect, switching to another connection config) starts
+    a new generation of the pool; connections from previous generations are closed when given back.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.cond = threading.Condition()
+        self.idle = []
+        self.connections_count = 0  # number of connections (idle + leased) of the current generation
+        self.generation = 0
+        self.rpc_url = None
+        self.host = None
+        self.port = None
+        self.use_ssl = False
+        self.timeout = 20
+        self.batch_supported = True  # False if the endpoint rejects JSON-RPC batch requests
+
+    def set_endpoint(self, rpc_url, host, port, use_ssl, timeout, max_size=None):
+        """
+        Starts a new generation of the pool for the endpoint.
+        :param max_size: new maximum number of connections; None: leave it unchanged
+        """
+        with self.cond:
+            self.clear()
+            if max_size is not None:
+                self.max_size = max_size
+            self.rpc_url = rpc_url
+            self.host = host
+            self.port = port
+            self.use_ssl = use_ssl
+            self.timeout = timeout
+            self.batch_supported = True
+
+    def create_connection(self, timeout=None):
+        """ Creates a connection for the current endpoint without adding it to the pool. """
+        return RpcConnection(self.rpc_url, self.host, self.port, self.use_ssl,
+                             timeout if timeout is not None else self.timeout, self.generation)
+
+    def add_idle(self, conn):
+        """ Adds an already established connection (eg. used for testing the endpoint) to the pool. """
+        with self.cond:
+            if conn.generation == self.generation and self.connections_count < self.max_size:
+                self.connections_count += 1
+                self.idle.append(conn)
+                self.cond.notify()
+            else:
+                conn.close()
+
+    def acquire(self):
+        with self.cond:
+            while True:
+                if not self.rpc_url:
+                    raise Exception('RPC endpoint not configured')
+                if self.idle:
+                    return self.idle.pop()
+                if self.connections_count < self.max_size:
+                    self.connections_count += 1
+                    generation = self.generation
+                    break
+                self.cond.wait()
+        try:
+            return self.create_connection()
+        except Exception:
+            with self.cond:
+                if generation == self.generation:
+                    self.connections_count -= 1
+                self.cond.notify()
+            raise
+
+    def release(self, conn, discard=False):
+        with self.cond:
+            if conn.generation == self.generation:
+                if discard:
+                    conn.close()
+                    self.connections_count -= 1
+                else:
+                    self.idle.append(conn)
+            else:
+                conn.close()
+            self.cond.notify()
+
+    def clear(self):
+        """ Closes all idle connections and invalidates the leased ones (they will be closed on release). """
+        with self.cond:
+            self.generation += 1
+            for conn in self.idle:
+                conn.close()
+            self.idle.clear()
+            self.connections_count = 0
+            self.cond.notify_all()
+
+
 class DashdSSH(object):
     def __init__(self, host, port, username, on_connection_broken_callback=None):
         self.host = host
@@ -153,44 +674,93 @@ class DashdSSH(object):
         self.connection_broken = False
         self.ssh_thread = None
         self.on_connection_broken_callback = on_connection_broken_callback
+        self.connect_lock = thread_utils.EnhRLock(stackinfo_skip_lines=1)
 
     def __del__(self):
         self.disconnect()
 
-    def remote_command(self, cmd):
+    def remote_command(self, cmd, input_data=None):
+        """
+        Executes a command on the remote host and reads its whole output (until EOF).
+        :param cmd: command to execute
+        :param input_data: optional data (str) sent to the standard input of the command
+        :return: list of the output lines
+        """
         channel = None
         try:
             channel = self.ssh.get_transport().open_session()
             channel.exec_command(cmd)
+            if input_data is not None:
+                channel.sendall(input_data.encode('utf-8'))
+                channel.shutdown_write()
+
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            output = []
+            while True:
+                data = channel.recv(65536)
+                if not data:
+                    break
+                output.append(decoder.decode(data))
+            output.append(decoder.decode(b'', final=True))
             ret_code = channel.recv_exit_status()
 
             if ret_code == 0:
-                for idx in range(1, 20):
-                    if channel.recv_ready():
-                        break
-                    time.sleep(0.1)
-                if not channel.recv_ready():
-                    raise Exception('Data not ready')
-                data = channel.recv(500)
-                return data.decode().split('\n')
+                return ''.join(output).split('\n')
             else:
-                for idx in range(1, 20):
-                    if channel.recv_stderr_ready():
-                        break
-                    time.sleep(0.1)
-                if channel.recv_stderr_ready():
-                    data = channel.recv_stderr(500)
-                    error = data.decode()
-                    raise Exception(error)
+                error = ''
+                while channel.recv_stderr_ready():
+                    error += channel.recv_stderr(65536).decode('utf-8', errors='replace')
+                if error:
+                    raise Exception(error.strip())
                 else:
                     raise UnknownError('Unknown error executing remote command: ' + cmd)
         finally:
             if channel:
                 channel.close()
 
+    def is_transport_active(self):
+        """ Returns True if the SSH transport is established and alive (has not been closed by any side). """
+        if self.ssh:
+            transport = self.ssh.get_transport()
+            return transport is not None and transport.is_active()
+        return False
+
     def connect(self):
+        """
+        Establishes the SSH session. If the transport established before is still alive, it is reused, so
+        there is no key exchange nor authentication (and thus no password prompt) on subsequent calls.
+        """
+        self.connect_lock.acquire()
+        try:
+            if self.connected and self.is_transport_active():
+                return
+            self.connect_internal()
+        finally:
+            self.connect_lock.release()
+
+    def connect_background(self):
+        """
+        Re-establishes the SSH session in a background thread; a subsequent call of connect waits for its
+        completion. Errors are only logged here - they will be raised again on the next call of connect.
+        """
+        def connect_thread():
+            try:
+                tm_begin = time.time()
+                self.connect()
+                logging.info('SSH session re-established in %.3fs' % (time.time() - tm_begin))
+            except Exception as e:
+                logging.warning('Could not re-establish SSH session in background: ' + str(e))
+
+        threading.Thread(target=connect_thread, name='SSHReconnectThread', daemon=True).start()
+
+    def connect_internal(self):
         import paramiko
-        if self.ssh is None:
+        if self.ssh is not None:
+            # the transport is dead; the tunnel using it has to be closed as well
+            self.close_tunnel()
+            self.ssh.close()
+            self.connected = False
+        else:
             self.ssh = paramiko.SSHClient()
             self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         password = None
@@ -199,6 +769,7 @@ class DashdSSH(object):
         while True:
             try:
                 self.ssh.connect(self.host, port=int(self.port), username=self.username, password=password)
+                self.ssh.get_transport().set_keepalive(SSH_KEEPALIVE_INTERVAL)
                 self.connected = True
                 if password:
                     SshPassCache.save_password(self.username, self.host, password)
@@ -242,90 +813,93 @@ class DashdSSH(object):
     def on_tunnel_thread_finish(self):
         self.ssh_thread = None
 
+    def close_tunnel(self):
+        """ Stops the local port forwarding, leaving the SSH transport open for later use. """
+        ssh_thread = self.ssh_thread
+        if ssh_thread:
+            ssh_thread.stop()
+            ssh_thread.wait(5000)
+            self.ssh_thread = None
+
     def open_tunnel(self, local_port, remote_ip, remote_port):
+        """
+        Starts forwarding of the local port to remote_ip:remote_port through the SSH session.
+        :param local_port: local port number; pass 0 to let the OS assign a free one
+        :return: number of the local port the tunnel listens on
+        """
         if self.connected:
             if self.ssh_thread is not None:
                 raise Exception('SSH tunnel already open.')
 
             ready_event = threading.Event()
-            self.ssh_thread = SSHTunnelThread(local_port, remote_ip, remote_port, self.ssh.get_transport(), ready_event,
-                                              on_connection_broken_callback=self.on_connection_broken_callback,
-                                              on_finish_thread_callback=self.on_tunnel_thread_finish)
-            self.ssh_thread.start()
-            ready_event.wait(10)
+            ssh_thread = SSHTunnelThread(local_port, remote_ip, remote_port, self.ssh.get_transport(), ready_event,
+                                         on_connection_broken_callback=self.on_connection_broken_callback,
+                                         on_finish_thread_callback=self.on_tunnel_thread_finish)
+            self.ssh_thread = ssh_thread
+            ssh_thread.start()
+            if not ready_event.wait(10):
+                self.close_tunnel()
+                raise Exception('Timeout while starting SSH tunnel')
+            if ssh_thread.error:
+                self.ssh_thread = None
+                raise Exception('Cannot start SSH tunnel: ' + str(ssh_thread.error))
             logging.debug('Started local port forwarding 127.0.0.1:%s -> %s:%s' %
-                          (str(local_port), remote_ip, str(remote_port)))
+                          (str(ssh_thread.local_port), remote_ip, str(remote_port)))
+            return ssh_thread.local_port
         else:
             raise Exception('SSH not connected')
 
     def find_dashd_config(self):
         """
         Try to read configuration of remote dash daemon. In particular we need parameters concering rpc
-        configuration.
-        :return: tuple (dashd_running, dashd_config_found, dashd config file contents as dict)
-                or error string in error occured
+        configuration. All the information is collected by a single script (DASHD_PROBE_SCRIPT) executed on
+        the remote host, so it costs one round trip.
+        :return: dict with keys: 'dashd_running' (bool), 'pid' (int or None), 'datadir' and 'conf_file' (str or
+                None if the configuration file was not found), 'config' (dict of the configuration file
+                parameters), 'rpc_port' (int); or error string in error occured
         """
-        dashd_running = False
-        dashd_config_found = False
         if not self.ssh:
             raise Exception('SSH session not ready')
         try:
-            # find dashd process id if running
-            try:
-                pids = self.remote_command('ps -C "dashd" -o pid')
-            except UnknownError:
-                raise Exception('is dashd running on the remote machine?')
-            pid = None
-            if isinstance(pids, list):
-                pids = [pid.strip() for pid in pids]
-            if len(pids) >= 2 and pids[0] == 'PID' and re.match('\d+', pids[1]):
-                pid = pids[1]
-            elif len(pids) >= 1 and re.match('\d+', pids[0]):
-                pid = pids[1]
-            config = {}
-            if pid:
-                dashd_running = True
-                # using dashd pid find its executable path and then .dashcore directory and finally dash.conf file
-                executables = self.remote_command('ls -l /proc/' + str(pid) + '/exe')
-                if executables and len(executables) >= 1:
-                    elems = executables[0].split('->')
-                    if len(elems) == 2:
-                        executable = elems[1].strip()
-                        dashd_dir = os.path.dirname(executable)
-                        dash_conf_file = dashd_dir + '/.dashcore/dash.conf'
-                        conf_lines = []
-                        try:
-                            conf_lines = self.remote_command('cat ' + dash_conf_file)
-                        except Exception as e:
-                            # probably error no such file or directory
-                            # try to read dashd's cwd + cmdline
-                            cwd_lines = self.remote_command('ls -l /proc/' + str(pid) + '/cwd')
-                            if cwd_lines:
-                                elems = cwd_lines[0].split('->')
-                                if len(elems) >= 2:
-                                    cwd = elems[1]
-                                    dash_conf_file = cwd + '/.dashcore/dash.conf'
-                                    try:
-                                        conf_lines = self.remote_command('cat ' + dash_conf_file)
-                                    except Exception as e:
-                                        # second method did not suceed, so assume, that conf file is located
-                                        # i /home/<username>/.dashcore directory
-                                        dash_conf_file = '/home/' + self.username + '/.dashcore/dash.conf'
-                                        conf_lines = self.remote_command('cat ' + dash_conf_file)
-
-                        for line in conf_lines:
-                            elems = [e.strip() for e in line.split('=')]
-                            if len(elems) == 2:
-                                config[elems[0]] = elems[1]
-                        dashd_config_found = True
-            return dashd_running, dashd_config_found, config
+            lines = self.remote_command('sh -s', input_data=DASHD_PROBE_SCRIPT)
+            ret = {'dashd_running': False, 'pid': None, 'datadir': None, 'conf_file': None, 'config': {}}
+            conf_lines = []
+            for idx, line in enumerate(lines):
+                if line == '--- dash.conf ---':
+                    conf_lines = lines[idx + 1:]
+                    break
+                key, sep, value = line.partition('=')
+                if sep and key in ('pid', 'datadir', 'conf_file') and value:
+                    ret[key] = value
+
+            if ret['pid'] and re.match(r'\d+$', ret['pid']):
+                ret['pid'] = int(ret['pid'])
+                ret['dashd_running'] = True
+            else:
+                ret['pid'] = None
+
+            config = ret['config']
+            for line in conf_lines:
+                line = line.strip()
+                if not line or line.startswith('#') or line.startswith('['):
+                    continue
+                key, sep, value = line.partition('=')
+                if sep and key.strip() not in config:
+                    config[key.strip()] = value.strip()
+
+            if config.get('rpcport'):
+                ret['rpc_port'] = int(config.get('rpcport'))
+            elif config.get('testnet', '0') == '1':
+                ret['rpc_port'] = 19998
+            else:
+                ret['rpc_port'] = 9998
+            return ret
         except Exception as e:
             return str(e)
 
     def disconnect(self):
         if self.ssh:
-            if self.ssh_thread:
-                self.ssh_thread.stop()
+            self.close_tunnel()
             self.ssh.close()
             del self.ssh
             self.ssh = None
@@ -357,70 +931,99 @@ def control_rpc_call(func):
         ret = None
         last_exception = None
         self = args[0]
+        if self.get_leased_rpc_connection() is not None:
+            # nested call of a decorated method: the outer call owns the connection and handles errors
+            return func(*args, **kwargs)
+
         self.mark_call_begin()
-        try:
-            logging.debug('Trying to acquire http_lock')
-            self.http_lock.acquire()
-            logging.debug('Acquired http_lock')
-            for try_nr in range(1, 5):
+        method_name = func.__name__
+        if method_name == 'call_many' and len(args) > 1:
+            method_name += ':' + str(args[1])
+        call_begin_time = time.time()
+        retries = 0
+        for try_nr in range(1, 5):
+            # connection config used in this attempt; if another thread has switched config in the meantime,
+            # we don't switch it again, but just retry with the new one
+            attempt_conn_def = self.cur_conn_def
+            try:
                 try:
-                    try:
-                        logging.debug('Beginning call of "' + str(func) + '"')
-                        begin_time = time.time()
-                        ret = func(*args, **kwargs)
-                        logging.debug('Finished call of "' + str(func) + '". Call time: ' +
-                                      str(time.time() - begin_time) + 's.')
-                        last_exception = None
-                        self.mark_cur_conn_cfg_is_ok()
-                        break
-
-                    except (ConnectionResetError, ConnectionAbortedError, httplib.CannotSendRequest,
-                            BrokenPipeError) as e:
-                        logging.error('Error while calling of "' + str(func) + ' (1)". Details: ' + str(e))
-                        last_exception = e
-                        self.reset_connection()
-
-                    except JSONRPCException as e:
-                        logging.error('Error while calling of "' + str(func) + ' (2)". Details: ' + str(e))
-                        if e.code == -5 and e.message == 'No information available for address':
-                            raise DashdIndexException(e)
-                        elif e.error.get('message','').find('403 Forbidden'):
-                            self.http_conn.close()
-                            raise DashdConnectionError(e)
-                        else:
-                            self.http_conn.close()
-
-                    except (socket.gaierror, ConnectionRefusedError, TimeoutError, socket.timeout,
-                            NoValidConnectionsError) as e:
-                        # exceptions raised most likely by not functioning dashd node; try to switch to another node
-                        # if there is any in the config
-                        logging.error('Error while calling of "' + str(func) + ' (3)". Details: ' + str(e))
+                    logging.debug('Beginning call of "' + str(func) + '"')
+                    begin_time = time.time()
+                    ret = func(*args, **kwargs)
+                    logging.debug('Finished call of "' + str(func) + '". Call time: ' +
+                                  str(time.time() - begin_time) + 's.')
+                    last_exception = None
+                    conn = self.get_leased_rpc_connection()
+                    # only the HTTP round trip is a latency sample; calls served from cache give no sample
+                    self.mark_cur_conn_cfg_is_ok(call_duration=conn.take_round_trip_time() if conn else None)
+                    rpc_metrics.register_call(method_name, self.get_active_conn_description(),
+                                              time.time() - call_begin_time, retries,
+                                              conn.take_bytes_received() if conn else 0)
+                    break
+
+                except (ConnectionResetError, ConnectionAbortedError, httplib.CannotSendRequest,
+                        BrokenPipeError) as e:
+                    logging.error('Error while calling of "' + str(func) + ' (1)". Details: ' + str(e))
+                    last_exception = e
+                    self.reset_connection()
+
+                except JSONRPCException as e:
+                    logging.error('Error while calling of "' + str(func) + ' (2)". Details: ' + str(e))
+                    if e.code == -5 and e.message == 'No information available for address':
+                        raise DashdIndexException(e)
+                    elif e.error.get('message','').find('403 Forbidden'):
+                        self.release_rpc_connection(discard=True)
                         raise DashdConnectionError(e)
-
-                except DashdConnectionError as e:
-                    # try another net config if possible
-                    logging.error('Error while calling of "' + str(func) + '" (4). Details: ' + str(e))
-                    if not self.switch_to_next_config():
-                        self.last_error_message = str(e.org_exception)
-                        raise e.org_exception  # couldn't use another conn config, raise last exception
                     else:
-                        try_nr -= 1  # another config retries do not count
-                except Exception as e:
-                    logging.exception('Error while calling of "' + str(func) + ' (5)". Details: ' + str(e))
-                    raise
-        finally:
-            self.http_lock.release()
-            logging.debug('Released http_lock')
+                        self.release_rpc_connection(discard=True)
+
+                except (socket.gaierror, ConnectionRefusedError, TimeoutError, socket.timeout,
+                        NoValidConnectionsError) as e:
+                    # exceptions raised most likely by not functioning dashd node; try to switch to another node
+                    # if there is any in the config
+                    logging.error('Error while calling of "' + str(func) + ' (3)". Details: ' + str(e))
+                    self.release_rpc_connection(discard=True)
+                    raise DashdConnectionError(e)
+
+            except DashdConnectionError as e:
+                # try another net config if possible
+                logging.error('Error while calling of "' + str(func) + '" (4). Details: ' + str(e))
+                failed_conn_desc = attempt_conn_def.get_description() if attempt_conn_def else '???'
+                if not self.switch_to_next_config(attempt_conn_def):
+                    self.last_error_message = str(e.org_exception)
+                    rpc_metrics.register_call(method_name, failed_conn_desc, time.time() - call_begin_time,
+                                              retries, error=True)
+                    raise e.org_exception  # couldn't use another conn config, raise last exception
+                else:
+                    rpc_metrics.register_failover(failed_conn_desc)
+                    try_nr -= 1  # another config retries do not count
+            except Exception as e:
+                logging.exception('Error while calling of "' + str(func) + ' (5)". Details: ' + str(e))
+                rpc_metrics.register_call(method_name, self.get_active_conn_description(),
+                                          time.time() - call_begin_time, retries, error=True)
+                raise
+            finally:
+                self.release_rpc_connection()
+            retries += 1
 
         if last_exception:
+            rpc_metrics.register_call(method_name, self.get_active_conn_description(),
+                                      time.time() - call_begin_time, retries, error=True)
             raise last_exception
         return ret
     return catch_timeout_wrapper
 
 
-class Masternode(AttrsProtected):
+class Masternode(object):
+    """
+    Masternode data from the network-wide masternode list. The class uses __slots__ to keep the memory footprint
+    and the attribute access cost low, since there are thousands of instances created at each list refresh;
+    as a side effect, defining attributes not listed in __slots__ is not possible.
+    """
+    __slots__ = ('ident', 'status', 'protocol', 'payee', 'lastseen', 'activeseconds', 'lastpaidtime',
+                 'lastpaidblock', 'ip', 'db_id', 'marker', 'queue_position')
+
     def __init__(self):
-        AttrsProtected.__init__(self)
         self.ident = None
         self.status = None
         self.protocol = None
@@ -432,40 +1035,50 @@ class Masternode(AttrsProtected):
         self.ip = None
         self.db_id = None
         self.marker = None
-        self.modified = False
-        self.monitor_changes = False
         self.queue_position = None
-        self.set_attr_protection()
 
-    def __setattr__(self, name, value):
-        if hasattr(self, name) and name not in ('modified', 'marker', 'monitor_changes', '_AttrsProtected__allow_attr_definition'):
-            if self.monitor_changes and getattr(self, name) != value:
-                self.modified = True
-        super().__setattr__(name, value)
+    def get_values(self):
+        """
+        Returns a tuple of attributes read from the network (except the ident), in order of the
+        masternodelist 'full' fields; comparing these tuples is a fast way of detecting changes.
+        """
+        return (self.status, self.protocol, self.payee, self.lastseen, self.activeseconds, self.lastpaidtime,
+                self.lastpaidblock, self.ip)
 
+    def set_values(self, values):
+        self.status, self.protocol, self.payee, self.lastseen, self.activeseconds, self.lastpaidtime, \
+            self.lastpaidblock, self.ip = values
 
-def json_cache_wrapper(func, intf, cache_file_ident):
+
+def get_mn_queue_key(mn, now):
     """
-    Wrapper for saving/restoring rpc-call results inside cache files.
+    Returns the key by which enabled masternodes are ordered in the payment queue (ascending): the (estimated)
+    time since which the masternode has been waiting for the payment. The key depends on the current time, so
+    keys of all masternodes have to be computed with the same 'now' value.
     """
-    def json_call_wrapper(*args, **kwargs):
-        cache_file = intf.config.cache_dir + '/insight_dash_' + cache_file_ident + '.json'
+    if mn.lastpaidtime == 0:
+        return now - mn.activeseconds
+    else:
+        return max(mn.lastpaidtime, now - mn.activeseconds)
 
-        try:  # looking into cache first
-            j = simplejson.load(open(cache_file))
-            logging.debug('Loaded data from existing cache file: ' + cache_file)
-            return j
-        except:
-            pass
 
-        # if not found, call the function
-        j = func(*args, **kwargs)
+def json_cache_wrapper(func, intf, method):
+    """
+    Wrapper for saving/restoring rpc-call results inside the RPC response cache.
+    """
+    def json_call_wrapper(*args):
+        rpc_cache = intf.config.rpc_cache
+        if rpc_cache:
+            j = rpc_cache.get(method, args)  # looking into cache first
+            rpc_metrics.register_cache_access(method, intf.get_active_conn_description(),
+                                              1 if j is not None else 0, 1 if j is None else 0)
+            if j is not None:
+                return j
 
-        try:
-            simplejson.dump(j, open(cache_file, 'w'))
-        except Exception as e:
-            logging.exception('Cannot save data to a cache file')
-            pass
+        # if not found, call the function
+        j = func(*args)
+        if rpc_cache:
+            rpc_cache.set(method, args, j, immutable=is_immutable_result(method, args, j, intf.block_count))
         return j
 
     return json_call_wrapper
@@ -499,70 +1112,51 @@ class DashdInterface(WndUtils):
 
         self.masternodes = []  # cached list of all masternodes (Masternode object)
         self.masternodes_by_ident = {}
-        self.payment_queue = []
+        self.payment_queue = []  # enabled masternodes, in the order of the payment queue
 
         self.ssh = None
         self.window = window
         self.active = False
         self.rpc_url = None
-        self.proxy = None
-        self.http_conn = None  # HTTPConnection object passed to the AuthServiceProxy (for convinient connection reset)
+        self.rpc_pool = RpcConnectionPool(RPC_CONNECTION_POOL_SIZE)
+        # connections of the gather worker threads; they are kept in a separate pool, so the workers never wait
+        # for connections leased by threads waiting for the workers
+        self.gather_pool = RpcConnectionPool(self.get_gather_pool_size())
+        # per thread state: leased RPC connection, pool used by the thread, starting connection config
+        self.rpc_local = threading.local()
+        self.conn_lock = thread_utils.EnhRLock()  # guards opening, switching and resetting the connection
+        self.masternodes_lock = threading.RLock()  # guards updating of the cached masternode list
+        self.conn_probe_done = False  # concurrent probing is performed only for the first connection
         self.on_connection_begin_callback = on_connection_begin_callback
         self.on_connection_try_fail_callback = on_connection_try_fail_callback
         self.on_connection_finished_callback = on_connection_finished_callback
         self.last_error_message = None
         self.governanceinfo = None  # cached result of getgovernanceinfo query
-        self.http_lock = threading.Lock()
+        self.block_count = None  # the last result of getblockcount; used to decide which cached data is immutable
+        if self.config.rpc_record_file:
+            start_rpc_recording(self.config.rpc_record_file)
 
         cur = self.db_intf.get_cursor()
-        cur2 = self.db_intf.get_cursor()
-        db_modified = False
         try:
             tm_start = time.time()
-            db_correction_duration = 0.0
             logging.debug("Reading masternodes' data from DB")
+            # active masternodes are unique by ident (IDX_MASTERNODES_ACTIVE_IDENT), so no corrections are needed
             cur.execute("SELECT id, ident, status, protocol, payee, last_seen, active_seconds,"
                         " last_paid_time, last_paid_block, IP from MASTERNODES where dmt_active=1")
             for row in cur.fetchall():
-                db_id = row[0]
-                ident = row[1]
-
-                # correct duplicated masternodes issue
-                mn_first = self.masternodes_by_ident.get(ident)
-                if mn_first is not None:
-                    continue
-
-                # delete duplicated (caused by breaking the app while loading)
-                tm_start_1 = time.time()
-                cur2.execute('DELETE from MASTERNODES where ident=? and id<>?', (ident, db_id))
-                if cur2.rowcount > 0:
-                    db_modified = True
-                db_correction_duration += (time.time() - tm_start_1)
-
                 mn = Masternode()
-                mn.db_id = db_id
-                mn.ident = ident
-                mn.status = row[2]
-                mn.protocol = row[3]
-                mn.payee = row[4]
-                mn.lastseen = row[5]
-                mn.activeseconds = row[6]
-                mn.lastpaidtime = row[7]
-                mn.lastpaidblock = row[8]
-                mn.ip = row[9]
+                mn.db_id = row[0]
+                mn.ident = row[1]
+                mn.set_values(row[2:10])
                 self.masternodes.append(mn)
                 self.masternodes_by_ident[mn.ident] = mn
 
             tm_diff = time.time() - tm_start
-            logging.info('DB read time of %d MASTERNODES: %s s, db fix time: %s' %
-                         (len(self.masternodes), str(tm_diff), str(db_correction_duration)))
+            logging.info('DB read time of %d MASTERNODES: %s s' % (len(self.masternodes), str(tm_diff)))
             self.update_mn_queue_values()
         except Exception as e:
             logging.exception('SQLite initialization error')
         finally:
-            if db_modified:
-                self.db_intf.commit()
-            self.db_intf.release_cursor()
             self.db_intf.release_cursor()
 
     def apply_new_cfg(self):
@@ -576,49 +1170,122 @@ class DashdInterface(WndUtils):
         if not len(self.connections):
             raise Exception('There is no connections to Dash network enabled in the configuration.')
         self.cur_conn_def = self.connections[self.cur_conn_index]
+        self.conn_probe_done = False
 
     def disconnect(self):
-        if self.active:
-            logging.debug('Disconnecting')
-            if self.ssh:
-                self.ssh.disconnect()
-                del self.ssh
-                self.ssh = None
-            self.active = False
+        self.conn_lock.acquire()
+        try:
+            if self.active:
+                logging.debug('Disconnecting')
+                self.rpc_pool.clear()
+                self.gather_pool.clear()
+                if self.ssh:
+                    self.ssh.disconnect()
+                    del self.ssh
+                    self.ssh = None
+                self.active = False
+        finally:
+            self.conn_lock.release()
+
+    def get_leased_rpc_connection(self):
+        """
+        :return: RpcConnection object leased from the pool by the current thread or None
+        """
+        return getattr(self.rpc_local, 'conn', None)
+
+    def release_rpc_connection(self, discard=False):
+        """
+        Gives back the RPC connection leased by the current thread to the pool.
+        :param discard: True if the connection is to be closed instead of being reused (after communication errors)
+        """
+        conn = getattr(self.rpc_local, 'conn', None)
+        if conn is not None:
+            self.rpc_local.conn = None
+            self.get_thread_rpc_pool().release(conn, discard=discard)
+
+    def get_thread_rpc_pool(self):
+        """ Returns the pool from which the current thread leases RPC connections. """
+        return getattr(self.rpc_local, 'pool', self.rpc_pool)
+
+    def get_rpc_connection(self):
+        """
+        Returns the RPC connection used by the current thread. The connection is leased from the pool on the first
+        use inside a control_rpc_call decorated method and released when the method finishes.
+        """
+        conn = getattr(self.rpc_local, 'conn', None)
+        if conn is None:
+            conn = self.get_thread_rpc_pool().acquire()
+            conn.take_round_trip_time()  # discard samples of failed calls made by the previous lessee
+            self.rpc_local.conn = conn
+        return conn
+
+    @property
+    def proxy(self):
+        """ AuthServiceProxy object of the RPC connection used by the current thread. """
+        return self.get_rpc_connection().proxy
+
+    @property
+    def http_conn(self):
+        conn = getattr(self.rpc_local, 'conn', None)
+        return conn.http_conn if conn is not None else None
 
     def mark_call_begin(self):
-        self.starting_conn = self.cur_conn_def
+        self.rpc_local.starting_conn = self.cur_conn_def
 
-    def switch_to_next_config(self):
+    def switch_to_next_config(self, failed_conn_def=None):
         """
         If there is another dashd config not used recently, switch to it. Called only when there was a problem
         with current connection config.
+        :param failed_conn_def: connection config which failed; if another thread has already switched to
+            another config, no further switching is performed
         :return: True if successfully switched or False if there was no another config
         """
-        if self.cur_conn_def:
-            self.config.conn_cfg_failure(self.cur_conn_def)  # mark connection as defective
-        if self.cur_conn_index < len(self.connections)-1:
-            idx = self.cur_conn_index + 1
-        else:
-            idx = 0
-
-        conn = self.connections[idx]
-        if conn != self.starting_conn and conn != self.cur_conn_def:
-            logging.debug("Trying to switch to another connection: %s" % conn.get_description())
-            self.disconnect()
-            self.cur_conn_index = idx
-            self.cur_conn_def = conn
-            if not self.open():
-                return self.switch_to_next_config()
-            else:
+        self.conn_lock.acquire()
+        try:
+            if failed_conn_def is not None and failed_conn_def != self.cur_conn_def:
+                logging.debug('Connection config has already been switched by another thread.')
                 return True
-        else:
-            logging.warning('Failed to connect: no another connection configurations.')
-            return False
 
-    def mark_cur_conn_cfg_is_ok(self):
+            if self.cur_conn_def:
+                self.config.conn_cfg_failure(self.cur_conn_def)  # mark connection as defective
+            if self.cur_conn_index < len(self.connections)-1:
+                idx = self.cur_conn_index + 1
+            else:
+                idx = 0
+
+            starting_conn = getattr(self.rpc_local, 'starting_conn', None)
+            # prefer the next config which is not in the failure backoff period
+            now = time.time()
+            for offset in range(1, len(self.connections)):
+                i = (self.cur_conn_index + offset) % len(self.connections)
+                c = self.connections[i]
+                if c != starting_conn and not c.is_in_backoff(now):
+                    idx = i
+                    break
+
+            conn = self.connections[idx]
+            if conn != starting_conn and conn != self.cur_conn_def:
+                logging.debug("Trying to switch to another connection: %s" % conn.get_description())
+                self.disconnect()
+                self.cur_conn_index = idx
+                self.cur_conn_def = conn
+                if not self.open():
+                    return self.switch_to_next_config()
+                else:
+                    return True
+            else:
+                logging.warning('Failed to connect: no another connection configurations.')
+                return False
+        finally:
+            self.conn_lock.release()
+
+    def mark_cur_conn_cfg_is_ok(self, call_duration=None):
+        """
+        :param call_duration: duration of the successful call in seconds; used to update connection's
+            latency score
+        """
         if self.cur_conn_def:
-            self.config.conn_cfg_success(self.cur_conn_def)
+            self.config.conn_cfg_success(self.cur_conn_def, call_duration)
 
     def open(self):
         """
@@ -626,45 +1293,174 @@ class DashdInterface(WndUtils):
         :return: True if successfully connected, False if user cancelled the operation. If all of the attempts 
             fail, then appropriate exception will be raised.
         """
+        if self.active:
+            return True
+
+        self.conn_lock.acquire()
         try:
-            if not self.cur_conn_def:
-                raise Exception('There is no connections to Dash network enabled in the configuration.')
+            try:
+                if not self.cur_conn_def:
+                    raise Exception('There is no connections to Dash network enabled in the configuration.')
 
-            while True:
-                try:
-                    if self.open_internal():
-                        break
-                    else:
+                if not self.conn_probe_done:
+                    self.conn_probe_done = True
+                    # probing may change the order of connections configured by the user
+                    if self.config.conn_probe_count > 1 and \
+                       (self.config.random_dash_net_config or self.config.conn_probe_fixed_order) and \
+                       self.probe_connections():
+                        return True
+
+                while True:
+                    try:
+                        if self.open_internal():
+                            break
+                        else:
+                            if not self.switch_to_next_config():
+                                return False
+                    except UserCancelledConnection:
+                        return False
+                    except (socket.gaierror, ConnectionRefusedError, TimeoutError, socket.timeout,
+                            NoValidConnectionsError) as e:
+                        # exceptions raised by not likely functioning dashd node; try to switch to another node
+                        # if there is any in the config
                         if not self.switch_to_next_config():
-                            return False
-                except UserCancelledConnection:
-                    return False
-                except (socket.gaierror, ConnectionRefusedError, TimeoutError, socket.timeout,
-                        NoValidConnectionsError) as e:
-                    # exceptions raised by not likely functioning dashd node; try to switch to another node
-                    # if there is any in the config
-                    if not self.switch_to_next_config():
-                        raise e  # couldn't use another conn config, raise exception
-                    else:
-                        break
-        except Exception as e:
-            self.last_error_message = str(e)
-            raise
+                            raise e  # couldn't use another conn config, raise exception
+                        else:
+                            break
+            except Exception as e:
+                self.last_error_message = str(e)
+                raise
+        finally:
+            self.conn_lock.release()
 
         return True
 
+    def probe_connections(self):
+        """
+        Probes concurrently the first config.conn_probe_count direct (not SSH) connection configs with
+        the 'getblockcount' call and switches to the one which answers first, so a single dead node doesn't delay
+        the application start with its connection timeout. Connections of the remaining probes are closed after
+        they finish (results are used to update the connections' health scores). Called with conn_lock acquired.
+        Only the leading run of direct configs is probed: SSH configs can't be probed (they may prompt for
+        passwords), so configs placed after an SSH one are never preferred over it.
+        :return: True if one of the probed connections has been adopted as the current one
+        """
+        candidates = []
+        for c in self.connections:
+            if c.use_ssh_tunnel or len(candidates) >= self.config.conn_probe_count:
+                break
+            candidates.append(c)
+        if len(candidates) < 2:
+            return False
+
+        logging.info('Probing %d connections concurrently' % len(candidates))
+        try:
+            if self.on_connection_begin_callback:
+                self.on_connection_begin_callback()
+        except:
+            pass
+
+        tm_begin = time.time()
+        results = queue.Queue()
+
+        def probe_thread(conn_def):
+            conn = None
+            try:
+                if conn_def.use_ssl:
+                    rpc_url = 'https://'
+                else:
+                    rpc_url = 'http://'
+                rpc_url += conn_def.username + ':' + conn_def.password + '@' + conn_def.host + ':' + \
+                    str(conn_def.port)
+                conn = RpcConnection(rpc_url, conn_def.host, conn_def.port, conn_def.use_ssl, CONN_PROBE_TIMEOUT,
+                                     None)
+                conn.proxy.getblockcount()
+                results.put((conn_def, conn, conn.take_round_trip_time(), None))
+            except Exception as e:
+                if conn:
+                    conn.close()
+                results.put((conn_def, None, None, e))
+
+        def process_result(conn_def, duration, error):
+            if error is not None:
+                logging.warning('Probe of connection %s failed: %s' % (conn_def.get_description(), str(error)))
+                self.config.conn_cfg_failure(conn_def)
+            else:
+                self.config.conn_cfg_success(conn_def, duration)
+
+        def finish_probes_thread(count):
+            for _ in range(count):
+                conn_def, conn, duration, error = results.get()
+                process_result(conn_def, duration, error)
+                if conn:
+                    conn.close()
+
+        for conn_def in candidates:
+            threading.Thread(target=probe_thread, args=(conn_def,), daemon=True).start()
+
+        adopted = None
+        for idx in range(len(candidates)):
+            conn_def, conn, duration, error = results.get()
+            process_result(conn_def, duration, error)
+            if conn:
+                adopted = (conn_def, conn)
+                remaining = len(candidates) - idx - 1
+                if remaining:
+                    threading.Thread(target=finish_probes_thread, args=(remaining,), daemon=True).start()
+                break
+
+        if adopted:
+            conn_def, conn = adopted
+            self.cur_conn_index = self.connections.index(conn_def)
+            self.cur_conn_def = conn_def
+            self.rpc_url = conn.rpc_url
+            self.rpc_pool.set_endpoint(conn.rpc_url, conn_def.host, conn_def.port, conn_def.use_ssl, timeout=20)
+            self.gather_pool.set_endpoint(conn.rpc_url, conn_def.host, conn_def.port, conn_def.use_ssl, timeout=20,
+                                          max_size=self.get_gather_pool_size())
+            conn.generation = self.rpc_pool.generation
+            conn.set_timeout(20)
+            self.rpc_pool.add_idle(conn)
+            self.active = True
+            logging.info('Time to first RPC: %s s, connection: %s' % (str(time.time() - tm_begin),
+                                                                    conn_def.get_description()))
+            try:
+                if self.on_connection_finished_callback:
+                    self.on_connection_finished_callback()
+            except:
+                logging.exception('on_connection_finished_callback call exception')
+            return True
+        else:
+            # continue with the regular (sequential) way, starting from a config not probed unsuccessfully
+            for idx, conn_def in enumerate(self.connections):
+                if conn_def not in candidates:
+                    self.cur_conn_index = idx
+                    self.cur_conn_def = conn_def
+                    break
+            logging.warning('None of the probed connections answered, time: %s s' % str(time.time() - tm_begin))
+            return False
+
     def reset_connection(self):
         """
-        Called when communication errors are detected while sending RPC commands. Here we are closing the SSH-tunnel
-        (if used) and HTTP connection object to prepare for another try.
+        Called when communication errors are detected while sending RPC commands. Here we are closing the
+        HTTP connection used by the current thread and the SSH-tunnel (if used) to prepare for another try.
+        The SSH transport itself is kept if it's still alive, so the next try only has to restart the local
+        port forwarding; a dead transport is re-established in the background.
         :return:
         """
-        if self.active:
-            if self.http_conn:
-                self.http_conn.close()
-            if self.ssh:
-                self.ssh.disconnect()
-                self.active = False
+        self.release_rpc_connection(discard=True)
+        self.conn_lock.acquire()
+        try:
+            if self.active:
+                if self.ssh:
+                    self.rpc_pool.clear()
+                    self.gather_pool.clear()
+                    self.ssh.close_tunnel()
+                    if not self.ssh.is_transport_active():
+                        logging.info('SSH transport is not active, reconnecting')
+                        self.ssh.connect_background()
+                    self.active = False
+        finally:
+            self.conn_lock.release()
 
     def open_internal(self):
         """
@@ -683,6 +1479,12 @@ class DashdInterface(WndUtils):
 
             if self.cur_conn_def.use_ssh_tunnel:
                 # RPC over SSH
+                ssh_cfg = self.cur_conn_def.ssh_conn_cfg
+                if self.ssh and (self.ssh.host, str(self.ssh.port), self.ssh.username) != \
+                        (ssh_cfg.host, str(ssh_cfg.port), ssh_cfg.username):
+                    # the SSH session kept open belongs to another connection config
+                    self.ssh.disconnect()
+                    self.ssh = None
                 if self.ssh is None:
                     self.ssh = DashdSSH(self.cur_conn_def.ssh_conn_cfg.host, self.cur_conn_def.ssh_conn_cfg.port,
                                         self.cur_conn_def.ssh_conn_cfg.username)
@@ -700,25 +1502,13 @@ class DashdInterface(WndUtils):
                         logging.exception('on_connection_try_fail_callback call exception')
                     raise
 
-                # configure SSH tunnel
-                # get random local unprivileged port number to establish SSH tunnel
-                success = False
-                local_port = None
-                for try_nr in range(1, 10):
-                    try:
-                        logging.debug('beginning ssh.open_tunnel')
-                        local_port = randint(2000, 50000)
-                        self.ssh.open_tunnel(local_port,
-                                             self.cur_conn_def.host,
-                                             int(self.cur_conn_def.port))
-                        success = True
-                        break
-                    except Exception as e:
-                        logging.error('error in ssh.open_tunnel loop')
-                        pass
-                logging.debug('finished ssh.open_tunnel loop')
-                if not success:
-                    logging.error('finished ssh.open_tunnel loop with error')
+                # configure SSH tunnel on a free local port assigned by the OS
+                try:
+                    logging.debug('beginning ssh.open_tunnel')
+                    local_port = self.ssh.open_tunnel(0, self.cur_conn_def.host, int(self.cur_conn_def.port))
+                    logging.debug('finished ssh.open_tunnel')
+                except Exception as e:
+                    logging.error('error in ssh.open_tunnel: ' + str(e))
                     return False
                 else:
                     rpc_user = self.cur_conn_def.username
@@ -734,19 +1524,21 @@ class DashdInterface(WndUtils):
 
             if self.cur_conn_def.use_ssl:
                 self.rpc_url = 'https://'
-                self.http_conn = httplib.HTTPSConnection(rpc_host, rpc_port, timeout=5, context=ssl._create_unverified_context())
             else:
                 self.rpc_url = 'http://'
-                self.http_conn = httplib.HTTPConnection(rpc_host, rpc_port, timeout=5)
 
             self.rpc_url += rpc_user + ':' + rpc_password + '@' + rpc_host + ':' + str(rpc_port)
             logging.debug('AuthServiceProxy begin: %s' % self.rpc_url)
-            self.proxy = AuthServiceProxy(self.rpc_url, timeout=1000, connection=self.http_conn)
+            self.rpc_pool.set_endpoint(self.rpc_url, rpc_host, rpc_port, self.cur_conn_def.use_ssl, timeout=20)
+            self.gather_pool.set_endpoint(self.rpc_url, rpc_host, rpc_port, self.cur_conn_def.use_ssl, timeout=20,
+                                          max_size=self.get_gather_pool_size())
+            # timeout is initially set to 5 seconds to perform 'quick' connection test
+            test_conn = self.rpc_pool.create_connection(timeout=5)
             logging.debug('AuthServiceProxy end')
 
             try:
                 # check the connection
-                self.http_conn.connect()
+                test_conn.http_conn.connect()
                 logging.debug('Successfully connected')
 
                 try:
@@ -757,6 +1549,7 @@ class DashdInterface(WndUtils):
                     logging.exception('on_connection_finished_callback call exception')
             except:
                 logging.exception('Connection failed')
+                test_conn.close()
                 try:
                     # make the owner know, connection attempt failed
                     if self.on_connection_try_fail_callback:
@@ -764,11 +1557,10 @@ class DashdInterface(WndUtils):
                 except:
                     logging.exception('on_connection_try_fail_callback call exception')
                 raise
-            finally:
-                logging.debug('http_conn.close()')
-                self.http_conn.close()
-                # timeout hase been initially set to 5 seconds to perform 'quick' connection test
-                self.http_conn.timeout = 20
+
+            # keep the tested connection open as the first one in the pool
+            test_conn.set_timeout(20)
+            self.rpc_pool.add_idle(test_conn)
 
             self.active = True
         return self.active
@@ -782,7 +1574,8 @@ class DashdInterface(WndUtils):
     @control_rpc_call
     def getblockcount(self):
         if self.open():
-            return self.proxy.getblockcount()
+            self.block_count = self.proxy.getblockcount()
+            return self.block_count
         else:
             raise Exception('Not connected')
 
@@ -823,41 +1616,33 @@ class DashdInterface(WndUtils):
         else:
             raise Exception('Not connected')
 
-    def update_mn_queue_values(self):
+    def update_mn_queue_values(self, now=None):
         """
-        Updates masternode payment queue order values.
+        Updates masternode payment queue order values. Keys of all enabled masternodes are recomputed at each
+        call, since they depend on the current time; the queue is sorted once and positions are assigned in
+        a single pass over it.
+        :param now: the time for which the queue is computed; the current time if None
         """
 
         start_tm = time.time()
-        self.payment_queue = []
-        d = datetime.datetime.utcnow()
-        now = int(time.mktime((d.year, d.month, d.day, d.hour, d.minute, d.second, 0, 0, 0)))
+        if now is None:
+            d = datetime.datetime.utcnow()
+            now = int(time.mktime((d.year, d.month, d.day, d.hour, d.minute, d.second, 0, 0, 0)))
 
+        queue = []
         for mn in self.masternodes:
             if mn.status == 'ENABLED':
-                # estimate payment queue position: after loading all masternodes
-                # queue_position will be used to sort mn list and count the real queue position
-                if mn.lastpaidtime == 0:
-                    mn.queue_position = mn.activeseconds
-                else:
-                    lastpaid_ago = now - mn.lastpaidtime
-                    mn.queue_position = min(lastpaid_ago, mn.activeseconds)
-                self.payment_queue.append(mn)
+                queue.append((get_mn_queue_key(mn, now), mn.ident, mn))
             else:
                 mn.queue_position = None
+        queue.sort(key=lambda x: (x[0], x[1]))
 
-        duration1 = time.time() - start_tm
-        self.payment_queue.sort(key=lambda x: x.queue_position, reverse=True)
-        duration2 = time.time() - start_tm
+        self.payment_queue = [q[2] for q in queue]
+        for idx, mn in enumerate(self.payment_queue):
+            mn.queue_position = idx
 
-        for mn in self.masternodes:
-            if mn.status == 'ENABLED':
-                mn.queue_position = self.payment_queue.index(mn)
-            else:
-                mn.queue_position = None
-        duration3 = time.time() - start_tm
-        logging.info('Masternode queue build time1: %s, time2: %s, time3: %s' %
-                     (str(duration1), str(duration2), str(duration3)))
+        duration = time.time() - start_tm
+        logging.info('Masternode queue build time: %s' % str(duration))
 
     @control_rpc_call
     def get_masternodelist(self, *args, data_max_age=MASTERNODES_CACHE_VALID_SECONDS):
@@ -884,116 +1669,130 @@ class DashdInterface(WndUtils):
                 if len(elems) >= 8:
                     mn = Masternode()
                     # (status, protocol, payee, lastseen, activeseconds, lastpaidtime, pastpaidblock, ip)
-                    mn.status, mn.protocol, mn.payee, mn.lastseen, mn.activeseconds, mn.lastpaidtime, \
-                        mn.lastpaidblock, mn.ip = elems
-
-                    mn.lastseen = int(mn.lastseen)
-                    mn.activeseconds = int(mn.activeseconds)
-                    mn.lastpaidtime = int(mn.lastpaidtime)
-                    mn.lastpaidblock = int(mn.lastpaidblock)
+                    mn.set_values((elems[0], elems[1], elems[2], int(elems[3]), int(elems[4]), int(elems[5]),
+                                   int(elems[6]), elems[7]))
                     mn.ident = mn_id
                     ret_list.append(mn)
             duration = time.time() - tm_begin
             logging.info('Parse masternodelist time: ' + str(duration))
             return ret_list
 
-        def update_masternode_data(existing_mn, new_data, cursor):
-            # update cached masternode's properties
-            existing_mn.modified = False
-            existing_mn.monitor_changes = True
-            existing_mn.ident = new_data.ident
-            existing_mn.status = new_data.status
-            existing_mn.protocol = new_data.protocol
-            existing_mn.payee = new_data.payee
-            existing_mn.lastseen = new_data.lastseen
-            existing_mn.activeseconds = new_data.activeseconds
-            existing_mn.lastpaidtime = new_data.lastpaidtime
-            existing_mn.lastpaidblock = new_data.lastpaidblock
-            existing_mn.ip = new_data.ip
-
-            # ... and finally update MN db record
-            if cursor and existing_mn.modified:
-                cursor.execute("UPDATE MASTERNODES set ident=?, status=?, protocol=?, payee=?,"
-                               " last_seen=?, active_seconds=?, last_paid_time=?, "
-                               " last_paid_block=?, ip=?"
-                               "WHERE id=?",
-                               (new_data.ident, new_data.status, new_data.protocol, new_data.payee,
-                                new_data.lastseen, new_data.activeseconds, new_data.lastpaidtime,
-                                new_data.lastpaidblock, new_data.ip, existing_mn.db_id))
+        def diff_masternodes(new_mns):
+            """
+            Compares the new snapshot of the masternode list to the cached one (by ident) and updates attributes
+            of the cached masternodes which have changed.
+            :return: tuple of lists: (inserted masternodes, changed masternodes, removed masternodes)
+            """
+            inserted = []
+            changed = []
+
+            for mn in self.masternodes:
+                mn.marker = False
+
+            for mn in new_mns:
+                existing_mn = self.masternodes_by_ident.get(mn.ident)
+                if not existing_mn:
+                    mn.marker = True
+                    inserted.append(mn)
+                else:
+                    existing_mn.marker = True
+                    new_values = mn.get_values()
+                    if existing_mn.get_values() != new_values:
+                        existing_mn.set_values(new_values)
+                        changed.append(existing_mn)
+
+            removed = [mn for mn in self.masternodes if not mn.marker]
+            return inserted, changed, removed
 
         if self.open():
 
             if len(args) == 1 and args[0] == 'full':
-                last_read_time = self.get_cache_value('MasternodesLastReadTime', 0, int)
-                logging.info("MasternodesLastReadTime: %d" % last_read_time)
+                # concurrent callers wait for the refresh in progress and then use its (cached) results
+                self.masternodes_lock.acquire()
+                try:
+                    last_read_time = self.get_cache_value('MasternodesLastReadTime', 0, int)
+                    logging.info("MasternodesLastReadTime: %d" % last_read_time)
 
-                if self.masternodes and data_max_age > 0 and \
-                   int(time.time()) - last_read_time < data_max_age:
-                    logging.info('Using cached masternodelist (data age: %s)' % str(int(time.time()) - last_read_time))
-                    return self.masternodes
-                else:
-                    logging.info('Loading masternode list from Dash daemon...')
-                    mns = self.proxy.masternodelist(*args)
-                    mns = parse_mns(mns)
-                    logging.info('Finished loading masternode list')
-
-                    # mark already cached masternodes to identify those to delete
-                    for mn in self.masternodes:
-                        mn.marker = False
-
-                    # save masternodes to the db cache
-                    db_modified = False
-                    cur = None
-                    try:
-                        if self.db_intf.db_active:
-                            cur = self.db_intf.get_cursor()
+                    if self.masternodes and data_max_age > 0 and \
+                       int(time.time()) - last_read_time < data_max_age:
+                        logging.info('Using cached masternodelist (data age: %s)' % str(int(time.time()) - last_read_time))
+                        return self.masternodes
+                    else:
+                        logging.info('Loading masternode list from Dash daemon...')
+                        mns = self.proxy.masternodelist(*args)
+                        mns = parse_mns(mns)
+                        logging.info('Finished loading masternode list')
+
+                        tm_begin = time.time()
+                        inserted, changed, removed = diff_masternodes(mns)
 
-                        for mn in mns:
-                            # check if newly-read masternode already exists in the cache
-                            existing_mn = self.masternodes_by_ident.get(mn.ident)
-                            if not existing_mn:
-                                mn.marker = True
-                                self.masternodes.append(mn)
-                                self.masternodes_by_ident[mn.ident] = mn
-
-                                if self.db_intf.db_active:
-                                    cur.execute("INSERT INTO MASTERNODES(ident, status, protocol, payee, last_seen,"
-                                            " active_seconds, last_paid_time, last_paid_block, ip, dmt_active,"
-                                            " dmt_create_time) "
-                                            "VALUES (?,?,?,?,?,?,?,?,?,?,?)",
-                                            (mn.ident, mn.status, mn.protocol, mn.payee, mn.lastseen,
-                                             mn.activeseconds, mn.lastpaidtime, mn.lastpaidblock, mn.ip, 1,
-                                             datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-                                    mn.db_id = cur.lastrowid
-                                    db_modified = True
-                            else:
-                                existing_mn.marker = True
-                                update_masternode_data(existing_mn, mn, cur)
-                                db_modified = True
-
-                        # remove from the cache masternodes that no longer exist
-                        for mn_index in reversed(range(len(self.masternodes))):
-                            mn = self.masternodes[mn_index]
-
-                            if not mn.marker:
-                                if self.db_intf.db_active:
-                                    cur.execute("UPDATE MASTERNODES set dmt_active=0, dmt_deactivation_time=?"
-                                                "WHERE ID=?",
-                                                (datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                                mn.db_id))
-                                    db_modified = True
-                                self.masternodes_by_ident.pop(mn.ident,0)
-                                del self.masternodes[mn_index]
+                        # save changes to the db cache; each class of changes is saved with a single
+                        # executemany call and there is no write at all if nothing has changed
+                        if self.db_intf.db_active and (inserted or changed or removed):
+                            cur = self.db_intf.get_cursor()
+                            try:
+                                now = int(time.time())
+                                if removed:
+                                    cur.executemany("UPDATE MASTERNODES set dmt_active=0, dmt_deactivation_time=?"
+                                                    " WHERE id=?", [(now, mn.db_id) for mn in removed])
+                                if (inserted or changed) and DB_UPSERT_SUPPORTED:
+                                    # new and changed masternodes are upserted by the (active) ident
+                                    cur.executemany("INSERT INTO MASTERNODES(ident, status, protocol, payee,"
+                                                    " last_seen, active_seconds, last_paid_time, last_paid_block,"
+                                                    " ip, dmt_active, dmt_create_time) "
+                                                    "VALUES (?,?,?,?,?,?,?,?,?,1,?) "
+                                                    "ON CONFLICT(ident) WHERE dmt_active=1 DO UPDATE SET"
+                                                    " status=excluded.status, protocol=excluded.protocol,"
+                                                    " payee=excluded.payee, last_seen=excluded.last_seen,"
+                                                    " active_seconds=excluded.active_seconds,"
+                                                    " last_paid_time=excluded.last_paid_time,"
+                                                    " last_paid_block=excluded.last_paid_block, ip=excluded.ip",
+                                                    [(mn.ident,) + mn.get_values() + (now,)
+                                                     for mn in inserted + changed])
+                                elif inserted or changed:
+                                    # SQLite < 3.24: the rows of active idents are updated first, then the rows
+                                    # for idents not in the table yet are inserted (the other ones are ignored
+                                    # thanks to the unique index of active idents)
+                                    cur.executemany("UPDATE MASTERNODES set status=?, protocol=?, payee=?,"
+                                                    " last_seen=?, active_seconds=?, last_paid_time=?,"
+                                                    " last_paid_block=?, ip=? WHERE ident=? AND dmt_active=1",
+                                                    [mn.get_values() + (mn.ident,) for mn in inserted + changed])
+                                    cur.executemany("INSERT OR IGNORE INTO MASTERNODES(ident, status, protocol,"
+                                                    " payee, last_seen, active_seconds, last_paid_time,"
+                                                    " last_paid_block, ip, dmt_active, dmt_create_time) "
+                                                    "VALUES (?,?,?,?,?,?,?,?,?,1,?)",
+                                                    [(mn.ident,) + mn.get_values() + (now,)
+                                                     for mn in inserted + changed])
+                                if inserted:
+                                    # executemany doesn't give access to the ids of the inserted rows
+                                    cur.execute("SELECT ident, id FROM MASTERNODES WHERE dmt_active=1")
+                                    ids = dict(cur.fetchall())
+                                    for mn in inserted:
+                                        mn.db_id = ids.get(mn.ident)
+                                self.db_intf.commit()
+                            except Exception:
+                                self.db_intf.rollback()
+                                raise
+                            finally:
+                                self.db_intf.release_cursor()
+
+                        # update the in-memory list
+                        if removed:
+                            for mn in removed:
+                                self.masternodes_by_ident.pop(mn.ident, 0)
+                            self.masternodes[:] = [mn for mn in self.masternodes if mn.marker]
+                        for mn in inserted:
+                            self.masternodes.append(mn)
+                            self.masternodes_by_ident[mn.ident] = mn
+                        logging.info('Masternode list diff: inserted: %d, changed: %d, removed: %d, time: %s' %
+                                     (len(inserted), len(changed), len(removed), str(time.time() - tm_begin)))
 
                         self.set_cache_value('MasternodesLastReadTime', int(time.time()))
                         self.update_mn_queue_values()
-                    finally:
-                        if db_modified:
-                            self.db_intf.commit()
-                        if cur is not None:
-                            self.db_intf.release_cursor()
 
-                    return self.masternodes
+                        return self.masternodes
+                finally:
+                    self.masternodes_lock.release()
             else:
                 mns = self.proxy.masternodelist(*args)
                 mns = parse_mns(mns)
@@ -1018,21 +1817,116 @@ class DashdInterface(WndUtils):
     @control_rpc_call
     def getrawtransaction(self, txid, verbose):
         if self.open():
-            return json_cache_wrapper(self.proxy.getrawtransaction, self, 'tx-' + str(verbose) + '-' + txid)(txid, verbose)
+            return json_cache_wrapper(self.proxy.getrawtransaction, self, 'getrawtransaction')(txid, verbose)
         else:
             raise Exception('Not connected')
 
     @control_rpc_call
     def getblockhash(self, blockid):
         if self.open():
-            return json_cache_wrapper(self.proxy.getblockhash, self, 'blockhash-' + str(blockid))(blockid)
+            return json_cache_wrapper(self.proxy.getblockhash, self, 'getblockhash')(blockid)
         else:
             raise Exception('Not connected')
 
     @control_rpc_call
     def getblockheader(self, blockhash):
         if self.open():
-            return json_cache_wrapper(self.proxy.getblockheader, self, 'blockheader-' + str(blockhash))(blockhash)
+            return json_cache_wrapper(self.proxy.getblockheader, self, 'getblockheader')(blockhash)
+        else:
+            raise Exception('Not connected')
+
+    def get_gather_pool_size(self):
+        return max(1, self.config.rpc_gather_concurrency)
+
+    def gather(self, calls, concurrency=None):
+        """
+        Performs RPC calls concurrently (each call in its own worker thread, using its own connection) and waits
+        until all of them finish. Intended for worker threads only, not for the main thread.
+        Worker threads lease connections from a separate pool (gather_pool), so they don't wait for connections
+        held by their callers or by other threads; concurrent gathers share that pool and wait only for each
+        other's calls. If called from inside a call performed by gather, the calls are performed sequentially
+        in the calling thread, since waiting for connections held by the outer workers could never end.
+        :param calls: list of tuples (method of this object, tuple of arguments)
+        :param concurrency: maximum number of calls performed at the same time; None: the size of the gather
+            pool (rpc_gather_concurrency config option), which also limits the value
+        :return: list of results in order of calls; for calls that failed, the exception object is returned
+            in place of the result
+        """
+        if not calls:
+            return []
+
+        def call(fun, args):
+            try:
+                return fun(*args)
+            except Exception as e:
+                return e
+
+        if self.get_thread_rpc_pool() is self.gather_pool:
+            return [call(fun, args) for fun, args in calls]
+
+        def worker_call(fun, args):
+            self.rpc_local.pool = self.gather_pool
+            return call(fun, args)
+
+        pool_size = self.gather_pool.max_size
+        if concurrency is None:
+            concurrency = pool_size
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, pool_size, len(calls)))) as executor:
+            futures = [executor.submit(worker_call, fun, args) for fun, args in calls]
+            return [f.result() for f in futures]
+
+    @control_rpc_call
+    def call_many(self, method, args_list):
+        """
+        Calls an RPC method once for each element of args_list, using JSON-RPC batch requests, so the whole list
+        costs a few network round trips instead of one per element. Results of the cacheable methods
+        (getrawtransaction, getblockhash, getblockheader) are read from/saved to the cache.
+        :param method: name of the RPC method
+        :param args_list: list of argument tuples, one for each call
+        :return: list of tuples (result, error) in the order of args_list; error is a JSONRPCException object if
+            the call for a particular element failed, None otherwise
+        """
+        if self.open():
+            rpc_cache = self.config.rpc_cache if method in RPC_CACHED_METHODS else None
+            results = [None] * len(args_list)
+            to_fetch = []  # indexes of calls which results have to be read from the network
+            for idx, args in enumerate(args_list):
+                if rpc_cache:
+                    j = rpc_cache.get(method, args)
+                    if j is not None:
+                        results[idx] = (j, None)
+                        continue
+                to_fetch.append(idx)
+            if rpc_cache:
+                rpc_metrics.register_cache_access(method, self.get_active_conn_description(),
+                                                  len(args_list) - len(to_fetch), len(to_fetch))
+
+            for chunk_begin in range(0, len(to_fetch), RPC_BATCH_MAX_SIZE):
+                chunk = to_fetch[chunk_begin: chunk_begin + RPC_BATCH_MAX_SIZE]
+                calls = [(method, args_list[idx]) for idx in chunk]
+                chunk_results = None
+                conn = self.get_rpc_connection()
+                if self.rpc_pool.batch_supported:
+                    chunk_results = conn.batch_call(calls)
+                    if chunk_results is None:
+                        logging.warning('RPC node does not support batch requests, calls will be sent one by one.')
+                        self.rpc_pool.batch_supported = False
+
+                if chunk_results is None:
+                    chunk_results = []
+                    for m, args in calls:
+                        try:
+                            chunk_results.append((getattr(conn.proxy, m)(*args), None))
+                        except JSONRPCException as e:
+                            chunk_results.append((None, e))
+
+                for idx, res in zip(chunk, chunk_results):
+                    results[idx] = res
+                    if res[1] is None and rpc_cache:
+                        rpc_cache.set(method, args_list[idx], res[0],
+                                      immutable=is_immutable_result(method, args_list[idx], res[0],
+                                                                    self.block_count))
+            return results
         else:
             raise Exception('Not connected')
 
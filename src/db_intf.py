@@ -2,10 +2,263 @@
 # -*- coding: utf-8 -*-
 # Author: Bertrand256
 # Created on: 2017-10
+import re
 import sqlite3
 import logging
 import threading
-import thread_utils
+import time
+
+
+# version of the database schema, saved in the user_version pragma; each version has its migration method
+# (DBCache.migrate_to_v<version>) applied once to databases with a lower version
+DB_SCHEMA_VERSION = 6
+
+# vote changes (previous result->new result) counted separately in VOTING_RESULTS_DAILY, as column name: transition
+VOTE_CHANGE_COLUMNS = (
+    ('no_yes', ('NO', 'YES')),
+    ('abstain_yes', ('ABSTAIN', 'YES')),
+    ('no_abstain', ('NO', 'ABSTAIN')),
+    ('yes_abstain', ('YES', 'ABSTAIN')),
+    ('yes_no', ('YES', 'NO')),
+    ('abstain_no', ('ABSTAIN', 'NO'))
+)
+
+# SQLite features used when the library linked to the Python interpreter supports them; older versions get
+# equivalent (slower) statements: UPSERT (INSERT ... ON CONFLICT DO UPDATE) requires SQLite 3.24, window
+# functions (LAG) require SQLite 3.25
+DB_UPSERT_SUPPORTED = sqlite3.sqlite_version_info >= (3, 24, 0)
+DB_WINDOW_FUNCTIONS_SUPPORTED = sqlite3.sqlite_version_info >= (3, 25, 0)
+
+# maximum number of idle database connections kept open for reuse
+DB_CONNECTION_POOL_SIZE = 4
+
+# time (in seconds) to wait for a lock held by another connection (eg. a write transaction in another thread)
+DB_BUSY_TIMEOUT = 60
+
+# pragmas applied to each new connection: WAL allows readers to run concurrently with a writer, and with WAL
+# synchronous=NORMAL is safe against corruption (only the last transactions can be lost on power failure)
+DB_CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-16384',  # 16 MB
+    'PRAGMA mmap_size=268435456',  # 256 MB
+    'PRAGMA temp_store=MEMORY'
+)
+
+# LIVE_CONFIG symbol of the time of the last database maintenance (archiving votes, releasing free pages)
+CFG_DB_MAINTENANCE_LAST_TIME = 'db_maintenance_last_time'
+
+# minimum interval (in seconds) between database maintenance runs
+DB_MAINTENANCE_INTERVAL = 86400
+
+# maximum number of proposals whose votes are archived in one transaction and maximum number of free pages released
+# in one incremental vacuum step; keeps write locks short, so that the maintenance doesn't block other threads
+DB_ARCHIVE_BATCH_PROPOSALS = 20
+DB_INCREMENTAL_VACUUM_PAGES = 2000
+
+# number of the most time-consuming statements listed in the report of the statement profiler
+DB_PROFILER_REPORT_SIZE = 20
+
+
+class DBStatementStats(object):
+    """ Statistics of the executions of one SQL statement template, collected by DBProfiler. """
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows = 0
+        self.slow_count = 0
+        self.query_plan = None  # EXPLAIN QUERY PLAN result (list of plan steps) of the first slow execution
+
+    def to_dict(self):
+        return {'count': self.count,
+                'total_time': self.total_time,
+                'avg_time': self.total_time / self.count if self.count else 0.0,
+                'max_time': self.max_time,
+                'rows': self.rows,
+                'slow_count': self.slow_count,
+                'query_plan': self.query_plan}
+
+
+class DBProfiler(object):
+    """
+    Registry of the execution statistics of SQL statements performed through DBCache cursors, kept per
+    statement template (literals replaced with '?'), to find out which database operations are slow.
+    """
+    def __init__(self, slow_time):
+        """
+        :param slow_time: execution time (in seconds, including fetching the rows), above which the query plan
+            of the statement is captured and the execution is logged
+        """
+        self.slow_time = slow_time
+        self.lock = threading.Lock()
+        self.stats = {}  # key: statement template, value: DBStatementStats
+        self.start_time = time.time()
+
+    @staticmethod
+    def get_template(sql):
+        sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+        sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+        sql = re.sub(r'\s+', ' ', sql).strip()
+        return re.sub(r'\?(\s*,\s*\?)+', '?,...', sql)
+
+    def get_stats(self, template):
+        st = self.stats.get(template)
+        if st is None:
+            st = DBStatementStats()
+            self.stats[template] = st
+        return st
+
+    def register_execution(self, template):
+        with self.lock:
+            self.get_stats(template).count += 1
+
+    def register_time(self, template, duration, execution_time, rows):
+        """
+        Registers a part of a statement execution (the execute call or a fetch call).
+        :param duration: time of this part
+        :param execution_time: time of the execution so far, including this part
+        :return: True if the execution has just exceeded the slow_time
+        """
+        with self.lock:
+            st = self.get_stats(template)
+            st.total_time += duration
+            st.max_time = max(st.max_time, execution_time)
+            st.rows += rows
+            if execution_time > self.slow_time >= execution_time - duration:
+                st.slow_count += 1
+                return True
+        return False
+
+    def needs_query_plan(self, template):
+        with self.lock:
+            return self.get_stats(template).query_plan is None
+
+    def set_query_plan(self, template, query_plan):
+        with self.lock:
+            self.get_stats(template).query_plan = query_plan
+
+    def clear(self):
+        with self.lock:
+            self.stats.clear()
+            self.start_time = time.time()
+
+    def to_dict(self):
+        with self.lock:
+            statements = []
+            for template, st in self.stats.items():
+                d = st.to_dict()
+                d['statement'] = template
+                statements.append(d)
+            statements.sort(key=lambda d: d['total_time'], reverse=True)
+            return {'start_time': int(self.start_time),
+                    'time': int(time.time()),
+                    'statements': statements}
+
+    def log_report(self, top_count=DB_PROFILER_REPORT_SIZE):
+        data = self.to_dict()
+        lines = ['SQL statements by total time (top %d of %d), since %s:' %
+                 (min(top_count, len(data['statements'])), len(data['statements']),
+                  time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data['start_time'])))]
+        for st in data['statements'][:top_count]:
+            lines.append('  count: %d, total: %.3fs, avg: %.1fms, max: %.1fms, rows: %d, slow: %d | %s' %
+                         (st['count'], st['total_time'], st['avg_time'] * 1000, st['max_time'] * 1000,
+                          st['rows'], st['slow_count'], st['statement']))
+            if st['query_plan']:
+                lines.append('    query plan: ' + '; '.join(st['query_plan']))
+        logging.info('\n'.join(lines))
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """
+    Cursor registering the execution time and the number of rows returned of each statement in a DBProfiler.
+    The time of fetching the rows is added to the statement, as this is where SQLite does most of the work.
+    """
+    def __init__(self, *args, **kwargs):
+        sqlite3.Cursor.__init__(self, *args, **kwargs)
+        self.profiler = None
+        self.template = None
+        self.sql = None
+        self.parameters = None
+        self.execution_time = 0.0
+
+    def register(self, duration, rows):
+        self.execution_time += duration
+        if self.profiler.register_time(self.template, duration, self.execution_time, rows):
+            self.capture_query_plan()
+
+    def capture_query_plan(self):
+        """ Captures the query plan of the first slow execution of the statement template and logs it. """
+        if not self.profiler.needs_query_plan(self.template):
+            return
+        query_plan = []  # empty for statements having no query plan
+        if re.match(r'\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b', self.sql, re.IGNORECASE):
+            try:
+                cur = self.connection.cursor()
+                cur.execute('EXPLAIN QUERY PLAN ' + self.sql, self.parameters)
+                query_plan = [row[-1] for row in cur.fetchall()]
+            except Exception as e:
+                logging.warning('Cannot capture the query plan: ' + str(e))
+        self.profiler.set_query_plan(self.template, query_plan)
+        logging.info('Slow SQL statement (%.3fs): %s%s' %
+                     (self.execution_time, self.template,
+                      (' | query plan: ' + '; '.join(query_plan)) if query_plan else ''))
+
+    def begin_execution(self, sql, parameters):
+        self.template = self.profiler.get_template(sql)
+        self.sql = sql
+        self.parameters = parameters
+        self.execution_time = 0.0
+        self.profiler.register_execution(self.template)
+
+    def execute(self, sql, parameters=()):
+        self.begin_execution(sql, parameters)
+        tm_begin = time.time()
+        try:
+            return sqlite3.Cursor.execute(self, sql, parameters)
+        finally:
+            self.register(time.time() - tm_begin, 0)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        self.begin_execution(sql, seq_of_parameters[0] if seq_of_parameters else ())
+        tm_begin = time.time()
+        try:
+            return sqlite3.Cursor.executemany(self, sql, seq_of_parameters)
+        finally:
+            self.register(time.time() - tm_begin, 0)
+
+    def fetchone(self):
+        tm_begin = time.time()
+        row = sqlite3.Cursor.fetchone(self)
+        if self.template:
+            self.register(time.time() - tm_begin, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        tm_begin = time.time()
+        rows = sqlite3.Cursor.fetchmany(self, *args, **kwargs)
+        if self.template:
+            self.register(time.time() - tm_begin, len(rows))
+        return rows
+
+    def fetchall(self):
+        tm_begin = time.time()
+        rows = sqlite3.Cursor.fetchall(self)
+        if self.template:
+            self.register(time.time() - tm_begin, len(rows))
+        return rows
+
+    def __next__(self):
+        tm_begin = time.time()
+        try:
+            row = sqlite3.Cursor.__next__(self)
+        except StopIteration:
+            if self.template:
+                self.register(time.time() - tm_begin, 0)
+            raise
+        if self.template:
+            self.register(time.time() - tm_begin, 1)
+        return row
 
 
 class DBCache(object):
@@ -14,7 +267,9 @@ class DBCache(object):
     Usage: call 'get_cursor' when before starting dealing with the cache db and 'release_cursor' after finishing.
 
     Note:
-        1. get_cursor call locks the cache database to be used by the calling thread only
+        1. each thread works on its own connection, taken from a pool of long-lived connections when get_cursor
+           is called for the first time and given back with the last release_cursor call; the database works in
+           WAL mode, so readers in different threads do not block each other nor the writer
         2. subsequent get_cursor calls by the same thread require the same number of release_cursor calls;
            this is useful if you need multiple cursors to perform the required operations in one thread
     """
@@ -22,83 +277,169 @@ class DBCache(object):
     def __init__(self, db_cache_file_name):
         self.db_cache_file_name = db_cache_file_name
         self.db_active = False
-        self.lock = thread_utils.EnhRLock(stackinfo_skip_lines=1)
-        self.depth = 0
+        self.pool_lock = threading.Lock()
+        self.idle_connections = []
+        self.thread_data = threading.local()  # per thread: connection in use and the get_cursor call depth
+        self.profiler = None  # DBProfiler if profiling of SQL statements is enabled
 
-        self.db_conn = None
+        logging.info('SQLite version: ' + sqlite3.sqlite_version)
+        if not DB_UPSERT_SUPPORTED or not DB_WINDOW_FUNCTIONS_SUPPORTED:
+            logging.warning('SQLite %s does not support UPSERT (3.24) or window functions (3.25); slower '
+                            'replacement statements will be used' % sqlite3.sqlite_version)
+
+        db_conn = None
         try:
-            self.db_conn = sqlite3.connect(self.db_cache_file_name)
-            self.create_structures()
+            db_conn = self.create_connection()
+            cur = db_conn.cursor()
+            # free pages are released by the maintenance job
+            self.enable_incremental_vacuum(db_conn)
+            cur.execute('PRAGMA journal_mode=WAL')
+            cur.fetchall()
+            self.create_structures(db_conn)
+            db_conn.commit()
             self.db_active = True
+            self.idle_connections.append(db_conn)
+            db_conn = None
         except Exception as e:
             logging.exception('SQLite initialization error')
         finally:
-            if self.db_conn:
-                self.db_conn.close()
-            self.db_conn = None
+            if db_conn:
+                db_conn.close()
+
+    def create_connection(self):
+        # connections are used by one thread at a time, but may be closed by another one (close method)
+        db_conn = sqlite3.connect(self.db_cache_file_name, timeout=DB_BUSY_TIMEOUT, check_same_thread=False)
+        cur = db_conn.cursor()
+        for pragma in DB_CONNECTION_PRAGMAS:
+            cur.execute(pragma)
+            cur.fetchall()
+        return db_conn
+
+    def enable_incremental_vacuum(self, db_conn):
+        """
+        Sets the incremental auto-vacuum mode. It takes effect immediately only for new databases; existing ones
+        have to be rebuilt with a full VACUUM, which is left to the maintenance job (see the vacuum method), since
+        it blocks other connections for its whole duration.
+        """
+        cur = db_conn.cursor()
+        cur.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        cur.execute('PRAGMA auto_vacuum')
+        if cur.fetchall()[0][0] != 2:
+            logging.info('Database auto-vacuum is off; the database will be converted to incremental auto-vacuum '
+                         'by the next maintenance job')
+
+    @property
+    def depth(self):
+        return getattr(self.thread_data, 'depth', 0)
 
     def is_active(self):
         return self.db_active
 
     def get_cursor(self):
         if self.db_active:
-            logging.debug('Trying to acquire db cache session')
-            self.lock.acquire()
-            self.depth += 1
-            if self.db_conn is None:
-                self.db_conn = sqlite3.connect(self.db_cache_file_name)
+            if self.depth == 0:
+                db_conn = None
+                with self.pool_lock:
+                    if self.idle_connections:
+                        db_conn = self.idle_connections.pop()
+                if db_conn is None:
+                    db_conn = self.create_connection()
+                self.thread_data.db_conn = db_conn
+                self.thread_data.depth = 0
+            self.thread_data.depth += 1
             logging.debug('Acquired db cache session (%d)' % self.depth)
-            return self.db_conn.cursor()
+            if self.profiler:
+                cur = self.thread_data.db_conn.cursor(ProfilingCursor)
+                cur.profiler = self.profiler
+                return cur
+            return self.thread_data.db_conn.cursor()
         else:
             raise Exception('Database cache not active.')
 
     def release_cursor(self):
         if self.db_active:
-            try:
-                self.lock.acquire()
-                if self.depth == 0:
-                    raise Exception('Cursor not acquired by this thread.')
-                self.depth -= 1
-                if self.depth == 0:
-                    self.db_conn.close()
-                    self.db_conn = None
-                self.lock.release()
-                logging.debug('Released db cache session (%d)' % self.depth)
-            finally:
-                self.lock.release()
+            if self.depth == 0:
+                raise Exception('Cursor not acquired by this thread.')
+            self.thread_data.depth -= 1
+            if self.thread_data.depth == 0:
+                db_conn = self.thread_data.db_conn
+                self.thread_data.db_conn = None
+                if db_conn.in_transaction:
+                    # changes not committed by the thread are not visible to the next user of the connection
+                    db_conn.rollback()
+                with self.pool_lock:
+                    if len(self.idle_connections) < DB_CONNECTION_POOL_SIZE:
+                        self.idle_connections.append(db_conn)
+                        db_conn = None
+                if db_conn:
+                    db_conn.close()
+            logging.debug('Released db cache session (%d)' % self.depth)
         else:
             logging.warning('Cannot release database session if db_active is False.')
 
     def commit(self):
         if self.db_active:
-            try:
-                self.lock.acquire()
-                if self.depth == 0:
-                    raise Exception('Cursor not acquired by this thread. Cannot commit.')
-                self.db_conn.commit()
-            finally:
-                self.lock.release()
+            if self.depth == 0:
+                raise Exception('Cursor not acquired by this thread. Cannot commit.')
+            self.thread_data.db_conn.commit()
         else:
             logging.warning('Cannot commit if db_active is False.')
 
     def rollback(self):
         if self.db_active:
-            try:
-                self.lock.acquire()
-                if self.depth == 0:
-                    raise Exception('Cursor not acquired by this thread. Cannot rollback.')
-                self.db_conn.rollback()
-            finally:
-                self.lock.release()
+            if self.depth == 0:
+                raise Exception('Cursor not acquired by this thread. Cannot rollback.')
+            self.thread_data.db_conn.rollback()
         else:
             logging.warning('Cannot commit if db_active is False.')
 
+    def enable_profiling(self, slow_time):
+        """
+        Enables collecting statistics of the SQL statements executed with the cursors returned by get_cursor,
+        reported in the log file when the cache is closed.
+        :param slow_time: see DBProfiler
+        """
+        self.profiler = DBProfiler(slow_time)
+        logging.info('Profiling of SQL statements enabled, slow statement time: %.3fs' % slow_time)
+
     def close(self):
         if self.depth > 0:
             logging.error('Database not closed yet. Depth: ' + str(self.depth))
+        if self.profiler:
+            self.profiler.log_report()
+        with self.pool_lock:
+            for db_conn in self.idle_connections:
+                try:
+                    db_conn.close()
+                except Exception:
+                    logging.exception('Exception while closing database connection')
+            self.idle_connections.clear()
+
+    def create_structures(self, db_conn):
+        """ Upgrades the database schema to DB_SCHEMA_VERSION by applying the missing migrations. """
+        cur = db_conn.cursor()
+        cur.execute('PRAGMA user_version')
+        version = cur.fetchone()[0]
+        if version > DB_SCHEMA_VERSION:
+            logging.warning('Database schema version (%d) is newer than the supported one (%d)' %
+                            (version, DB_SCHEMA_VERSION))
+            return
+
+        for next_version in range(version + 1, DB_SCHEMA_VERSION + 1):
+            tm_begin = time.time()
+            cur.execute('BEGIN')
+            try:
+                getattr(self, 'migrate_to_v%d' % next_version)(cur)
+                cur.execute('PRAGMA user_version=%d' % next_version)
+                db_conn.commit()
+            except Exception:
+                db_conn.rollback()
+                raise
+            logging.info('Database schema upgraded to version %d. Time: %s' %
+                         (next_version, str(time.time() - tm_begin)))
 
-    def create_structures(self):
-        cur = self.db_conn.cursor()
+    def migrate_to_v1(self, cur):
+        """ Creates the initial schema or upgrades the one created before the versioning was introduced. """
         # create structires for masternodes data:
         cur.execute("CREATE TABLE IF NOT EXISTS MASTERNODES(id INTEGER PRIMARY KEY, ident TEXT, status TEXT,"
                     " protocol TEXT, payee TEXT, last_seen INTEGER, active_seconds INTEGER,"
@@ -154,3 +495,243 @@ class DBCache(object):
         # Create table for storing live data for example last read time of proposals
         cur.execute("CREATE TABLE IF NOT EXISTS LIVE_CONFIG(symbol text PRIMARY KEY, value TEXT)")
         cur.execute("CREATE INDEX IF NOT EXISTS IDX_LIVE_CONFIG_SYMBOL ON LIVE_CONFIG(symbol)")
+
+    def migrate_to_v2(self, cur):
+        """
+        Converts the date-time columns (saved as local time strings) to integer epoch timestamps and replaces
+        the indexes of VOTING_RESULTS with ones covering the actual queries.
+        """
+        def convert_table(table_name, create_sql, time_columns):
+            cur.execute("PRAGMA table_info(%s)" % table_name)
+            columns = [col[1] for col in cur.fetchall()]
+            exprs = ["CAST(strftime('%%s', %s, 'utc') AS INTEGER)" % col if col in time_columns else col
+                     for col in columns]
+            cur.execute("ALTER TABLE %s RENAME TO %s_OLD" % (table_name, table_name))
+            cur.execute(create_sql)
+            cur.execute("INSERT INTO %s(%s) SELECT %s FROM %s_OLD" %
+                        (table_name, ','.join(columns), ','.join(exprs), table_name))
+            cur.execute("DROP TABLE %s_OLD" % table_name)
+
+        convert_table('MASTERNODES',
+                      "CREATE TABLE MASTERNODES(id INTEGER PRIMARY KEY, ident TEXT, status TEXT,"
+                      " protocol TEXT, payee TEXT, last_seen INTEGER, active_seconds INTEGER,"
+                      " last_paid_time INTEGER, last_paid_block INTEGER, ip TEXT,"
+                      " dmt_active INTEGER, dmt_create_time INTEGER, dmt_deactivation_time INTEGER)",
+                      ('dmt_create_time', 'dmt_deactivation_time'))
+        cur.execute("CREATE INDEX IDX_MASTERNODES_DMT_ACTIVE ON MASTERNODES(dmt_active)")
+        cur.execute("CREATE INDEX IDX_MASTERNODES_IDENT ON MASTERNODES(ident)")
+
+        convert_table('PROPOSALS',
+                      "CREATE TABLE PROPOSALS(id INTEGER PRIMARY KEY, name TEXT, payment_start INTEGER,"
+                      " payment_end INTEGER, payment_amount REAL, yes_count INTEGER, absolute_yes_count INTEGER,"
+                      " no_count INTEGER, abstain_count INTEGER, creation_time INTEGER, url TEXT,"
+                      " payment_address TEXT, type INTEGER, hash TEXT,  collateral_hash TEXT,"
+                      " f_blockchain_validity INTEGER, f_cached_valid INTEGER, f_cached_delete INTEGER,"
+                      " f_cached_funding INTEGER, f_cached_endorsed INTEGER, object_type INTEGER,"
+                      " is_valid_reason TEXT, dmt_active INTEGER, dmt_create_time INTEGER,"
+                      " dmt_deactivation_time INTEGER, dmt_voting_last_read_time INTEGER,"
+                      " ext_attributes_loaded INTEGER, owner TEXT, title TEXT)",
+                      ('payment_start', 'payment_end', 'creation_time', 'dmt_create_time',
+                       'dmt_deactivation_time'))
+        cur.execute("CREATE INDEX IDX_PROPOSALS_HASH ON PROPOSALS(hash)")
+
+        convert_table('VOTING_RESULTS',
+                      "CREATE TABLE VOTING_RESULTS(id INTEGER PRIMARY KEY, proposal_id INTEGER,"
+                      " masternode_ident TEXT, voting_time INTEGER, voting_result TEXT, hash TEXT)",
+                      ('voting_time',))
+        cur.execute("CREATE UNIQUE INDEX IDX_VOTING_RESULTS_HASH ON VOTING_RESULTS(hash)")
+        # votes of a proposal ordered by time (votes grid of the proposals dialog)
+        cur.execute("CREATE INDEX IDX_VOTING_RESULTS_PROPOSAL ON VOTING_RESULTS(proposal_id, voting_time,"
+                    " voting_result, masternode_ident)")
+        # votes of the user's masternodes (voting columns of the proposals grid)
+        cur.execute("CREATE INDEX IDX_VOTING_RESULTS_MASTERNODE ON VOTING_RESULTS(masternode_ident, proposal_id,"
+                    " voting_time, voting_result)")
+
+    def migrate_to_v3(self, cur):
+        """
+        Removes duplicated masternode rows (caused by breaking the app while loading in its older versions) and
+        makes active masternodes unique by ident.
+        """
+        # for each ident of an active masternode only the first active row is kept
+        cur.execute("DELETE FROM MASTERNODES WHERE ident IN (SELECT ident FROM MASTERNODES WHERE dmt_active=1)"
+                    " AND id NOT IN (SELECT MIN(id) FROM MASTERNODES WHERE dmt_active=1 GROUP BY ident)")
+        if cur.rowcount:
+            logging.info('Removed %d duplicated masternode rows' % cur.rowcount)
+        cur.execute("CREATE UNIQUE INDEX IDX_MASTERNODES_ACTIVE_IDENT ON MASTERNODES(ident) WHERE dmt_active=1")
+
+    def migrate_to_v4(self, cur):
+        """ Creates the table of per-day vote aggregates, used for drawing the voting charts. """
+        # yes, no, abstain: change of the number of masternodes currently voting so on the day (the latest vote
+        # of each masternode counts); changes: number of votes changed on the day, broken down in the
+        # VOTE_CHANGE_COLUMNS columns; day: epoch time of the day's beginning (UTC)
+        cur.execute("CREATE TABLE VOTING_RESULTS_DAILY(proposal_id INTEGER, day INTEGER, yes INTEGER, no INTEGER,"
+                    " abstain INTEGER, changes INTEGER, %s, PRIMARY KEY(proposal_id, day)) WITHOUT ROWID" %
+                    ', '.join(col + ' INTEGER' for col, _ in VOTE_CHANGE_COLUMNS))
+        self.update_votes_daily(cur)
+
+    def migrate_to_v5(self, cur):
+        """ Adds columns for the validators (ETag, Last-Modified) of the proposals' external attributes. """
+        cur.execute("ALTER TABLE PROPOSALS ADD COLUMN ext_attributes_etag TEXT")
+        cur.execute("ALTER TABLE PROPOSALS ADD COLUMN ext_attributes_last_modified TEXT")
+
+    def migrate_to_v6(self, cur):
+        """ Creates the table of archived votes and the view of all votes, including the archived ones. """
+        # votes of proposals inactive for a longer time, moved out of VOTING_RESULTS; kept in the same database
+        # file, so that moving votes is atomic; stored clustered by proposal, without the rowid and the hash index
+        # of VOTING_RESULTS
+        cur.execute("CREATE TABLE VOTING_RESULTS_ARCHIVE(proposal_id INTEGER, hash TEXT, masternode_ident TEXT,"
+                    " voting_time INTEGER, voting_result TEXT, PRIMARY KEY(proposal_id, hash)) WITHOUT ROWID")
+        cur.execute("CREATE VIEW VOTING_RESULTS_ALL AS "
+                    "SELECT proposal_id, masternode_ident, voting_time, voting_result, hash FROM VOTING_RESULTS "
+                    "UNION ALL "
+                    "SELECT proposal_id, masternode_ident, voting_time, voting_result, hash "
+                    "FROM VOTING_RESULTS_ARCHIVE")
+
+    def update_votes_daily(self, cur, proposals_from_time=None):
+        """
+        Recalculates the per-day vote aggregates (VOTING_RESULTS_DAILY) from VOTING_RESULTS. Should be called
+        in the same transaction as the VOTING_RESULTS modification.
+        :param proposals_from_time: dict: key: proposal id, value: the earliest voting time of the added or
+            removed votes of the proposal; the days before the day of this time are not affected and are not
+            recalculated; None: recalculate all proposals
+        """
+        if DB_WINDOW_FUNCTIONS_SUPPORTED:
+            prev_result = "LAG(voting_result) OVER (PARTITION BY proposal_id, masternode_ident " \
+                          "ORDER BY voting_time, id)"
+        else:
+            # SQLite < 3.25: the previous vote of the masternode is looked up with IDX_VOTING_RESULTS_MASTERNODE
+            prev_result = "(SELECT p.voting_result FROM VOTING_RESULTS p WHERE p.masternode_ident=v.masternode_ident " \
+                          "AND p.proposal_id=v.proposal_id AND (p.voting_time<v.voting_time OR " \
+                          "(p.voting_time=v.voting_time AND p.id<v.id)) ORDER BY p.voting_time DESC, p.id DESC LIMIT 1)"
+        select = "SELECT proposal_id, day, SUM((voting_result='YES') - (prev_result IS 'YES')), " \
+                 "SUM((voting_result='NO') - (prev_result IS 'NO')), " \
+                 "SUM((voting_result='ABSTAIN') - (prev_result IS 'ABSTAIN')), " \
+                 "SUM(prev_result IS NOT NULL AND prev_result<>voting_result), " + \
+                 ', '.join("SUM(prev_result IS '%s' AND voting_result='%s')" % transition
+                           for _, transition in VOTE_CHANGE_COLUMNS) + \
+                 " FROM (SELECT proposal_id, voting_time - voting_time %% 86400 AS day, voting_result, " + \
+                 prev_result + " AS prev_result FROM VOTING_RESULTS v %s) %s GROUP BY proposal_id, day"
+        insert = "INSERT INTO VOTING_RESULTS_DAILY(proposal_id, day, yes, no, abstain, changes, %s) " % \
+                 ', '.join(col for col, _ in VOTE_CHANGE_COLUMNS)
+
+        if proposals_from_time is None:
+            cur.execute("DELETE FROM VOTING_RESULTS_DAILY")
+            cur.execute(insert + select % ('', ''))
+        else:
+            for proposal_id, from_time in proposals_from_time.items():
+                from_day = from_time - from_time % 86400
+                cur.execute("DELETE FROM VOTING_RESULTS_DAILY WHERE proposal_id=? AND day>=?", (proposal_id, from_day))
+                cur.execute(insert + select % ('WHERE proposal_id=?', 'WHERE day>=?'), (proposal_id, from_day))
+
+    def archive_votes(self, archive_after_days, retention_days):
+        """
+        Moves votes of proposals inactive for a longer time from VOTING_RESULTS to VOTING_RESULTS_ARCHIVE; each
+        batch of proposals is moved in a single transaction. The daily vote aggregates (VOTING_RESULTS_DAILY) of
+        these proposals are kept.
+        :param archive_after_days: votes of proposals deactivated more than this number of days ago are archived
+        :param retention_days: archived votes of proposals deactivated more than this number of days ago are
+            deleted; 0: keep them forever
+        :return: tuple: number of votes archived, number of archived votes deleted
+        """
+        archived = 0
+        deleted = 0
+        now = int(time.time())
+        cur = self.get_cursor()
+        try:
+            cur.execute("SELECT id FROM PROPOSALS p WHERE dmt_active=0 AND dmt_deactivation_time<? "
+                        "AND EXISTS (SELECT 1 FROM VOTING_RESULTS v WHERE v.proposal_id=p.id)",
+                        (now - archive_after_days * 86400,))
+            proposal_ids = [row[0] for row in cur.fetchall()]
+            for idx in range(0, len(proposal_ids), DB_ARCHIVE_BATCH_PROPOSALS):
+                batch = [(proposal_id,) for proposal_id in proposal_ids[idx: idx + DB_ARCHIVE_BATCH_PROPOSALS]]
+                cur.executemany("INSERT OR REPLACE INTO VOTING_RESULTS_ARCHIVE(proposal_id, hash, masternode_ident,"
+                                " voting_time, voting_result) "
+                                "SELECT proposal_id, hash, masternode_ident, voting_time, voting_result "
+                                "FROM VOTING_RESULTS WHERE proposal_id=?", batch)
+                cur.executemany("DELETE FROM VOTING_RESULTS WHERE proposal_id=?", batch)
+                archived += cur.rowcount
+                self.commit()
+
+            if retention_days:
+                cur.execute("DELETE FROM VOTING_RESULTS_ARCHIVE WHERE proposal_id IN "
+                            "(SELECT id FROM PROPOSALS WHERE dmt_active=0 AND dmt_deactivation_time<?)",
+                            (now - retention_days * 86400,))
+                deleted = cur.rowcount
+                self.commit()
+        finally:
+            self.release_cursor()
+        return archived, deleted
+
+    def restore_archived_votes(self, cur, proposal_id):
+        """
+        Moves archived votes of a proposal back to VOTING_RESULTS; used when the proposal gets reactivated.
+        Should be called in the same transaction as the reactivation.
+        """
+        cur.execute("INSERT OR IGNORE INTO VOTING_RESULTS(proposal_id, masternode_ident, voting_time, voting_result,"
+                    " hash) "
+                    "SELECT proposal_id, masternode_ident, voting_time, voting_result, hash "
+                    "FROM VOTING_RESULTS_ARCHIVE WHERE proposal_id=?", (proposal_id,))
+        cur.execute("DELETE FROM VOTING_RESULTS_ARCHIVE WHERE proposal_id=?", (proposal_id,))
+        return cur.rowcount
+
+    def vacuum(self):
+        """
+        Releases free pages of the cache database to the file system in short steps, so that other connections
+        are not blocked for long. A database which is not in the incremental auto-vacuum mode yet (created by
+        an older version of the application) is converted first, with a one-off full VACUUM.
+        """
+        cur = self.get_cursor()
+        try:
+            db_conn = self.thread_data.db_conn
+            tm_begin = time.time()
+            cur.execute('PRAGMA auto_vacuum')
+            if cur.fetchall()[0][0] != 2:
+                logging.info('Converting the database to incremental auto-vacuum with a full VACUUM')
+                cur.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                cur.execute('VACUUM')
+                logging.info('Database converted to incremental auto-vacuum. Time: %s' %
+                             str(time.time() - tm_begin))
+                return  # VACUUM has released all the free pages
+
+            pages = 0
+            while True:
+                cur.execute('PRAGMA freelist_count')
+                free_pages = cur.fetchall()[0][0]
+                if not free_pages:
+                    break
+                # executescript steps the pragma to completion (each step releases one page); the pages
+                # are released in separate transactions
+                db_conn.executescript('PRAGMA incremental_vacuum(%d)' % DB_INCREMENTAL_VACUUM_PAGES)
+                pages += min(free_pages, DB_INCREMENTAL_VACUUM_PAGES)
+            if pages:
+                logging.info('Released %d free database pages. Time: %s' % (pages, str(time.time() - tm_begin)))
+        finally:
+            self.release_cursor()
+
+    def run_maintenance(self, archive_after_days, retention_days, force=False):
+        """
+        Archives votes of inactive proposals and releases free database pages, if DB_MAINTENANCE_INTERVAL has
+        passed since the last run. Intended to be run in a background thread.
+        :param archive_after_days, retention_days: see archive_votes
+        :param force: run regardless of the time of the last run
+        """
+        try:
+            cur = self.get_cursor()
+            try:
+                cur.execute("SELECT value FROM LIVE_CONFIG WHERE symbol=?", (CFG_DB_MAINTENANCE_LAST_TIME,))
+                row = cur.fetchone()
+                if row and not force and int(row[0]) + DB_MAINTENANCE_INTERVAL > time.time():
+                    return
+                cur.execute("INSERT OR REPLACE INTO LIVE_CONFIG(symbol, value) VALUES(?,?)",
+                            (CFG_DB_MAINTENANCE_LAST_TIME, int(time.time())))
+                self.commit()
+            finally:
+                self.release_cursor()
+
+            tm_begin = time.time()
+            archived, deleted = self.archive_votes(archive_after_days, retention_days)
+            logging.info('Votes archived: %d, archived votes deleted: %d. Time: %s' %
+                         (archived, deleted, str(time.time() - tm_begin)))
+            self.vacuum()
+        except Exception:
+            logging.exception('Exception while maintaining the database')
@@ -94,9 +94,16 @@ class FindCollateralTxDlg(QDialog, ui_find_coll_tx_dlg.Ui_FindCollateralTxDlg, w
 
                     try:
                         # for each utxo read block time
-                        for utxo in self.utxos:
-                            blockhash = self.dashd_intf.getblockhash(utxo.get('height'))
-                            bh = self.dashd_intf.getblockheader(blockhash)
+                        blockhashes = self.dashd_intf.call_many('getblockhash', [(utxo.get('height'),)
+                                                                                 for utxo in self.utxos])
+                        for blockhash, error in blockhashes:
+                            if error is not None:
+                                raise error
+                        headers = self.dashd_intf.call_many('getblockheader', [(blockhash,)
+                                                                               for blockhash, _ in blockhashes])
+                        for utxo, (bh, error) in zip(self.utxos, headers):
+                            if error is not None:
+                                raise error
                             utxo['time_str'] = self.main_wnd.config.to_string(datetime.datetime.fromtimestamp(bh['time']))
                             utxo['confirmations'] = self.block_count - bh.get('height') + 1
                     except Exception as e:
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Bertrand256
+# Created on: 2017-11
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# number of HTTP requests performed concurrently by HttpFetcher.fetch_many
+HTTP_FETCH_CONCURRENCY = 8
+
+# timeout (in seconds) of connecting to the server and of each read from the connection
+HTTP_FETCH_TIMEOUT = 15
+
+# number of retries of a request, which failed due to a network error or a temporary server error (HTTP 429 and
+# 5xx); before n-th retry the fetcher waits HTTP_FETCH_BACKOFF_TIME * 2 ** (n - 1) seconds
+HTTP_FETCH_RETRIES = 3
+HTTP_FETCH_BACKOFF_TIME = 0.5
+
+# maximum number of HTTP redirects followed for a request
+HTTP_FETCH_MAX_REDIRECTS = 3
+
+
+class HttpFetcher(object):
+    """
+    Performs HTTP(S) GET requests concurrently in a bounded thread pool. Each worker thread has its own requests
+    session (sessions are not meant to be shared between threads), so the keep-alive connections of the session
+    are reused by the subsequent requests of the thread and the TCP and TLS handshakes are made once per thread
+    instead of once per request. Retries, redirects and gzip decoding are handled by the sessions.
+    The pool and the sessions live until the close method is called.
+    """
+    def __init__(self, concurrency=HTTP_FETCH_CONCURRENCY, timeout=HTTP_FETCH_TIMEOUT, retries=HTTP_FETCH_RETRIES):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.lock = threading.Lock()
+        self.thread_data = threading.local()  # per thread: requests session
+        self.sessions = []  # all sessions created, closed by the close method
+        self.futures = []  # requests submitted to the pool, not started ones are cancelled by the close method
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def get_session(self):
+        session = getattr(self.thread_data, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.max_redirects = HTTP_FETCH_MAX_REDIRECTS
+            retry = Retry(total=self.retries, backoff_factor=HTTP_FETCH_BACKOFF_TIME,
+                          status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=retry)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.thread_data.session = session
+            with self.lock:
+                self.sessions.append(session)
+        return session
+
+    def fetch(self, url, headers=None):
+        """
+        Performs a GET request, retrying it with an exponential backoff after network errors, HTTP 429 and 5xx.
+        :param headers: additional request headers (eg. If-None-Match, If-Modified-Since for conditional requests)
+        :return: requests.Response object; after exhausting the retries of HTTP 429/5xx, the last response
+        """
+        return self.get_session().get(url, headers=headers, timeout=self.timeout)
+
+    def fetch_many(self, reqs, progress_callback=None):
+        """
+        Performs GET requests concurrently.
+        :param reqs: list of tuples: url, dict of additional request headers (or None)
+        :param progress_callback: function called (in the calling thread) after each finished request, with
+            the number of finished requests as an argument; if it raises an exception, the requests not started yet
+            are cancelled and the exception is re-raised
+        :return: list of results in the order of reqs: requests.Response or the exception raised by the request
+        """
+        results = [None] * len(reqs)
+        futures = {}
+        for idx, (url, headers) in enumerate(reqs):
+            futures[self.executor.submit(self.fetch, url, headers)] = idx
+        with self.lock:
+            self.futures.extend(futures)
+        try:
+            for done_count, future in enumerate(as_completed(futures), 1):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    results[futures[future]] = e
+                if progress_callback:
+                    progress_callback(done_count)
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            with self.lock:
+                self.futures = [f for f in self.futures if f not in futures]
+        return results
+
+    def close(self):
+        """
+        Cancels the requests not started yet, waits for the ones in progress (each is limited by the timeout) and
+        closes the sessions' connections.
+        """
+        with self.lock:
+            for future in self.futures:
+                future.cancel()
+            self.futures.clear()
+        self.executor.shutdown(wait=True)
+        with self.lock:
+            for session in self.sessions:
+                try:
+                    session.close()
+                except Exception:
+                    pass
+            self.sessions.clear()
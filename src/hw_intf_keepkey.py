@@ -3,7 +3,6 @@
 # Author: Bertrand256
 # Created on: 2017-03
 
-import json
 import binascii
 
 import logging
@@ -92,30 +91,13 @@ def reconnect_keepkey(client, ask_for_pin_fun, ask_for_pass_fun):
 
 class MyTxApiInsight(TxApiInsight):
 
-    def __init__(self, network, url, dashd_inf, cache_dir, zcash=None):
+    def __init__(self, network, url, dashd_inf, zcash=None):
         TxApiInsight.__init__(self, network, url, zcash)
         self.dashd_inf = dashd_inf
-        self.cache_dir = cache_dir
 
     def fetch_json(self, url, resource, resourceid):
-        cache_file = ''
-        if self.cache_dir:
-            cache_file = '%s/%s_%s_%s.json' % (self.cache_dir, self.network, resource, resourceid)
-            try: # looking into cache first
-                j = json.load(open(cache_file))
-                return j
-            except:
-                pass
-        try:
-            j = self.dashd_inf.getrawtransaction(resourceid.decode("utf-8"), 1)
-        except Exception as e:
-            raise
-        if cache_file:
-            try: # saving into cache
-                json.dump(j, open(cache_file, 'w'))
-            except Exception as e:
-                pass
-        return j
+        # results of getrawtransaction are cached by dashd_inf in the shared RPC response cache
+        return self.dashd_inf.getrawtransaction(resourceid.decode("utf-8"), 1)
 
 
 def clean_bip32_path(bip32_path):
@@ -136,7 +118,7 @@ def prepare_transfer_tx(main_ui, utxos_to_spend, dest_address, tx_fee):
     :param tx_fee: transaction fee
     :return: tuple (serialized tx, total transaction amount in satoshis)
     """
-    tx_api = MyTxApiInsight('insight_dash', None, main_ui.dashd_intf, main_ui.config.cache_dir)
+    tx_api = MyTxApiInsight('insight_dash', None, main_ui.dashd_intf)
     client = main_ui.hw_client
     client.set_tx_api(tx_api)
     inputs = []
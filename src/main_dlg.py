@@ -39,6 +39,7 @@ from hw_common import HardwareWalletCancelException, HardwareWalletPinException
 import hw_intf
 from hw_setup_dlg import HwSetupDlg
 from psw_cache import SshPassCache
+from rpc_metrics_dlg import RpcMetricsDlg
 from sign_message_dlg import SignMessageDlg
 from wnd_utils import WndUtils
 from ui import ui_main_dlg
@@ -64,6 +65,7 @@ class MainWindow(QMainWindow, WndUtils, ui_main_dlg.Ui_MainWindow):
         self.is_dashd_syncing = False
         self.dashd_connection_ok = False
         self.connecting_to_dashd = False
+        self.first_rpc_time_logged = False  # reset for each new connection, see on_connection_begin
         self.hw_client = None
         self.curMasternode = None
         self.editingEnabled = False
@@ -168,6 +170,10 @@ class MainWindow(QMainWindow, WndUtils, ui_main_dlg.Ui_MainWindow):
         self.actLogFile = mnu.addAction('Open log file (%s)' % self.config.log_file)
         self.actLogFile.triggered.connect(self.on_actLogFile_triggered)
 
+        # RPC diagnostics
+        self.actRpcMetrics = mnu.addAction('RPC diagnostics...')
+        self.actRpcMetrics.triggered.connect(self.on_actRpcMetrics_triggered)
+
         # add masternodes to the combobox
         self.cboMasternodes.clear()
         for mn in self.config.masternodes:
@@ -191,6 +197,7 @@ class MainWindow(QMainWindow, WndUtils, ui_main_dlg.Ui_MainWindow):
 
         self.inside_setup_ui = False
         self.config.start_cache()
+        self.config.start_db_maintenance()
         logging.info('Finished setup of the main dialog.')
 
     @pyqtSlot(bool)
@@ -208,6 +215,11 @@ class MainWindow(QMainWindow, WndUtils, ui_main_dlg.Ui_MainWindow):
             if not ret:
                 self.warnMsg('Could not open "%s" file in a default OS application.' % self.config.log_file)
 
+    @pyqtSlot(bool)
+    def on_actRpcMetrics_triggered(self, checked):
+        ui = RpcMetricsDlg(self, self.config)
+        ui.exec_()
+
     def checkForUpdates(self, ctrl, cur_date_str, force_check):
         """
         Thread function, checking on GitHub if there is a new version of the application.
@@ -313,6 +325,7 @@ class MainWindow(QMainWindow, WndUtils, ui_main_dlg.Ui_MainWindow):
         """
         Called just before establising connection to a dash RPC.
         """
+        self.first_rpc_time_logged = False
         self.setStatus1Text('<b>RPC network status:</b> trying %s...' % self.dashd_intf.get_active_conn_description(), 'black')
 
     def on_connection_failed(self):
@@ -382,7 +395,12 @@ class MainWindow(QMainWindow, WndUtils, ui_main_dlg.Ui_MainWindow):
             :param ctrl: control structure to communicate with WorkerThread object (not used here)
             """
             try:
+                tm_begin = time.time()
                 synced = self.dashd_intf.issynchronized()
+                if not self.first_rpc_time_logged:
+                    # the first call of a new connection includes the time of connecting
+                    self.first_rpc_time_logged = True
+                    logging.info('Time to first RPC: %s s' % str(time.time() - tm_begin))
                 self.dashd_info = self.dashd_intf.getinfo()
                 self.dashd_connection_ok = True
                 if not synced:
@@ -8,7 +8,6 @@ import json
 import logging
 import random
 import re
-import sqlite3
 import threading
 import time
 import codecs
@@ -21,7 +20,6 @@ from PyQt5.QtCore import Qt, pyqtSlot, QVariant, QAbstractTableModel, QSortFilte
 from PyQt5.QtGui import QColor, QPainter, QPen
 from PyQt5.QtWidgets import QDialog, QDialogButtonBox, QMessageBox, QTableView, QAbstractItemView
 from math import floor
-import urllib.request
 import app_cache
 import app_utils
 import wnd_utils as wnd_utils
@@ -29,6 +27,8 @@ import dash_utils
 from columns_cfg_dlg import ColumnsConfigDlg
 from common import AttrsProtected
 from dashd_intf import DashdIndexException
+from db_intf import VOTE_CHANGE_COLUMNS, DB_UPSERT_SUPPORTED
+from http_fetcher import HttpFetcher
 from ui import ui_proposals
 from wnd_utils import WndUtils, CloseDialogException
 
@@ -40,6 +40,28 @@ PROPOSALS_CACHE_VALID_SECONDS = 3600
 # Number of seconds after which voting will be reloaded for active proposals:
 VOTING_RELOAD_TIME = 3600
 
+# number of proposals which votes are read from the network in a single JSON-RPC batch request
+VOTES_READ_BATCH_SIZE = 20
+
+
+# fields of governance objects (gobject list), which can change during the proposal's lifetime, with
+# the corresponding Proposal columns and conversion functions; proposals, whose fields haven't changed since
+# the last read, are not processed again; values are compared after conversion, since the ones read from the DB
+# cache have different types than the ones read from the network (eg. 0/1 instead of False/True, None instead of '')
+PROPOSAL_VOLATILE_FIELDS = (
+    ('Hash', 'hash', str),
+    ('YesCount', 'yes_count', int),
+    ('NoCount', 'no_count', int),
+    ('AbstainCount', 'abstain_count', int),
+    ('AbsoluteYesCount', 'absolute_yes_count', int),
+    ('fBlockchainValidity', 'fBlockchainValidity', bool),
+    ('fCachedValid', 'fCachedValid', bool),
+    ('fCachedDelete', 'fCachedDelete', bool),
+    ('fCachedFunding', 'fCachedFunding', bool),
+    ('fCachedEndorsed', 'fCachedEndorsed', bool),
+    ('IsValidReason', 'IsValidReason', str)
+)
+
 VOTE_CODE_YES = '1'
 VOTE_CODE_NO = '2'
 VOTE_CODE_ABSTAIN = '3'
@@ -56,6 +78,11 @@ QCOLOR_NO = QColor(COLOR_NO)
 QCOLOR_ABSTAIN = QColor(COLOR_ABSTAIN)
 
 
+def normalize_volatile_value(value, conv):
+    """ Converts a value of a PROPOSAL_VOLATILE_FIELDS field with conv; None is converted to conv's default. """
+    return conv(value) if value is not None else conv()
+
+
 class ProposalColumn(AttrsProtected):
     def __init__(self, name, caption, visible, column_for_vote=False):
         """
@@ -93,10 +120,10 @@ class Vote(AttrsProtected):
 
 
 class Proposal(AttrsProtected):
-    def __init__(self, columns, vote_columns_by_mn_ident, next_superblock_time):
+    def __init__(self, columns_by_name, vote_columns_by_mn_ident, next_superblock_time):
         super().__init__()
         self.visible = True
-        self.columns = columns
+        self.columns_by_name = columns_by_name  # dict shared by all proposals, key: column name, value: ProposalColumn
         self.values = {}  # dictionary of proposal values (key: ProposalColumn)
         self.db_id = None
         self.marker = None
@@ -107,6 +134,10 @@ class Proposal(AttrsProtected):
         self.vote_columns_by_mn_ident = vote_columns_by_mn_ident
         self.votes_by_masternode_ident = {}  # list of tuples: vote_timestamp, vote_result
         self.ext_attributes_loaded = False
+        # validators of the external attributes response (ETag, Last-Modified), sent with the next request to
+        # get 304 Not Modified if the attributes haven't changed
+        self.ext_attributes_etag = None
+        self.ext_attributes_last_modified = None
 
         # voting_status:
         #   1: voting in progress, funding
@@ -127,16 +158,16 @@ class Proposal(AttrsProtected):
         Sets value for a specified Proposal column.
         :returns True, if new value is different that old value
         """
-        for col in self.columns:
-            if col.name == name:
-                old_value = self.values.get(col)
-                if old_value != value:
-                    self.modified = True
-                    self.values[col] = value
-                    return True
-                else:
-                    return False
-        raise AttributeError('Invalid Proposal value name: ' + name)
+        col = self.columns_by_name.get(name)
+        if col is None:
+            raise AttributeError('Invalid Proposal value name: ' + name)
+        old_value = self.values.get(col)
+        if old_value != value:
+            self.modified = True
+            self.values[col] = value
+            return True
+        else:
+            return False
 
     def get_value(self, name):
         """
@@ -147,9 +178,9 @@ class Proposal(AttrsProtected):
         elif name == 'active':
             return self.voting_in_progress
         else:
-            for col in self.columns:
-                if col.name == name:
-                    return self.values.get(col)
+            col = self.columns_by_name.get(name)
+            if col is not None:
+                return self.values.get(col)
         raise AttributeError('Invalid Proposal value name: ' + name)
 
     def apply_vote(self, mn_ident, vote_timestamp, vote_result):
@@ -287,6 +318,8 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
             ProposalColumn('ObjectType', 'ObjectType', False),
             ProposalColumn('IsValidReason', 'IsValidReason', False)
         ]
+        # index of self.columns by name, shared by all proposals (Proposal.get_value/set_value)
+        self.columns_by_name = dict((col.name, col) for col in self.columns)
         self.vote_columns_by_mn_ident = {}
         self.proposals = []
         self.proposals_by_hash = {}  # dict of Proposal object indexed by proposal hash
@@ -303,6 +336,8 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
         self.governanceinfo = None
         self.last_superblock_time = None
         self.next_superblock_time = None
+        # values used by Proposal.apply_values at the last read of proposals from the network
+        self.proposals_context = None
         self.voting_deadline_passed = True  # True when current block number is >= next superblock - 1662
         self.proposals_last_read_time = 0
         self.current_proposal = None
@@ -659,7 +694,8 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                 def reload_ext_attrs_thread(ctrl):
                     cur = self.db_intf.get_cursor()
                     try:
-                        cur.execute("update PROPOSALS set title=null, owner=null, ext_attributes_loaded=0")
+                        # the current values are kept if the server reports them as not modified
+                        cur.execute("update PROPOSALS set ext_attributes_loaded=0")
                         self.db_intf.commit()
                         if self.read_external_attibutes(self.proposals):
                             WndUtils.callFunInTheMainThread(display_data)
@@ -689,15 +725,15 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
         :return:
         """
         # first check if this masternode is already added to voting columns
-        for col in self.columns:
-            if col.column_for_vote and col.name == mn_ident:
-                return  # column for this masternode is already added
+        if mn_ident in self.vote_columns_by_mn_ident:
+            return  # column for this masternode is already added
 
         col = ProposalColumn(mn_ident, mn_label, visible=True, column_for_vote=True)
         if isinstance(insert_before_column, int) and insert_before_column < len(self.columns):
             self.columns.insert(insert_before_column, col)
         else:
             self.columns.append(col)
+        self.columns_by_name[mn_ident] = col
         self.vote_columns_by_mn_ident[mn_ident] = col
 
         if my_masternode is None:
@@ -752,6 +788,17 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                 return idx
         raise Exception('Invalid column name: ' + name)
 
+    def get_proposals_context(self):
+        """
+        Returns a tuple of values, which (besides the proposal's own data) are used by Proposal.apply_values;
+        if it doesn't change, statuses of the proposals with unchanged data don't have to be recalculated.
+        """
+        enabled_mns_count = 0
+        for mn in self.masternodes:
+            if mn.status in ('ENABLED', 'PRE_ENABLED'):
+                enabled_mns_count += 1
+        return self.last_superblock_time, self.next_superblock_time, enabled_mns_count
+
     def read_proposals_from_network(self):
         """ Reads proposals from the Dash network. """
 
@@ -784,22 +831,38 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                 prop.marker = False
                 prop.modified = False  # all modified proposals will be saved to DB cache
 
+            # proposals with unchanged volatile fields are skipped if the values used for calculating
+            # their status (apply_values) haven't changed either
+            context = self.get_proposals_context()
+            context_changed = context != self.proposals_context
+            props_to_save = []  # new and changed proposals
+            props_skipped = 0
+
             errors = 0
             for pro_key in proposals_new:
                 hash = '?'
                 try:
                     prop_raw = proposals_new[pro_key]
+                    hash = prop_raw['Hash']
+                    prop = self.proposals_by_hash.get(hash)
+                    if prop and prop.db_id and not context_changed:
+                        for field, col_name, conv in PROPOSAL_VOLATILE_FIELDS:
+                            if normalize_volatile_value(prop.get_value(col_name), conv) != \
+                               normalize_volatile_value(prop_raw.get(field), conv):
+                                break
+                        else:
+                            prop.marker = True
+                            props_skipped += 1
+                            continue
 
                     prop_dstr = prop_raw.get("DataString")
                     prop_data_json = json.loads(prop_dstr)
                     prop_data = find_prop_data(prop_data_json)
                     if prop_data is None:
                         continue
-                    hash = prop_raw['Hash']
-                    prop = self.proposals_by_hash.get(hash)
                     if not prop:
                         is_new = True
-                        prop = Proposal(self.columns, self.vote_columns_by_mn_ident, self.next_superblock_time)
+                        prop = Proposal(self.columns_by_name, self.vote_columns_by_mn_ident, self.next_superblock_time)
                     else:
                         is_new = False
                     prop.marker = True
@@ -830,6 +893,7 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                         self.proposals.append(prop)
                         self.proposals_by_hash[prop.get_value('hash')] = prop
                         rows_added = True
+                    props_to_save.append(prop)
                 except Exception as e:
                     logging.exception('Error while processing proposal data. Proposal hash: ' + hash)
                     errors += 1
@@ -838,12 +902,18 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                 if errors < len(proposals_new)/10:
                     try:
                         cur = self.db_intf.get_cursor()
+                        logging.info('Proposals unchanged: %d, new or changed: %d' %
+                                     (props_skipped, len(props_to_save)))
 
-                        for prop in self.proposals:
+                        props_changed = []  # modified proposals already displayed
+                        for prop in props_to_save:
                             if self.finishing:
                                 raise CloseDialogException
 
                             if prop.marker:
+                                if prop.db_id and prop.modified:
+                                    props_changed.append(prop)
+
                                 if not prop.db_id:
                                     # first, check if there is a proposal with the same hash in the database
                                     # dashd sometimes does not return some proposals, so they are deactivated id the db
@@ -857,6 +927,7 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                                                     'WHERE id=?', (row[0],))
                                         logging.info('Proposal "%s" (db_id: %d) exists int the DB. Re-activating.' %
                                                      (hash, row[0]))
+                                        self.db_intf.restore_archived_votes(cur, row[0])
 
                                 if not prop.db_id:
                                     logging.info('Adding a new proposal to DB. Hash: ' + prop.get_value('hash'))
@@ -868,14 +939,14 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                                                 " dmt_deactivation_time, dmt_voting_last_read_time)"
                                                 " VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,0)",
                                                 (prop.get_value('name'),
-                                                 prop.get_value('payment_start').strftime('%Y-%m-%d %H:%M:%S'),
-                                                 prop.get_value('payment_end').strftime('%Y-%m-%d %H:%M:%S'),
+                                                 int(prop.get_value('payment_start').timestamp()),
+                                                 int(prop.get_value('payment_end').timestamp()),
                                                  prop.get_value('payment_amount'),
                                                  prop.get_value('yes_count'),
                                                  prop.get_value('absolute_yes_count'),
                                                  prop.get_value('no_count'),
                                                  prop.get_value('abstain_count'),
-                                                 prop.get_value('creation_time').strftime('%Y-%m-%d %H:%M:%S'),
+                                                 int(prop.get_value('creation_time').timestamp()),
                                                  prop.get_value('url'),
                                                  prop.get_value('payment_address'),
                                                  prop.get_value('type'),
@@ -889,7 +960,7 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                                                  prop.get_value('ObjectType'),
                                                  prop.get_value('IsValidReason'),
                                                  1,
-                                                 datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                                 int(time.time()),
                                                  None))
                                     prop.db_id = cur.lastrowid
                                     self.proposals_by_db_id[prop.db_id] = prop
@@ -906,14 +977,14 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                                                     "is_valid_reason=? WHERE id=?",
                                                     (
                                                         prop.get_value('name'),
-                                                        prop.get_value('payment_start').strftime('%Y-%m-%d %H:%M:%S'),
-                                                        prop.get_value('payment_end').strftime('%Y-%m-%d %H:%M:%S'),
+                                                        int(prop.get_value('payment_start').timestamp()),
+                                                        int(prop.get_value('payment_end').timestamp()),
                                                         prop.get_value('payment_amount'),
                                                         prop.get_value('yes_count'),
                                                         prop.get_value('absolute_yes_count'),
                                                         prop.get_value('no_count'),
                                                         prop.get_value('abstain_count'),
-                                                        prop.get_value('creation_time').strftime('%Y-%m-%d %H:%M:%S'),
+                                                        int(prop.get_value('creation_time').timestamp()),
                                                         prop.get_value('url'),
                                                         prop.get_value('payment_address'),
                                                         prop.get_value('type'),
@@ -941,7 +1012,7 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                                 logging.info('Deactivating proposal in the cache. Hash: %s, DB id: %s' %
                                               (prop.get_value('hash'), str(prop.db_id)))
                                 cur.execute("UPDATE PROPOSALS set dmt_active=0, dmt_deactivation_time=? WHERE id=?",
-                                            (datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), prop.db_id))
+                                            (int(time.time()), prop.db_id))
 
                                 self.proposals_by_hash.pop(prop.get_value('hash'), 0)
                                 self.proposals_by_db_id.pop(prop.db_id)
@@ -955,8 +1026,12 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                             cur.execute("INSERT INTO LIVE_CONFIG(symbol, value) VALUES(?, ?)",
                                         (CFG_PROPOSALS_LAST_READ_TIME, int(time.time())))
 
+                        self.proposals_context = context
+
                         if rows_added or rows_removed:
                             WndUtils.callFunInTheMainThread(self.display_proposals_data)
+                        elif props_changed:
+                            WndUtils.callFunInTheMainThread(self.propsModel.refresh_proposals, props_changed)
 
                     except CloseDialogException:
                         raise
@@ -1105,7 +1180,8 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                                 " url, payment_address, type, hash, collateral_hash, f_blockchain_validity,"
                                 " f_cached_valid, f_cached_delete, f_cached_funding, f_cached_endorsed, object_type,"
                                 " is_valid_reason, dmt_active, dmt_create_time, dmt_deactivation_time, id,"
-                                " dmt_voting_last_read_time, owner, title, ext_attributes_loaded "
+                                " dmt_voting_last_read_time, owner, title, ext_attributes_loaded,"
+                                " ext_attributes_etag, ext_attributes_last_modified "
                                 "FROM PROPOSALS where dmt_active=1"
                             )
 
@@ -1122,21 +1198,26 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                                 for fix_row in cur_fix.fetchall():
                                     cur_fix_upd.execute('UPDATE VOTING_RESULTS set proposal_id=? where proposal_id=?',
                                                         (row[24], fix_row[0]))
+                                    cur_fix_upd.execute('UPDATE OR IGNORE VOTING_RESULTS_ARCHIVE set proposal_id=? '
+                                                        'where proposal_id=?', (row[24], fix_row[0]))
+                                    cur_fix_upd.execute('DELETE FROM VOTING_RESULTS_ARCHIVE where proposal_id=?',
+                                                        (fix_row[0],))
                                     cur_fix_upd.execute('DELETE FROM PROPOSALS WHERE id=?', (fix_row[0],))
                                     data_modified = True
                                     logging.warning('Deleted duplicated proposal from DB. ID: %s, HASH: %s' %
                                                     (str(fix_row[0]), row[12]))
 
-                                prop = Proposal(self.columns, self.vote_columns_by_mn_ident, self.next_superblock_time)
+                                prop = Proposal(self.columns_by_name, self.vote_columns_by_mn_ident,
+                                                self.next_superblock_time)
                                 prop.set_value('name', row[0])
-                                prop.set_value('payment_start', datetime.datetime.strptime(row[1], '%Y-%m-%d %H:%M:%S'))
-                                prop.set_value('payment_end',  datetime.datetime.strptime(row[2], '%Y-%m-%d %H:%M:%S'))
+                                prop.set_value('payment_start', datetime.datetime.fromtimestamp(row[1]))
+                                prop.set_value('payment_end',  datetime.datetime.fromtimestamp(row[2]))
                                 prop.set_value('payment_amount', row[3])
                                 prop.set_value('yes_count', row[4])
                                 prop.set_value('absolute_yes_count', row[5])
                                 prop.set_value('no_count', row[6])
                                 prop.set_value('abstain_count', row[7])
-                                prop.set_value('creation_time', datetime.datetime.strptime(row[8], '%Y-%m-%d %H:%M:%S'))
+                                prop.set_value('creation_time', datetime.datetime.fromtimestamp(row[8]))
                                 prop.set_value('url', row[9])
                                 prop.set_value('payment_address', row[10])
                                 prop.set_value('type', row[11])
@@ -1154,12 +1235,18 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                                 prop.set_value('owner', row[26])
                                 prop.set_value('title', row[27])
                                 prop.ext_attributes_loaded = True if row[28] else False
+                                prop.ext_attributes_etag = row[29]
+                                prop.ext_attributes_last_modified = row[30]
                                 prop.apply_values(self.masternodes, self.last_superblock_time,
                                                   self.next_superblock_time)
                                 self.proposals.append(prop)
                                 self.proposals_by_hash[prop.get_value('hash')] = prop
                                 self.proposals_by_db_id[prop.db_id] = prop
 
+                            # values applied to the proposals read from the DB; the first refresh from
+                            # the network skips proposals which haven't changed since they were saved
+                            self.proposals_context = self.get_proposals_context()
+
                             if data_modified:
                                 self.db_intf.commit()
 
@@ -1247,26 +1334,46 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
             url = self.main_wnd.config.dash_central_proposal_api
             if url:
                 exceptions_occurred = False
-                for idx, prop in enumerate(proposals):
+                fetch_requests = []
+                for prop in proposals:
+                    prop.modified = False
+                    prop.marker = False
+                    headers = {}
+                    if prop.ext_attributes_etag:
+                        headers['If-None-Match'] = prop.ext_attributes_etag
+                    if prop.ext_attributes_last_modified:
+                        headers['If-Modified-Since'] = prop.ext_attributes_last_modified
+                    fetch_requests.append((url.replace('%HASH%', prop.get_value('hash')), headers))
+
+                def display_progress(done_count):
                     if self.finishing:
                         raise CloseDialogException
                     self.display_message("Reading proposal external attributes (%d/%d), please wait..." %
-                                         (idx+1, len(proposals)))
+                                         (done_count, len(proposals)))
 
-                    prop.modified = False
+                network_tm_begin = time.time()
+                fetcher = HttpFetcher()
+                try:
+                    responses = fetcher.fetch_many(fetch_requests, display_progress)
+                finally:
+                    fetcher.close()
+                network_duration = time.time() - network_tm_begin
+
+                for prop, response in zip(proposals, responses):
+                    hash = prop.get_value('hash')
                     try:
-                        prop.marker = False
-                        hash = prop.get_value('hash')
-                        cur_url = url.replace('%HASH%', hash)
-                        network_tm_begin = time.time()
-                        response = urllib.request.urlopen(cur_url)
-                        contents = response.read()
-                        network_duration += time.time() - network_tm_begin
-                        if contents is not None:
-                            contents = json.loads(contents.decode('utf-8'))
-                        else:
-                            contents = ''
+                        if isinstance(response, Exception):
+                            raise response
+                        if response.status_code == 304:
+                            prop.marker = True  # attributes read previously are up to date
+                            continue
+                        if response.status_code != 200:
+                            raise Exception('HTTP error %d while reading external attributes of proposal %s' %
+                                            (response.status_code, hash))
+                        contents = json.loads(response.content.decode('utf-8')) if response.content else {}
                         prop.marker = True  # network operation went OK
+                        prop.ext_attributes_etag = response.headers.get('etag')
+                        prop.ext_attributes_last_modified = response.headers.get('last-modified')
                         p = contents.get('proposal')
                         if p is not None:
                             user_name = p.get('owner_username')
@@ -1281,9 +1388,6 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                                 logging.error('Error returned for proposal "' + hash + '": ' + err)
                             else:
                                 logging.error('Empty "proposal" attribute for proposal: ' + hash)
-                    except CloseDialogException:
-                        raise
-
                     except Exception as e:
                         exceptions_occurred = True
                         logging.error(str(e))
@@ -1291,23 +1395,19 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                 if not self.finishing:
                     cur = self.db_intf.get_cursor()
                     try:
+                        # proposals with the attributes loaded but empty are also marked as loaded, to avoid
+                        # reading the same information the next time
+                        cur.executemany('UPDATE PROPOSALS set owner=?, title=?, ext_attributes_etag=?, '
+                                        'ext_attributes_last_modified=?, ext_attributes_loaded=1 where id=?',
+                                        [(prop.get_value('owner'), prop.get_value('title'),
+                                          prop.ext_attributes_etag, prop.ext_attributes_last_modified, prop.db_id)
+                                         for prop in proposals if prop.marker])
+                        self.db_intf.commit()
                         for prop in proposals:
-                            if self.finishing:
-                                raise CloseDialogException
-
                             if prop.marker:
+                                prop.ext_attributes_loaded = True
                                 if prop.modified:
-                                    cur.execute('UPDATE PROPOSALS set owner=?, title=?, ext_attributes_loaded=1 where id=?',
-                                                (prop.get_value('owner'), prop.get_value('title'), prop.db_id))
                                     modified_ext_attributes = True
-                                elif not prop.ext_attributes_loaded:
-                                    # ext attributes loaded but empty; set ext_attributes_loaded to 1 to avoid reading
-                                    # the same information the next time
-                                    cur.execute('UPDATE PROPOSALS set ext_attributes_loaded=1 where id=?',
-                                                (prop.db_id,))
-                                prop.ext_attributes_loaded = True
-
-                        self.db_intf.commit()
                     finally:
                         self.db_intf.release_cursor()
 
@@ -1353,8 +1453,7 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                                 raise CloseDialogException
                             prop = self.proposals_by_db_id.get(row[0])
                             if prop:
-                                prop.apply_vote(mn_ident, datetime.datetime.strptime(row[1], '%Y-%m-%d %H:%M:%S'),
-                                                row[2])
+                                prop.apply_vote(mn_ident, datetime.datetime.fromtimestamp(row[1]), row[2])
 
         except CloseDialogException:
             logging.info('Closing the dialog.')
@@ -1395,8 +1494,9 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                 if row:
                     last_vote_max_date = int(row[0])
 
-            votes_added = []  # list of tuples (proposal, masternode, voting_time, voting_result, masternode ident),
-            # that has been added (will be saved to the database cache)
+            votes_read = []  # list of tuples (proposal, masternode, voting_time, voting_result, masternode ident,
+            # vote hash) read from the network, which may not exist in the database cache yet
+            votes_added = []  # subset of votes_read, which has been added (will be saved to the database cache)
 
             if not self.dashd_intf.open():
                 self.errorMsg('Dash daemon not connected')
@@ -1407,105 +1507,161 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                     db_oper_count = 0
                     network_duration = 0.0
 
-                    for row_idx, prop in enumerate(proposals):
+                    def read_votes_chunks():
+                        """
+                        Reads votes of proposals in chunks of VOTES_READ_BATCH_SIZE proposals; up to
+                        rpc_gather_concurrency (config option) chunks are read at the same time.
+                        :return: generator of tuples (list of proposals, list of (votes, error) tuples)
+                        """
+                        nonlocal network_duration
+                        group_size = VOTES_READ_BATCH_SIZE * self.dashd_intf.get_gather_pool_size()
+                        for group_begin in range(0, len(proposals), group_size):
+                            if self.finishing:
+                                raise CloseDialogException
+
+                            group = proposals[group_begin: group_begin + group_size]
+                            self.display_message('Reading voting data %d of %d' %
+                                                 (group_begin + len(group), len(proposals)))
+                            chunks = [group[i: i + VOTES_READ_BATCH_SIZE]
+                                      for i in range(0, len(group), VOTES_READ_BATCH_SIZE)]
+                            tm_begin = time.time()
+                            results = self.dashd_intf.gather(
+                                [(self.dashd_intf.call_many,
+                                  ('gobject', [('getvotes', prop.get_value('hash')) for prop in chunk]))
+                                 for chunk in chunks])
+                            network_duration += (time.time() - tm_begin)
+
+                            for chunk, votes_list in zip(chunks, results):
+                                if isinstance(votes_list, Exception):
+                                    raise votes_list
+                                yield chunk, votes_list
+
+                    for chunk, votes_list in read_votes_chunks():
                         if self.finishing:
                             raise CloseDialogException
 
-                        self.display_message('Reading voting data %d of %d' % (row_idx+1, len(proposals)))
-                        tm_begin = time.time()
-                        votes = self.dashd_intf.gobject("getvotes", prop.get_value('hash'))
-                        network_duration += (time.time() - tm_begin)
+                        for prop, (votes, error) in zip(chunk, votes_list):
+                            if error is not None:
+                                # votes of this proposal will be read again the next time
+                                logging.error('Error while reading votes of proposal %s: %s' % (prop.get_value('hash'),
+                                                                                                 str(error)))
+                                continue
 
-                        for v_key in votes:
-                            if self.finishing:
-                                raise CloseDialogException
+                            for v_key in votes:
+                                if self.finishing:
+                                    raise CloseDialogException
 
-                            v = votes[v_key]
-                            match = re.search("CTxIn\(COutPoint\(([A-Fa-f0-9]+)\s*\,\s*(\d+).+\:(\d+)\:(\w+)", v)
-                            if len(match.groups()) == 4:
-                                mn_ident = match.group(1) + '-' + match.group(2)
-                                voting_timestamp = int(match.group(3))
-                                voting_time = datetime.datetime.fromtimestamp(voting_timestamp)
-                                voting_result = match.group(4)
-                                mn = self.masternodes_by_ident.get(mn_ident)
-
-                                if voting_timestamp > cur_vote_max_date:
-                                    cur_vote_max_date = voting_timestamp
-
-                                if voting_timestamp >= (last_vote_max_date - 3600) or force_reload_all:
-                                    # check if vote exists in the database
-                                    if cur:
-                                        tm_begin = time.time()
-                                        cur.execute("SELECT id, proposal_id from VOTING_RESULTS WHERE hash=?",
-                                                    (v_key,))
-
-                                        found = False
-                                        for row in cur.fetchall():
-                                            if row[1] == prop.db_id:
-                                                found = True
-                                                break
-
-                                        db_oper_duration += (time.time() - tm_begin)
-                                        db_oper_count += 1
-                                        if not found:
-                                            votes_added.append((prop, mn, voting_time, voting_result, mn_ident, v_key))
-                                    else:
-                                        # no chance to check whether record exists in the DB, so assume it's not
-                                        # to have it displayed on the grid
-                                        votes_added.append((prop, mn, voting_time, voting_result, mn_ident, v_key))
+                                v = votes[v_key]
+                                match = re.search("CTxIn\(COutPoint\(([A-Fa-f0-9]+)\s*\,\s*(\d+).+\:(\d+)\:(\w+)", v)
+                                if len(match.groups()) == 4:
+                                    mn_ident = match.group(1) + '-' + match.group(2)
+                                    voting_timestamp = int(match.group(3))
+                                    voting_time = datetime.datetime.fromtimestamp(voting_timestamp)
+                                    voting_result = match.group(4)
+                                    mn = self.masternodes_by_ident.get(mn_ident)
 
-                            else:
-                                logging.warning('Proposal %s, parsing unsuccessful for voting: %s' % (prop.hash, v))
+                                    if voting_timestamp > cur_vote_max_date:
+                                        cur_vote_max_date = voting_timestamp
+
+                                    if voting_timestamp >= (last_vote_max_date - 3600) or force_reload_all:
+                                        votes_read.append((prop, mn, voting_time, voting_result, mn_ident, v_key))
 
-                        proposals_updated.append(prop)
+                                else:
+                                    logging.warning('Proposal %s, parsing unsuccessful for voting: %s' % (prop.hash, v))
+
+                            proposals_updated.append(prop)
 
                     logging.info('Network calls duration: %s for %d proposals' %
                                  (str(network_duration), (len(proposals))))
 
+                    if cur and votes_read:
+                        # save voting results to the database cache: votes are staged in a temporary table, then
+                        # those which don't exist in the cache or are assigned to another (eg. inactive) proposal
+                        # are found and upserted with single statements
+                        tm_begin = time.time()
+                        cur.execute("CREATE TEMP TABLE IF NOT EXISTS VOTING_RESULTS_STAGE(hash TEXT PRIMARY KEY,"
+                                    " proposal_id INTEGER, masternode_ident TEXT, voting_time INTEGER,"
+                                    " voting_result TEXT)")
+                        cur.execute("DELETE FROM VOTING_RESULTS_STAGE")
+                        cur.executemany("INSERT OR REPLACE INTO VOTING_RESULTS_STAGE(hash, proposal_id, "
+                                        "masternode_ident, voting_time, voting_result) VALUES(?,?,?,?,?)",
+                                        [(hash, prop.db_id, mn_ident, int(voting_time.timestamp()), voting_result)
+                                         for prop, mn, voting_time, voting_result, mn_ident, hash in votes_read])
+                        cur.execute("SELECT s.hash, s.proposal_id, s.voting_time, v.proposal_id, v.voting_time "
+                                    "FROM VOTING_RESULTS_STAGE s "
+                                    "LEFT OUTER JOIN VOTING_RESULTS v ON v.hash=s.hash "
+                                    "WHERE v.id IS NULL OR v.proposal_id IS NOT s.proposal_id")
+                        new_hashes = set()
+                        # key: id of a proposal whose votes changed, value: the earliest voting time of the
+                        # changed votes; used to update the daily aggregates of the days affected
+                        proposals_from_time = {}
+                        for row in cur.fetchall():
+                            new_hashes.add(row[0])
+                            for proposal_id, voting_time in ((row[1], row[2]), (row[3], row[4])):
+                                if proposal_id is not None:
+                                    proposals_from_time[proposal_id] = \
+                                        min(voting_time, proposals_from_time.get(proposal_id, voting_time))
+                        if new_hashes:
+                            if DB_UPSERT_SUPPORTED:
+                                cur.execute("INSERT INTO VOTING_RESULTS(proposal_id, masternode_ident, voting_time,"
+                                            " voting_result, hash) "
+                                            "SELECT s.proposal_id, s.masternode_ident, s.voting_time,"
+                                            " s.voting_result, s.hash FROM VOTING_RESULTS_STAGE s "
+                                            "LEFT OUTER JOIN VOTING_RESULTS v ON v.hash=s.hash "
+                                            "WHERE v.id IS NULL OR v.proposal_id IS NOT s.proposal_id "
+                                            "ON CONFLICT(hash) DO UPDATE SET proposal_id=excluded.proposal_id,"
+                                            " masternode_ident=excluded.masternode_ident,"
+                                            " voting_time=excluded.voting_time,"
+                                            " voting_result=excluded.voting_result")
+                            else:
+                                # SQLite < 3.24: votes moved to another proposal are updated first, then
+                                # the new ones are inserted
+                                cur.execute("UPDATE VOTING_RESULTS SET "
+                                            "proposal_id=(SELECT s.proposal_id FROM VOTING_RESULTS_STAGE s"
+                                            " WHERE s.hash=VOTING_RESULTS.hash), "
+                                            "masternode_ident=(SELECT s.masternode_ident FROM VOTING_RESULTS_STAGE s"
+                                            " WHERE s.hash=VOTING_RESULTS.hash), "
+                                            "voting_time=(SELECT s.voting_time FROM VOTING_RESULTS_STAGE s"
+                                            " WHERE s.hash=VOTING_RESULTS.hash), "
+                                            "voting_result=(SELECT s.voting_result FROM VOTING_RESULTS_STAGE s"
+                                            " WHERE s.hash=VOTING_RESULTS.hash) "
+                                            "WHERE EXISTS (SELECT 1 FROM VOTING_RESULTS_STAGE s "
+                                            "WHERE s.hash=VOTING_RESULTS.hash AND"
+                                            " s.proposal_id IS NOT VOTING_RESULTS.proposal_id)")
+                                cur.execute("INSERT INTO VOTING_RESULTS(proposal_id, masternode_ident, voting_time,"
+                                            " voting_result, hash) "
+                                            "SELECT s.proposal_id, s.masternode_ident, s.voting_time,"
+                                            " s.voting_result, s.hash FROM VOTING_RESULTS_STAGE s "
+                                            "LEFT OUTER JOIN VOTING_RESULTS v ON v.hash=s.hash "
+                                            "WHERE v.id IS NULL")
+                            self.db_intf.update_votes_daily(cur, proposals_from_time)
+                            db_modified = True
+                        cur.execute("DELETE FROM VOTING_RESULTS_STAGE")
+                        votes_added = [v for v in votes_read if v[5] in new_hashes]
+                        db_oper_duration += (time.time() - tm_begin)
+                        db_oper_count += 5 + 2 * len(proposals_from_time)
+                    else:
+                        # no chance to check whether votes exist in the DB, so assume they're not to have them
+                        # displayed on the grid
+                        votes_added = votes_read
+
                     # display data from dynamic (voting) columns
                     # WndUtils.callFunInTheMainThread(self.update_grid_data, cells_to_update)
-                    logging.info('DB calls duration (stage 1): %s, SQL count: %d' % (str(db_oper_duration),
-                                                                                    db_oper_count))
+                    logging.info('DB calls duration (stage 1): %s, SQL count: %d, votes read: %d, added: %d' %
+                                 (str(db_oper_duration), db_oper_count, len(votes_read), len(votes_added)))
 
-                    # save voting results to the database cache
                     for prop, mn, voting_time, voting_result, mn_ident, hash in votes_added:
                         if self.finishing:
                             raise CloseDialogException
 
-                        if cur:
-                            tm_begin = time.time()
-                            try:
-                                cur.execute("INSERT INTO VOTING_RESULTS(proposal_id, masternode_ident,"
-                                            " voting_time, voting_result, hash) VALUES(?,?,?,?,?)",
-                                            (prop.db_id,
-                                             mn_ident,
-                                             voting_time,
-                                             voting_result,
-                                             hash))
-                            except sqlite3.IntegrityError as e:
-                                if e.args and e.args[0].find('UNIQUE constraint failed') >= 0:
-                                    # this vote is assigned to the same proposal but inactive one; correct this
-                                    cur.execute("UPDATE VOTING_RESULTS"
-                                        " set proposal_id=?, masternode_ident=?,"
-                                        " voting_time=?, voting_result=? WHERE hash=?",
-                                        (prop.db_id,
-                                         mn_ident,
-                                         voting_time,
-                                         voting_result,
-                                         hash))
-                            db_modified = True
-                            db_oper_duration += (time.time() - tm_begin)
-
                         if mn_ident in self.vote_columns_by_mn_ident:
                             prop.apply_vote(mn_ident, voting_time, voting_result)
 
                         # check if voting masternode has its column in the main grid;
                         # if so, pass the voting result to a corresponding proposal field
-                        for col_idx, col in enumerate(self.columns):
-                            if col.column_for_vote and col.name == mn_ident:
-                                if prop.get_value(col.name) != voting_result:
-                                    prop.set_value(col.name, voting_result)
-                                break
+                        col = self.vote_columns_by_mn_ident.get(mn_ident)
+                        if col is not None and prop.get_value(col.name) != voting_result:
+                            prop.set_value(col.name, voting_result)
 
                         # check if currently selected proposal got new votes; if so, update details panel
                         if prop == self.current_proposal:
@@ -1513,14 +1669,12 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
 
                     if cur:
                         # update proposals' voting_last_read_time
-                        for prop in proposals_updated:
-                            if self.finishing:
-                                raise CloseDialogException
-
-                            prop.voting_last_read_time = time.time()
+                        if proposals_updated:
                             tm_begin = time.time()
-                            cur.execute("UPDATE PROPOSALS set dmt_voting_last_read_time=? where id=?",
-                                        (int(time.time()), prop.db_id))
+                            for prop in proposals_updated:
+                                prop.voting_last_read_time = tm_begin
+                            cur.executemany("UPDATE PROPOSALS set dmt_voting_last_read_time=? where id=?",
+                                            [(int(tm_begin), prop.db_id) for prop in proposals_updated])
                             db_modified = True
                             db_oper_duration += (time.time() - tm_begin)
 
@@ -1912,40 +2066,19 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                 if new_chart_type == 1:
                     # draw chart - incremental votes count by date
 
-                    # key: vote day, type: timestamp, value, type: 3-element tuple of mn voting
+                    # key: vote day, type: timestamp, value, type: 3-element list of mn voting
                     votes_aggr = {}
-                    mn_last_votes = {}
-                    vote_mapper = {'YES': 0, 'NO': 1, 'ABSTAIN': 2}
                     dates = []
-                    prev_vd = None
+                    vd = [0, 0, 0]  # yes, no, abstain
                     max_y = 1
 
-                    for idx in range(len(self.votesModel.votes)-1, -1, -1):
-                        v = self.votesModel.votes[idx]
-                        ts = int(datetime.datetime(v[0].year, v[0].month, v[0].day, 0, 0, 0).timestamp()) * 1000
-                        vd = votes_aggr.get(ts)
-                        mn = v[2]
-                        vote = v[1]
-                        if not vd:
-                            # there is no entry for this date yet - add and copy vote counts from the previous
-                            # one if any
-                            if prev_vd is not None:
-                                vd = [prev_vd[0], prev_vd[1], prev_vd[2]]
-                            else:
-                                vd = [0, 0, 0]  # yes, no, abstain
-                            prev_vd = vd
-                            votes_aggr[ts] = vd
-                            dates.append(ts)
-
-                        last_mn_vote = mn_last_votes.get(mn)
-                        if last_mn_vote != vote:
-                            if last_mn_vote is not None:
-                                # subtract votes count for last mn vote type (yes, no, abstain), because
-                                # changing vote by the mn
-                                vd[vote_mapper[last_mn_vote]] -= 1
-                            vd[vote_mapper[vote]] += 1
-                            mn_last_votes[mn] = vote  # save the last mn vote
-                            max_y = max(max_y, vd[vote_mapper[vote]])
+                    # the daily aggregates contain the changes of the vote counts, so sum them up
+                    for row in self.votesModel.votes_daily:
+                        ts = row[0] * 1000
+                        vd = [vd[0] + row[1], vd[1] + row[2], vd[2] + row[3]]
+                        votes_aggr[ts] = vd
+                        dates.append(ts)
+                        max_y = max(max_y, vd[0], vd[1], vd[2])
 
                     ser_abs_yes = QLineSeries()
                     ser_abs_yes.setName('Absolute Yes')
@@ -2108,30 +2241,20 @@ class ProposalsDlg(QDialog, ui_proposals.Ui_ProposalsDlg, wnd_utils.WndUtils):
                         5: '#cc2900'
                     }
                     change_existence = [False] * 6
-                    mn_last_votes = {}
                     dates = []
                     max_y = 0
 
-                    for idx in range(len(self.votesModel.votes)-1, -1, -1):
-                        v = self.votesModel.votes[idx]
-                        ts = int(datetime.datetime(v[0].year, v[0].month, v[0].day, 0, 0, 0).timestamp()) * 1000
-                        mn = v[2]
-                        vote = v[1]
-
-                        last_mn_vote = mn_last_votes.get(mn)
-                        if last_mn_vote and last_mn_vote != vote:
-                            vd = votes_change_by_date.get(ts)
-                            if not vd:
-                                # there is no entry for this date yet
-                                vd = [0] * 6
-                                votes_change_by_date[ts] = vd
-                                dates.append(ts)
-                            change_type = last_mn_vote.capitalize() + '->' + vote.capitalize()
-                            change_type_idx = vote_change_mapper[change_type]
-                            vd[change_type_idx] += 1
-                            change_existence[change_type_idx] = True
-                            max_y = max(max_y, vd[change_type_idx])
-                        mn_last_votes[mn] = vote  # save the last mn vote
+                    for row in self.votesModel.votes_daily:
+                        if row[4]:
+                            # columns following the 'changes' one are ordered as in vote_change_mapper
+                            ts = row[0] * 1000
+                            vd = list(row[5:11])
+                            votes_change_by_date[ts] = vd
+                            dates.append(ts)
+                            for change_type_idx, count in enumerate(vd):
+                                if count:
+                                    change_existence[change_type_idx] = True
+                                    max_y = max(max_y, count)
 
                     ser = QBarSeries()
                     ser.setLabelsVisible(True)
@@ -2601,6 +2724,24 @@ class ProposalsModel(QAbstractTableModel):
         else:
             return '  '
 
+    def refresh_proposals(self, proposals):
+        """
+        Notifies the views about changed data of the proposals, without resetting the whole model. The hyperlink
+        cells (name, title, url) are widgets not refreshed by the view, so their texts are set here.
+        """
+        proposals = set(proposals)
+        last_col_idx = len(self.columns) - 1
+        widgets_missing = False
+        for row_idx, prop in enumerate(self.proposals):
+            if prop in proposals:
+                self.dataChanged.emit(self.index(row_idx, 0), self.index(row_idx, last_col_idx))
+                if prop.name_col_widget and prop.title_col_widget and prop.url_col_widget:
+                    self.parent.correct_proposal_hyperlink_color(prop)
+                else:
+                    widgets_missing = True
+        if widgets_missing:
+            self.displaySpecialCells()
+
     def setData(self, row, col, role=None):
         index = self.index(row, col)
         index = self.parent.proxyModel.mapFromSource(index)
@@ -2771,6 +2912,9 @@ class VotesModel(QAbstractTableModel):
         self.only_my_votes = False
         self.proposal = None
         self.votes = []  # list of tuples: voting time (datetime), vote, masternode_label, users_masternode_name
+        # list of tuples (VOTING_RESULTS_DAILY rows ordered by day): day, yes, no, abstain, changes, followed by
+        # the number of changes of each type from VOTE_CHANGE_COLUMNS
+        self.votes_daily = []
         self.columns = ['Vote timestamp', 'Vote', 'Masternode', "User's Masternode"]
 
     def columnCount(self, parent=None, *args, **kwargs):
@@ -2830,11 +2974,12 @@ class VotesModel(QAbstractTableModel):
     def read_votes(self):
         try:
             self.votes.clear()
+            self.votes_daily = []
             tm_begin = time.time()
             cur = self.db_intf.get_cursor()
             logging.debug('Get votes fot proposal id: ' + str(self.proposal.db_id))
             cur.execute("SELECT voting_time, voting_result, masternode_ident, m.ip "
-                        "FROM VOTING_RESULTS v "
+                        "FROM VOTING_RESULTS_ALL v "
                         "LEFT OUTER JOIN MASTERNODES m on m.ident = v.masternode_ident "
                         "WHERE proposal_id=? order by voting_time desc", (self.proposal.db_id,))
 
@@ -2851,8 +2996,13 @@ class VotesModel(QAbstractTableModel):
                 if users_mn:
                     users_mn_name = users_mn.masternode_config.name
 
-                self.votes.append((datetime.datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S'),
+                self.votes.append((datetime.datetime.fromtimestamp(row[0]),
                                    row[1], mn_label, users_mn_name))
+
+            cur.execute("SELECT day, yes, no, abstain, changes, %s FROM VOTING_RESULTS_DAILY "
+                        "WHERE proposal_id=? ORDER BY day" % ', '.join(col for col, _ in VOTE_CHANGE_COLUMNS),
+                        (self.proposal.db_id,))
+            self.votes_daily = cur.fetchall()
             logging.debug('Reading votes time from DB: %s' % str(time.time() - tm_begin))
 
         except CloseDialogException:
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Bertrand256
+# Created on: 2017-11
+import os
+import sqlite3
+import logging
+import time
+import simplejson
+import threading
+
+
+# maximum total size (in bytes) of the cached responses; least recently used entries are evicted above it
+RPC_CACHE_MAX_SIZE = 50 * 1024 * 1024
+
+# number of seconds after which mutable entries (i.e. related to not yet confirmed data) become stale
+RPC_CACHE_MUTABLE_MAX_AGE = 3600
+
+# number of confirmations after which block/transaction data is treated as immutable
+RPC_CACHE_IMMUTABLE_CONFIRMATIONS = 6
+
+
+class RpcResponseCache(object):
+    """
+    Purpose: storing results of RPC calls which (mostly) do not change over time, like getrawtransaction,
+    getblockhash and getblockheader. Entries are keyed by (method, args) and kept in a single SQLite table.
+
+    Entries marked as immutable (confirmed data) never go stale, the rest is treated as valid for
+    RPC_CACHE_MUTABLE_MAX_AGE seconds. If the total size of the stored responses exceeds max_size, the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, db_file_name, max_size=RPC_CACHE_MAX_SIZE):
+        self.db_file_name = db_file_name
+        self.max_size = max_size
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.total_size = 0
+        self.db_conn = sqlite3.connect(self.db_file_name, check_same_thread=False)
+        try:
+            cur = self.db_conn.cursor()
+            cur.execute("CREATE TABLE IF NOT EXISTS RPC_CACHE(key TEXT PRIMARY KEY, value BLOB, size INTEGER,"
+                        " immutable INTEGER, create_time INTEGER, last_access_time INTEGER)")
+            cur.execute("CREATE INDEX IF NOT EXISTS IDX_RPC_CACHE_LAST_ACCESS ON RPC_CACHE(last_access_time)")
+            cur.execute("SELECT SUM(size) FROM RPC_CACHE")
+            row = cur.fetchone()
+            self.total_size = row[0] if row and row[0] else 0
+            self.db_conn.commit()
+        except Exception:
+            self.db_conn.close()
+            raise
+
+        remove_legacy_cache_files(os.path.dirname(db_file_name))
+
+    @staticmethod
+    def make_key(method, args):
+        return method + ':' + simplejson.dumps(list(args))
+
+    def get(self, method, args):
+        """
+        :return: cached result of the RPC call or None if there is no valid entry for it
+        """
+        key = self.make_key(method, args)
+        now = int(time.time())
+        try:
+            self.lock.acquire()
+            cur = self.db_conn.cursor()
+            cur.execute("SELECT value, immutable, create_time, last_access_time FROM RPC_CACHE WHERE key=?",
+                        (key,))
+            row = cur.fetchone()
+            if row and (row[1] or now - row[2] < RPC_CACHE_MUTABLE_MAX_AGE):
+                if now - row[3] > 60:
+                    # the access time doesn't need to be precise for LRU; avoid a write for each hit
+                    cur.execute("UPDATE RPC_CACHE SET last_access_time=? WHERE key=?", (now, key))
+                    self.db_conn.commit()
+                self.hits += 1
+                return simplejson.loads(row[0].decode('utf8'), use_decimal=True)
+            self.misses += 1
+            return None
+        except Exception:
+            logging.exception('Error while reading the RPC cache')
+            return None
+        finally:
+            self.lock.release()
+
+    def set(self, method, args, value, immutable=False):
+        key = self.make_key(method, args)
+        data = simplejson.dumps(value).encode('utf8')
+        now = int(time.time())
+        try:
+            self.lock.acquire()
+            cur = self.db_conn.cursor()
+            cur.execute("SELECT size FROM RPC_CACHE WHERE key=?", (key,))
+            row = cur.fetchone()
+            if row:
+                self.total_size -= row[0]
+            cur.execute("INSERT OR REPLACE INTO RPC_CACHE(key, value, size, immutable, create_time, "
+                        "last_access_time) VALUES(?,?,?,?,?,?)",
+                        (key, sqlite3.Binary(data), len(data), 1 if immutable else 0, now, now))
+            self.total_size += len(data)
+            if self.total_size > self.max_size:
+                self.evict(cur)
+            self.db_conn.commit()
+        except Exception:
+            logging.exception('Error while saving data to the RPC cache')
+        finally:
+            self.lock.release()
+
+    def evict(self, cur):
+        """ Removes the least recently used entries until the total size drops to 90% of max_size. """
+        target_size = int(self.max_size * 0.9)
+        while self.total_size > target_size:
+            cur.execute("SELECT key, size FROM RPC_CACHE ORDER BY last_access_time LIMIT 100")
+            rows = cur.fetchall()
+            if not rows:
+                self.total_size = 0
+                break
+            for key, size in rows:
+                if self.total_size <= target_size:
+                    break
+                cur.execute("DELETE FROM RPC_CACHE WHERE key=?", (key,))
+                self.total_size -= size
+        logging.info('RPC cache eviction finished, current size: %d' % self.total_size)
+
+    def get_stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': self.total_size}
+
+    def close(self):
+        try:
+            self.lock.acquire()
+            logging.info('RPC cache stats: %s' % str(self.get_stats()))
+            self.db_conn.close()
+        finally:
+            self.lock.release()
+
+
+def is_immutable_result(method, args, result, block_count=None):
+    """
+    Returns True if the result of a cached RPC call relates to data with enough confirmations to not change
+    anymore.
+    :param block_count: the current height of the chain known to the caller (None if unknown); needed for
+        methods whose results carry no confirmation count, like getblockhash
+    """
+    if method == 'getblockhash':
+        # the result is a bare block hash, so the decision is based on the requested height
+        if block_count is not None and args and isinstance(args[0], int):
+            return args[0] <= block_count - RPC_CACHE_IMMUTABLE_CONFIRMATIONS
+        return False
+    if isinstance(result, dict):
+        confirmations = result.get('confirmations')
+        if confirmations is not None and confirmations >= RPC_CACHE_IMMUTABLE_CONFIRMATIONS:
+            return True
+    return False
+
+
+def remove_legacy_cache_files(cache_dir):
+    """ Removes files created by the former, file-per-response RPC cache. """
+    try:
+        removed = 0
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and entry.name.startswith('insight_dash_') and entry.name.endswith('.json'):
+                os.remove(entry.path)
+                removed += 1
+        if removed:
+            logging.info('Removed %d legacy RPC cache files' % removed)
+    except Exception:
+        logging.exception('Error while removing legacy RPC cache files')
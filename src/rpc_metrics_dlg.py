@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Bertrand256
+# Created on: 2017-11
+
+import datetime
+import logging
+from PyQt5.QtCore import pyqtSlot, Qt
+from PyQt5.QtWidgets import QDialog, QTableWidgetItem
+from ui import ui_rpc_metrics_dlg
+from wnd_utils import WndUtils
+from dashd_intf import rpc_metrics
+
+
+class NumericTableWidgetItem(QTableWidgetItem):
+    """ Table item sorted by its numeric value instead of the displayed text. """
+    def __init__(self, value, text):
+        QTableWidgetItem.__init__(self, text)
+        self.value = value
+        self.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+    def __lt__(self, other):
+        if isinstance(other, NumericTableWidgetItem):
+            return self.value < other.value
+        return QTableWidgetItem.__lt__(self, other)
+
+
+class RpcMetricsDlg(QDialog, ui_rpc_metrics_dlg.Ui_RpcMetricsDlg, WndUtils):
+    """
+    Diagnostics dialog displaying statistics of the RPC calls (dashd_intf.rpc_metrics): call counts, latencies,
+    errors, retries, failovers, bytes received and cache hits per method and per connection.
+    """
+    def __init__(self, parent, config):
+        QDialog.__init__(self, parent)
+        ui_rpc_metrics_dlg.Ui_RpcMetricsDlg.__init__(self)
+        WndUtils.__init__(self, config)
+        self.setupUi()
+
+    def setupUi(self):
+        ui_rpc_metrics_dlg.Ui_RpcMetricsDlg.setupUi(self, self)
+        self.setWindowTitle('RPC diagnostics')
+        self.columns = ['Method', 'Connection', 'Calls', 'Errors', 'Retries', 'Avg time [ms]', 'p90 [ms]',
+                        'Max time [ms]', 'Received [kB]', 'Cache hits [%]']
+        self.tabMetrics.setColumnCount(len(self.columns))
+        self.tabMetrics.setHorizontalHeaderLabels(self.columns)
+        self.display_data()
+
+    def display_data(self):
+        data = rpc_metrics.to_dict()
+        self.tabMetrics.setSortingEnabled(False)
+        self.tabMetrics.setRowCount(len(data['methods']))
+        for row, m in enumerate(data['methods']):
+            self.tabMetrics.setItem(row, 0, QTableWidgetItem(m['method']))
+            self.tabMetrics.setItem(row, 1, QTableWidgetItem(m['connection']))
+            self.tabMetrics.setItem(row, 2, NumericTableWidgetItem(m['count'], str(m['count'])))
+            self.tabMetrics.setItem(row, 3, NumericTableWidgetItem(m['errors'], str(m['errors'])))
+            self.tabMetrics.setItem(row, 4, NumericTableWidgetItem(m['retries'], str(m['retries'])))
+            avg_ms = m['avg_time'] * 1000
+            self.tabMetrics.setItem(row, 5, NumericTableWidgetItem(avg_ms, '%.1f' % avg_ms))
+            p90 = m['p90_time']
+            if p90 is None:
+                self.tabMetrics.setItem(row, 6, NumericTableWidgetItem(float('inf'), 'slow'))
+            else:
+                self.tabMetrics.setItem(row, 6, NumericTableWidgetItem(p90 * 1000, '<= %d' % int(p90 * 1000)))
+            max_ms = m['max_time'] * 1000
+            self.tabMetrics.setItem(row, 7, NumericTableWidgetItem(max_ms, '%.1f' % max_ms))
+            kb = m['bytes_received'] / 1024
+            self.tabMetrics.setItem(row, 8, NumericTableWidgetItem(kb, '%.1f' % kb))
+            cache_calls = m['cache_hits'] + m['cache_misses']
+            if cache_calls:
+                ratio = m['cache_hits'] * 100 / cache_calls
+                self.tabMetrics.setItem(row, 9, NumericTableWidgetItem(ratio, '%.0f' % ratio))
+            else:
+                self.tabMetrics.setItem(row, 9, NumericTableWidgetItem(-1, ''))
+        self.tabMetrics.setSortingEnabled(True)
+        self.tabMetrics.resizeColumnsToContents()
+
+        since = datetime.datetime.fromtimestamp(data['start_time'])
+        summary = 'Statistics since: %s.' % self.app_config.to_string(since)
+        if data['failovers']:
+            summary += ' Failovers: ' + ', '.join(['%s: %d' % (c, cnt) for c, cnt in
+                                                    sorted(data['failovers'].items())]) + '.'
+        fwd = data['ssh_forward']
+        if fwd['chunks_sent'] or fwd['chunks_received']:
+            summary += ' SSH tunnel: sent %.1f kB in %d chunks, received %.1f kB in %d chunks.' % \
+                       (fwd['bytes_sent'] / 1024, fwd['chunks_sent'], fwd['bytes_received'] / 1024,
+                        fwd['chunks_received'])
+        if self.app_config.rpc_cache:
+            cache_stats = self.app_config.rpc_cache.get_stats()
+            summary += ' RPC cache: hits: %d, misses: %d, size: %.1f kB.' % \
+                       (cache_stats['hits'], cache_stats['misses'], cache_stats['size'] / 1024)
+        self.lblSummary.setText(summary)
+
+    @pyqtSlot(bool)
+    def on_btnRefresh_clicked(self):
+        self.display_data()
+
+    @pyqtSlot(bool)
+    def on_btnReset_clicked(self):
+        rpc_metrics.clear()
+        self.display_data()
+
+    @pyqtSlot(bool)
+    def on_btnSaveJson_clicked(self):
+        file_name = self.save_file_query('Enter name of the JSON file to save',
+                                         filter="All Files (*);;JSON files (*.json)",
+                                         initial_filter="JSON files (*.json)")
+        if file_name:
+            try:
+                rpc_metrics.dump_json(file_name)
+            except Exception as e:
+                logging.exception('Exception while saving RPC metrics')
+                self.errorMsg(str(e))
+
+    @pyqtSlot(bool)
+    def on_btnClose_clicked(self):
+        self.close()
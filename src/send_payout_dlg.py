@@ -466,15 +466,40 @@ class SendPayoutDlg(QDialog, ui_send_payout_dlg.Ui_SendPayoutDlg, WndUtils):
                     # for each utxo read block time
                     cur_block_height = self.dashd_intf.getblockcount()
 
+                    # block hashes, block headers and transactions are read with batch requests, which
+                    # saves a network round trip per utxo; transactions are read concurrently with block data
+                    def read_headers():
+                        blockhashes = self.dashd_intf.call_many('getblockhash', [(utxo.get('height'),)
+                                                                                 for utxo in self.utxos])
+                        for blockhash, error in blockhashes:
+                            if error is not None:
+                                raise error
+                        headers = self.dashd_intf.call_many('getblockheader', [(blockhash,)
+                                                                               for blockhash, _ in blockhashes])
+                        for bh, error in headers:
+                            if error is not None:
+                                raise error
+                        return headers
+
+                    headers, rawtxs = self.dashd_intf.gather(
+                        [(read_headers, ()),
+                         (self.dashd_intf.call_many, ('getrawtransaction', [(utxo.get('txid'), 1)
+                                                                            for utxo in self.utxos]))])
+                    if isinstance(headers, Exception):
+                        raise headers
+                    if isinstance(rawtxs, Exception):
+                        raise rawtxs
+
                     for idx, utxo in enumerate(self.utxos):
-                        blockhash = self.dashd_intf.getblockhash(utxo.get('height'))
-                        bh = self.dashd_intf.getblockheader(blockhash)
+                        bh = headers[idx][0]
                         utxo['time_str'] = self.main_ui.config.to_string(datetime.datetime.fromtimestamp(bh['time']))
                         utxo['confirmations'] = cur_block_height - bh.get('height') + 1
                         utxo['coinbase_locked'] = False
 
                         try:
-                            rawtx = self.dashd_intf.getrawtransaction(utxo.get('txid'), utxo.get('outputIndex'))
+                            rawtx, error = rawtxs[idx]
+                            if error is not None:
+                                raise error
                             if rawtx:
                                 if not isinstance(rawtx, dict):
                                     decodedtx = self.dashd_intf.decoderawtransaction(rawtx)
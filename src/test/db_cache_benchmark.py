@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Bertrand256
+# Created on: 2017-11
+#
+# Benchmark of the database operations performed by the proposals dialog (loading proposals, reading votes of
+# the focused proposal, saving vote status, concurrent readers) using the current DBCache implementation and
+# the former one (connection opened for each session, rollback journal, single lock).
+# Usage: python db_cache_benchmark.py
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import thread_utils
+from db_intf import DBCache
+
+
+class LegacyDBCache(object):
+    """ The former implementation of DBCache. """
+    def __init__(self, db_cache_file_name):
+        self.db_cache_file_name = db_cache_file_name
+        self.lock = thread_utils.EnhRLock(stackinfo_skip_lines=1)
+        self.depth = 0
+        self.db_conn = None
+        db_conn = sqlite3.connect(self.db_cache_file_name)
+        db_conn.execute('PRAGMA journal_mode=DELETE')
+        db_conn.close()
+
+    def get_cursor(self):
+        self.lock.acquire()
+        self.depth += 1
+        if self.db_conn is None:
+            self.db_conn = sqlite3.connect(self.db_cache_file_name)
+        return self.db_conn.cursor()
+
+    def release_cursor(self):
+        try:
+            self.lock.acquire()
+            self.depth -= 1
+            if self.depth == 0:
+                self.db_conn.close()
+                self.db_conn = None
+            self.lock.release()
+        finally:
+            self.lock.release()
+
+    def commit(self):
+        self.db_conn.commit()
+
+    def close(self):
+        pass
+
+
+def populate(db_file_name, proposals, votes_per_proposal, masternodes):
+    db = DBCache(db_file_name)
+    cur = db.get_cursor()
+    try:
+        mn_idents = ['%064x-%d' % (random.getrandbits(256), idx % 2) for idx in range(masternodes)]
+        cur.executemany("INSERT INTO MASTERNODES(ident, ip, dmt_active) VALUES(?,?,1)",
+                        [(ident, '10.0.%d.%d' % (idx // 256 % 256, idx % 256)) for idx, ident in enumerate(mn_idents)])
+        for prop_id in range(1, proposals + 1):
+            cur.execute("INSERT INTO PROPOSALS(id, name, hash, dmt_active) VALUES(?,?,?,1)",
+                        (prop_id, 'proposal-%d' % prop_id, '%064x' % random.getrandbits(256)))
+            cur.executemany("INSERT INTO VOTING_RESULTS(proposal_id, masternode_ident, voting_time, voting_result,"
+                            " hash) VALUES(?,?,?,?,?)",
+                            [(prop_id, ident, 1509537600 + random.randint(0, 86400 * 28), 'YES',
+                              '%064x' % random.getrandbits(256))
+                             for ident in random.sample(mn_idents, votes_per_proposal)])
+        db.commit()
+    finally:
+        db.release_cursor()
+    db.close()
+
+
+def read_votes(db, proposal_id):
+    cur = db.get_cursor()
+    try:
+        cur.execute("SELECT voting_time, voting_result, masternode_ident, m.ip "
+                    "FROM VOTING_RESULTS v "
+                    "LEFT OUTER JOIN MASTERNODES m on m.ident = v.masternode_ident "
+                    "WHERE proposal_id=? order by voting_time desc", (proposal_id,))
+        return len(cur.fetchall())
+    finally:
+        db.release_cursor()
+
+
+def run(name, db, proposals):
+    times = []
+
+    tm = time.time()
+    cur = db.get_cursor()
+    cur.execute("SELECT * FROM PROPOSALS WHERE dmt_active=1")
+    cur.fetchall()
+    db.release_cursor()
+    times.append(time.time() - tm)
+
+    tm = time.time()
+    for _ in range(300):
+        read_votes(db, random.randint(1, proposals))
+    times.append(time.time() - tm)
+
+    tm = time.time()
+    for idx in range(300):
+        cur = db.get_cursor()
+        try:
+            cur.execute("INSERT OR REPLACE INTO LIVE_CONFIG(symbol, value) VALUES(?,?)", ('vote_status', str(idx)))
+            db.commit()
+        finally:
+            db.release_cursor()
+    times.append(time.time() - tm)
+
+    def reader():
+        for _ in range(75):
+            read_votes(db, random.randint(1, proposals))
+
+    tm = time.time()
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    times.append(time.time() - tm)
+    print('%-8s load proposals %.3fs, 300 x read votes %.3fs, 300 x status update %.3fs, '
+          '4 threads x 75 x read votes %.3fs' % tuple([name] + times))
+
+
+if __name__ == '__main__':
+    proposals = 100
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        db_file_name = os.path.join(tmp_dir, 'dmt_cache.db')
+        populate(db_file_name, proposals, 1000, 5000)
+        legacy = LegacyDBCache(db_file_name)
+        run('legacy', legacy, proposals)
+        db = DBCache(db_file_name)
+        run('current', db, proposals)
+        db.close()
+    finally:
+        shutil.rmtree(tmp_dir)
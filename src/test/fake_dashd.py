@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Bertrand256
+# Created on: 2017-11
+#
+# Local stand-in for the dashd JSON-RPC interface, serving a synthetic dataset or RPC traffic recorded by the app
+# (started with the --rpc-record argument) with configurable latency. Supports keep-alive connections and
+# JSON-RPC batch requests. Usage:
+#   python fake_dashd.py --port 19998 --masternodes 5000 --proposals 100 --votes 1000 --latency 50 --jitter 20
+#   python fake_dashd.py --port 19998 --replay rpc_record.json
+# then configure a direct RPC connection to 127.0.0.1:<port> (any username/password) in the app.
+import argparse
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import simplejson
+
+
+GENESIS_TIME = 1390095618
+BLOCK_INTERVAL = 150
+SUPERBLOCK_CYCLE = 16616
+
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.error = {'code': code, 'message': message}
+
+
+class SyntheticDataset(object):
+    """ Deterministic (for a given seed) dataset resembling the dash mainnet. """
+    def __init__(self, masternodes=5000, proposals=100, votes=1000, seed=1):
+        rnd = random.Random(seed)
+        self.height = 800000
+        self.now = GENESIS_TIME + self.height * BLOCK_INTERVAL
+        self.masternodes = {}
+        for idx in range(masternodes):
+            ident = '%064x-%d' % (rnd.getrandbits(256), rnd.randint(0, 1))
+            self.masternodes[ident] = '  ENABLED 70208 X%033x %d %d %d %d %d.%d.%d.%d:9999' % \
+                (rnd.getrandbits(132), self.now - rnd.randint(0, 600), rnd.randint(0, 10 ** 7),
+                 self.now - rnd.randint(0, 10 ** 6), self.height - rnd.randint(0, 7000),
+                 rnd.randint(1, 223), rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(1, 254))
+        mn_idents = list(self.masternodes.keys())
+
+        self.proposals = {}
+        self.votes = {}
+        for idx in range(proposals):
+            prop_hash = '%064x' % rnd.getrandbits(256)
+            start = self.now - rnd.randint(0, 90) * 86400
+            data = [['proposal', {'name': 'proposal-%d' % idx, 'start_epoch': start,
+                                  'end_epoch': start + rnd.randint(1, 12) * 30 * 86400,
+                                  'payment_amount': rnd.randint(1, 5000), 'type': 1,
+                                  'payment_address': 'X%033x' % rnd.getrandbits(132),
+                                  'url': 'https://www.dashcentral.org/p/proposal-%d' % idx}]]
+            yes, no = rnd.randint(0, votes), rnd.randint(0, votes // 4)
+            self.proposals[prop_hash] = {
+                'DataHex': '', 'DataString': simplejson.dumps(data), 'Hash': prop_hash,
+                'CollateralHash': '%064x' % rnd.getrandbits(256), 'ObjectType': 1,
+                'CreationTime': start - 86400, 'AbsoluteYesCount': yes - no, 'YesCount': yes, 'NoCount': no,
+                'AbstainCount': 0, 'fBlockchainValidity': True, 'IsValidReason': '', 'fCachedValid': True,
+                'fCachedFunding': False, 'fCachedDelete': False, 'fCachedEndorsed': False}
+            prop_votes = {}
+            for mn_ident in rnd.sample(mn_idents, min(votes, len(mn_idents))):
+                tx_hash, tx_index = mn_ident.split('-')
+                vote_hash = hashlib.sha256((prop_hash + mn_ident).encode('ascii')).hexdigest()
+                prop_votes[vote_hash] = 'CTxIn(COutPoint(%s, %s), scriptSig=):%d:%s:FUNDING' % \
+                    (tx_hash, tx_index, start + rnd.randint(0, 86400 * 20), rnd.choice(('YES', 'YES', 'NO', 'ABSTAIN')))
+            self.votes[prop_hash] = prop_votes
+
+    def block_hash(self, height):
+        return hashlib.sha256(str(height).encode('ascii')).hexdigest()
+
+    def call(self, method, params):
+        if method == 'getblockcount':
+            return self.height
+        elif method == 'getinfo':
+            return {'version': 120203, 'protocolversion': 70208, 'blocks': self.height, 'connections': 8}
+        elif method == 'mnsync':
+            return {'AssetID': 999, 'AssetName': 'MASTERNODE_SYNC_FINISHED', 'IsBlockchainSynced': True,
+                    'IsMasternodeListSynced': True, 'IsWinnersListSynced': True, 'IsSynced': True, 'IsFailed': False}
+        elif method == 'getgovernanceinfo':
+            last_sb = self.height - self.height % SUPERBLOCK_CYCLE
+            return {'governanceminquorum': 10, 'masternodewatchdogmaxseconds': 7200, 'proposalfee': 5.0,
+                    'superblockcycle': SUPERBLOCK_CYCLE, 'lastsuperblock': last_sb,
+                    'nextsuperblock': last_sb + SUPERBLOCK_CYCLE, 'maxgovobjdatasize': 16384}
+        elif method == 'getblockhash':
+            return self.block_hash(params[0])
+        elif method == 'getblockheader':
+            for height in range(self.height, -1, -1):
+                if self.block_hash(height) == params[0]:
+                    return {'hash': params[0], 'height': height, 'time': GENESIS_TIME + height * BLOCK_INTERVAL,
+                            'confirmations': self.height - height + 1}
+                if self.height - height > 100000:
+                    break
+            raise RpcError(-5, 'Block not found')
+        elif method == 'getrawtransaction':
+            return {'txid': params[0], 'version': 1, 'locktime': 0, 'confirmations': 100,
+                    'vin': [{'txid': hashlib.sha256(params[0].encode('ascii')).hexdigest(), 'vout': 0}],
+                    'vout': [{'value': 1000.0, 'n': 0, 'scriptPubKey': {'type': 'pubkeyhash'}}]}
+        elif method == 'masternodelist':
+            return self.masternodes
+        elif method == 'gobject':
+            if params and params[0] == 'list':
+                return self.proposals
+            elif params and params[0] in ('getvotes', 'getcurrentvotes') and len(params) >= 2:
+                return self.votes.get(params[1], {})
+            raise RpcError(-32602, 'Invalid gobject command')
+        elif method == 'getaddressutxos':
+            addresses = params[0].get('addresses', [])
+            return [{'address': addr, 'txid': hashlib.sha256((addr + str(idx)).encode('ascii')).hexdigest(),
+                     'outputIndex': 0, 'script': '', 'satoshis': 100000000 * (idx + 1),
+                     'height': self.height - idx * 100} for addr in addresses for idx in range(10)]
+        elif method == 'getaddressbalance':
+            return {'balance': len(params[0].get('addresses', [])) * 5500000000, 'received': 0}
+        elif method == 'validateaddress':
+            return {'isvalid': True, 'address': params[0]}
+        raise RpcError(-32601, 'Method not found')
+
+
+class ReplayDataset(object):
+    """ Serves RPC calls recorded by the app (dashd_intf.RpcRecorder). """
+    def __init__(self, file_name):
+        with open(file_name) as f_ptr:
+            data = simplejson.load(f_ptr, use_decimal=True)
+        self.calls = {}
+        for call in data.get('calls', []):
+            self.calls[call['method'] + ':' + simplejson.dumps(call['params'])] = call
+
+    def call(self, method, params):
+        call = self.calls.get(method + ':' + simplejson.dumps(list(params)))
+        if call is None:
+            raise RpcError(-32601, 'Call not recorded: %s %s' % (method, simplejson.dumps(params)))
+        if call.get('error') is not None:
+            raise RpcError(call['error'].get('code', -1), call['error'].get('message', ''))
+        return call.get('result')
+
+
+class FakeDashdServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, dataset, latency=0.0, jitter=0.0):
+        """
+        :param latency: delay (in seconds) of each HTTP request (a batch request is delayed once)
+        :param jitter: maximum random delay (in seconds) added to latency
+        """
+        HTTPServer.__init__(self, address, FakeDashdHandler)
+        self.dataset = dataset
+        self.latency = latency
+        self.jitter = jitter
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.calls = 0
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address[1]
+
+
+class FakeDashdHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def process_call(self, req):
+        try:
+            result = self.server.dataset.call(req.get('method'), req.get('params', []))
+            return {'result': result, 'error': None, 'id': req.get('id')}
+        except RpcError as e:
+            return {'result': None, 'error': e.error, 'id': req.get('id')}
+
+    def do_POST(self):
+        body = simplejson.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf8'),
+                                use_decimal=True)
+        srv = self.server
+        delay = srv.latency + random.uniform(0, srv.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if isinstance(body, list):
+            response = [self.process_call(req) for req in body]
+            calls = len(body)
+        else:
+            response = self.process_call(body)
+            calls = 1
+        with srv.lock:
+            srv.requests += 1
+            srv.calls += calls
+        data = simplejson.dumps(response).encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=19998, help="TCP port to listen on (0: any free port)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Delay of each request [ms]")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Maximum random delay added to latency [ms]")
+    parser.add_argument('--masternodes', type=int, default=5000)
+    parser.add_argument('--proposals', type=int, default=100)
+    parser.add_argument('--votes', type=int, default=1000, help="Maximum number of votes per proposal")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--replay', help="File with RPC traffic recorded by the app (--rpc-record argument)")
+    args = parser.parse_args()
+
+    if args.replay:
+        dataset = ReplayDataset(args.replay)
+        print('Replaying %d recorded calls from %s' % (len(dataset.calls), args.replay))
+    else:
+        dataset = SyntheticDataset(args.masternodes, args.proposals, args.votes, args.seed)
+    server = FakeDashdServer(('127.0.0.1', args.port), dataset, args.latency / 1000, args.jitter / 1000)
+    print('Fake dashd listening on 127.0.0.1:%d' % server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('Requests: %d, calls: %d' % (server.requests, server.calls))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Bertrand256
+# Created on: 2017-11
+#
+# Benchmark of creating and updating the network-wide masternode list objects (dashd_intf.Masternode)
+# compared to the former AttrsProtected based implementation. Usage: python masternode_benchmark.py
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import AttrsProtected
+from dashd_intf import Masternode
+
+
+class LegacyMasternode(AttrsProtected):
+    """ The former implementation of dashd_intf.Masternode. """
+    def __init__(self):
+        AttrsProtected.__init__(self)
+        self.ident = None
+        self.status = None
+        self.protocol = None
+        self.payee = None
+        self.lastseen = None
+        self.activeseconds = None
+        self.lastpaidtime = None
+        self.lastpaidblock = None
+        self.ip = None
+        self.db_id = None
+        self.marker = None
+        self.modified = False
+        self.monitor_changes = False
+        self.queue_position = None
+        self.set_attr_protection()
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name) and name not in ('modified', 'marker', 'monitor_changes',
+                                                '_AttrsProtected__allow_attr_definition'):
+            if self.monitor_changes and getattr(self, name) != value:
+                self.modified = True
+        super().__setattr__(name, value)
+
+
+def create_raw_list(count):
+    now = int(time.time())
+    mns_raw = {}
+    for idx in range(count):
+        mns_raw['%064x-%d' % (random.getrandbits(256), idx % 2)] = \
+            '  ENABLED 70208 XpAy%030x %d %d %d %d 10.%d.%d.%d:9999' % \
+            (random.getrandbits(120), now - random.randint(0, 600), random.randint(0, 10**7),
+             now - random.randint(0, 10**6), random.randint(700000, 800000), idx % 256, idx // 256 % 256, idx % 7)
+    return mns_raw
+
+
+def parse_legacy(mns_raw):
+    ret_list = []
+    for mn_id, mn_raw in mns_raw.items():
+        elems = mn_raw.strip().split()
+        mn = LegacyMasternode()
+        mn.status, mn.protocol, mn.payee, mn.lastseen, mn.activeseconds, mn.lastpaidtime, \
+            mn.lastpaidblock, mn.ip = elems
+        mn.lastseen = int(mn.lastseen)
+        mn.activeseconds = int(mn.activeseconds)
+        mn.lastpaidtime = int(mn.lastpaidtime)
+        mn.lastpaidblock = int(mn.lastpaidblock)
+        mn.ident = mn_id
+        ret_list.append(mn)
+    return ret_list
+
+
+def update_legacy(existing_mn, new_data):
+    existing_mn.modified = False
+    existing_mn.monitor_changes = True
+    existing_mn.ident = new_data.ident
+    existing_mn.status = new_data.status
+    existing_mn.protocol = new_data.protocol
+    existing_mn.payee = new_data.payee
+    existing_mn.lastseen = new_data.lastseen
+    existing_mn.activeseconds = new_data.activeseconds
+    existing_mn.lastpaidtime = new_data.lastpaidtime
+    existing_mn.lastpaidblock = new_data.lastpaidblock
+    existing_mn.ip = new_data.ip
+    return existing_mn.modified
+
+
+def parse_slots(mns_raw):
+    ret_list = []
+    for mn_id, mn_raw in mns_raw.items():
+        elems = mn_raw.strip().split()
+        mn = Masternode()
+        mn.set_values((elems[0], elems[1], elems[2], int(elems[3]), int(elems[4]), int(elems[5]),
+                       int(elems[6]), elems[7]))
+        mn.ident = mn_id
+        ret_list.append(mn)
+    return ret_list
+
+
+def update_slots(existing_mn, new_data):
+    new_values = new_data.get_values()
+    if existing_mn.get_values() == new_values:
+        return False
+    existing_mn.set_values(new_values)
+    return True
+
+
+def run(name, parse_fun, update_fun, mns_raw):
+    tracemalloc.start()
+    tm = time.time()
+    mns = parse_fun(mns_raw)
+    parse_time = time.time() - tm
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    mns_new = parse_fun(mns_raw)
+    tm = time.time()
+    modified = 0
+    for existing_mn, new_mn in zip(mns, mns_new):
+        if update_fun(existing_mn, new_mn):
+            modified += 1
+    update_time = time.time() - tm
+    print('%-8s %6d masternodes: parse %.4fs, update %.4fs, memory %.2f MB' %
+          (name, len(mns), parse_time, update_time, memory / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    for count in (5000, 10000):
+        mns_raw = create_raw_list(count)
+        run('legacy', parse_legacy, update_legacy, mns_raw)
+        run('slots', parse_slots, update_slots, mns_raw)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Bertrand256
+# Created on: 2017-11
+#
+# Benchmark of the masternode payment queue computation (DashdInterface.update_mn_queue_values) on
+# synthetic 5k/10k masternode lists. Queue positions are compared to the ones computed by the former
+# implementation and the script exits with an error on any mismatch. Usage: python mn_queue_benchmark.py
+import datetime
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dashd_intf import DashdInterface, Masternode
+
+
+def create_masternodes(count, now, rnd):
+    mns = []
+    for idx in range(count):
+        mn = Masternode()
+        mn.ident = '%064x-%d' % (rnd.getrandbits(256), idx % 2)
+        mn.status = 'ENABLED' if rnd.random() < 0.95 else 'NEW_START_REQUIRED'
+        mn.activeseconds = rnd.randint(0, 3600 * 24 * 365)
+        mn.lastpaidtime = 0 if rnd.random() < 0.05 else now - rnd.randint(0, 3600 * 24 * 8)
+        mns.append(mn)
+    return mns
+
+
+def legacy_queue_positions(mns, now):
+    """
+    The former O(n^2) implementation; used to verify results. Masternodes with equal waiting times are ordered
+    by ident, the same as in the current implementation, so the positions have to match exactly.
+    """
+    queue = []
+    for mn in mns:
+        if mn.status == 'ENABLED':
+            if mn.lastpaidtime == 0:
+                queue.append((mn.activeseconds, mn))
+            else:
+                queue.append((min(now - mn.lastpaidtime, mn.activeseconds), mn))
+    queue.sort(key=lambda x: x[1].ident)
+    queue.sort(key=lambda x: x[0], reverse=True)
+    queue = [q[1] for q in queue]
+    return {mn.ident: queue.index(mn) for mn in queue}
+
+
+def run(count):
+    now = int(time.mktime(datetime.datetime.utcnow().timetuple()))
+    rnd = random.Random(count)  # fixed seed, so the results are reproducible
+    mns = create_masternodes(count, now, rnd)
+    intf = SimpleNamespace(masternodes=mns, payment_queue=[])
+
+    tm = time.time()
+    legacy = legacy_queue_positions(mns, now)
+    legacy_time = time.time() - tm
+
+    tm = time.time()
+    DashdInterface.update_mn_queue_values(intf, now)
+    cur_time = time.time() - tm
+
+    errors = 0
+    for mn in mns:
+        if mn.status == 'ENABLED':
+            if legacy[mn.ident] != mn.queue_position:
+                errors += 1
+        elif mn.queue_position is not None:
+            errors += 1
+
+    print('%6d masternodes: legacy %.4fs, current %.4fs, errors: %d' % (count, legacy_time, cur_time, errors))
+    return errors
+
+
+if __name__ == '__main__':
+    total_errors = 0
+    for count in (5000, 10000):
+        total_errors += run(count)
+    if total_errors:
+        sys.exit('Queue positions differ from the ones computed by the former implementation')
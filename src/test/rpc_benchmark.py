@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Bertrand256
+# Created on: 2017-11
+#
+# Benchmark of the RPC-heavy operations of DashdInterface (masternode list, proposals, votes) against the local
+# fake dashd (fake_dashd.py), serving a synthetic dataset or a recorded one. Usage:
+#   python rpc_benchmark.py [--latency 50] [--jitter 20] [--replay rpc_record.json] [--record rpc_record.json]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import app_cache
+import dashd_intf
+from app_config import AppConfig, DashNetworkConnectionCfg
+from db_intf import DBCache
+from fake_dashd import FakeDashdServer, SyntheticDataset, ReplayDataset
+
+
+def create_interface(port, cache_dir, record_file=None):
+    app_cache.init(cache_dir, '0.0.0')
+    config = AppConfig()
+    config.cache_dir = cache_dir
+    config.db_intf = DBCache(os.path.join(cache_dir, 'dmt_cache.db'))
+    config.rpc_record_file = record_file
+    conn = DashNetworkConnectionCfg('rpc')
+    conn.host = '127.0.0.1'
+    conn.port = str(port)
+    conn.username = 'user'
+    conn.password = 'password'
+    config.dash_net_configs = [conn]
+    return dashd_intf.DashdInterface(config, window=None)
+
+
+def measure(name, fun):
+    tm = time.time()
+    ret = fun()
+    print('%-40s %.3fs' % (name, time.time() - tm))
+    return ret
+
+
+def run(intf):
+    measure('open', intf.open)
+    measure('masternodelist full (network)', lambda: intf.get_masternodelist('full', data_max_age=0))
+    measure('masternodelist full (no changes)', lambda: intf.get_masternodelist('full', data_max_age=0))
+    proposals = measure('gobject list', lambda: intf.gobject('list', 'valid', 'proposals'))
+    hashes = [prop['Hash'] for prop in proposals.values()]
+    measure('gobject getvotes (sequential)', lambda: [intf.gobject('getvotes', h) for h in hashes])
+    measure('gobject getvotes (batch)', lambda: intf.call_many('gobject', [('getvotes', h) for h in hashes]))
+    chunks = [hashes[i: i + 20] for i in range(0, len(hashes), 20)]
+    measure('gobject getvotes (concurrent batches)',
+            lambda: intf.gather([(intf.call_many, ('gobject', [('getvotes', h) for h in chunk])) for chunk in chunks]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=50, help="Delay of each request [ms]")
+    parser.add_argument('--jitter', type=float, default=20, help="Maximum random delay added to latency [ms]")
+    parser.add_argument('--masternodes', type=int, default=5000)
+    parser.add_argument('--proposals', type=int, default=100)
+    parser.add_argument('--votes', type=int, default=1000)
+    parser.add_argument('--replay', help="Serve RPC traffic recorded with the app's --rpc-record argument")
+    parser.add_argument('--record', help="Record the RPC traffic of this benchmark to a file")
+    args = parser.parse_args()
+
+    if args.replay:
+        dataset = ReplayDataset(args.replay)
+    else:
+        dataset = SyntheticDataset(args.masternodes, args.proposals, args.votes)
+    server = FakeDashdServer(('127.0.0.1', 0), dataset, args.latency / 1000, args.jitter / 1000)
+    port = server.start()
+    intf = create_interface(port, tempfile.mkdtemp(), args.record)
+    run(intf)
+    intf.disconnect()
+    if dashd_intf.rpc_recorder:
+        dashd_intf.rpc_recorder.save()
+    print('HTTP requests: %d, RPC calls: %d' % (server.requests, server.calls))
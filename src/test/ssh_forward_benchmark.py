@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Author: Bertrand256
+# Created on: 2017-11
+#
+# Loopback benchmark of the SSH tunnel port-forwarding loop (dashd_intf.Handler) compared to the former
+# implementation, based on 1024-byte recv calls. The SSH channel is emulated by a plain TCP connection to
+# a local server sending a response of the given size. Usage: python ssh_forward_benchmark.py
+import os
+import select
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dashd_intf import ForwardServer, Handler, rpc_metrics
+
+
+class ChannelEmulator(object):
+    """ Exposes the subset of the paramiko Channel interface used by the forwarding loop. """
+    def __init__(self, sock):
+        self.sock = sock
+
+    def recv(self, size):
+        return self.sock.recv(size)
+
+    def send(self, data):
+        return self.sock.send(data)
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.sock.close()
+
+
+class TransportEmulator(object):
+    def __init__(self, remote_port):
+        self.remote_port = remote_port
+
+    def open_channel(self, kind, dest_addr, src_addr):
+        return ChannelEmulator(socket.create_connection(('127.0.0.1', self.remote_port)))
+
+
+class LegacyHandler(Handler):
+    """ The former forwarding loop. """
+    @staticmethod
+    def forward(sock, chan, buffer_size=None):
+        while True:
+            r, w, x = select.select([sock, chan], [], [], 10)
+            if sock in r:
+                data = sock.recv(1024)
+                if len(data) == 0:
+                    break
+                chan.send(data)
+            if chan in r:
+                data = chan.recv(1024)
+                if len(data) == 0:
+                    break
+                sock.send(data)
+
+
+def start_remote_server(response_size):
+    """ Server emulating dashd: sends response_size bytes for each request line received. """
+    srv = socket.socket()
+    srv.bind(('127.0.0.1', 0))
+    srv.listen(5)
+    response = b'x' * response_size
+
+    def serve():
+        while True:
+            conn, _ = srv.accept()
+            with conn:
+                while conn.recv(1024):
+                    conn.sendall(response)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return srv.getsockname()[1]
+
+
+def run(name, handler_class, remote_port, response_size, requests):
+    class SubHandler(handler_class):
+        chain_host = '127.0.0.1'
+        chain_port = remote_port
+        ssh_transport = TransportEmulator(remote_port)
+        broken_conn_callback = None
+
+    fwd_server = ForwardServer(('127.0.0.1', 0), SubHandler)
+    threading.Thread(target=fwd_server.serve_forever, daemon=True).start()
+    rpc_metrics.clear()
+    try:
+        client = socket.create_connection(fwd_server.server_address)
+        buf = bytearray(1024 * 1024)
+        tm = time.time()
+        for _ in range(requests):
+            client.sendall(b'request\n')
+            received = 0
+            while received < response_size:
+                size = client.recv_into(buf)
+                if not size:
+                    raise Exception('Connection closed')
+                received += size
+        duration = time.time() - tm
+        client.close()
+    finally:
+        fwd_server.shutdown()
+        fwd_server.server_close()
+
+    total_mb = response_size * requests / 1024 / 1024
+    fwd = rpc_metrics.to_dict()['ssh_forward']
+    chunks = (' (%d chunks received)' % fwd['chunks_received']) if fwd['chunks_received'] else ''
+    print('%-8s %.1f MB in %.3fs: %.1f MB/s%s' % (name, total_mb, duration, total_mb / duration, chunks))
+
+
+if __name__ == '__main__':
+    response_size = 8 * 1024 * 1024
+    remote_port = start_remote_server(response_size)
+    run('legacy', LegacyHandler, remote_port, response_size, 10)
+    run('current', Handler, remote_port, response_size, 10)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'ui_rpc_metrics_dlg.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_RpcMetricsDlg(object):
+    def setupUi(self, RpcMetricsDlg):
+        RpcMetricsDlg.setObjectName("RpcMetricsDlg")
+        RpcMetricsDlg.resize(900, 450)
+        self.verticalLayout = QtWidgets.QVBoxLayout(RpcMetricsDlg)
+        self.verticalLayout.setContentsMargins(6, 6, 6, 6)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.lblSummary = QtWidgets.QLabel(RpcMetricsDlg)
+        self.lblSummary.setText("")
+        self.lblSummary.setWordWrap(True)
+        self.lblSummary.setObjectName("lblSummary")
+        self.verticalLayout.addWidget(self.lblSummary)
+        self.tabMetrics = QtWidgets.QTableWidget(RpcMetricsDlg)
+        self.tabMetrics.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.tabMetrics.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.tabMetrics.setObjectName("tabMetrics")
+        self.tabMetrics.setColumnCount(0)
+        self.tabMetrics.setRowCount(0)
+        self.tabMetrics.verticalHeader().setVisible(False)
+        self.verticalLayout.addWidget(self.tabMetrics)
+        self.horizontalLayout = QtWidgets.QHBoxLayout()
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.btnRefresh = QtWidgets.QPushButton(RpcMetricsDlg)
+        self.btnRefresh.setObjectName("btnRefresh")
+        self.horizontalLayout.addWidget(self.btnRefresh)
+        self.btnReset = QtWidgets.QPushButton(RpcMetricsDlg)
+        self.btnReset.setObjectName("btnReset")
+        self.horizontalLayout.addWidget(self.btnReset)
+        self.btnSaveJson = QtWidgets.QPushButton(RpcMetricsDlg)
+        self.btnSaveJson.setObjectName("btnSaveJson")
+        self.horizontalLayout.addWidget(self.btnSaveJson)
+        spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.horizontalLayout.addItem(spacerItem)
+        self.btnClose = QtWidgets.QPushButton(RpcMetricsDlg)
+        self.btnClose.setObjectName("btnClose")
+        self.horizontalLayout.addWidget(self.btnClose)
+        self.verticalLayout.addLayout(self.horizontalLayout)
+
+        self.retranslateUi(RpcMetricsDlg)
+        QtCore.QMetaObject.connectSlotsByName(RpcMetricsDlg)
+
+    def retranslateUi(self, RpcMetricsDlg):
+        _translate = QtCore.QCoreApplication.translate
+        RpcMetricsDlg.setWindowTitle(_translate("RpcMetricsDlg", "Dialog"))
+        self.tabMetrics.setSortingEnabled(True)
+        self.btnRefresh.setText(_translate("RpcMetricsDlg", "Refresh"))
+        self.btnReset.setText(_translate("RpcMetricsDlg", "Reset"))
+        self.btnSaveJson.setText(_translate("RpcMetricsDlg", "Save to JSON..."))
+        self.btnClose.setText(_translate("RpcMetricsDlg", "Close"))
+
+
+if __name__ == "__main__":
+    import sys
+    app = QtWidgets.QApplication(sys.argv)
+    RpcMetricsDlg = QtWidgets.QDialog()
+    ui = Ui_RpcMetricsDlg()
+    ui.setupUi(RpcMetricsDlg)
+    RpcMetricsDlg.show()
+    sys.exit(app.exec_())